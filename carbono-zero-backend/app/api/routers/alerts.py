@@ -0,0 +1,68 @@
+# app/api/routers/alerts.py
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Literal, Optional
+from beanie import PydanticObjectId
+from ...models.models import Alert, AlertRule, AlertRuleIn
+from ...services.alerts import alert_engine, ALERT_RULES_CHANNEL
+from ...services.pubsub import pubsub
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[Alert])
+async def get_alerts(
+        session_id: Optional[str] = None,
+        state: Optional[Literal["active", "resolved"]] = None,
+        limit: int = Query(100, ge=1, le=1000),
+):
+    """Alertas más recientes, opcionalmente filtradas por clase (sesión) y estado."""
+    query = {}
+    if session_id:
+        query["session_id"] = session_id
+    if state:
+        query["state"] = state
+    return await Alert.find(query).sort(-Alert.started_at).limit(limit).to_list()
+
+
+@router.get("/stats")
+async def get_alert_stats():
+    """Lecturas evaluadas, lotes descartados y alertas activas del motor de reglas."""
+    return alert_engine.stats()
+
+
+@router.get("/rules", response_model=List[AlertRule])
+async def get_rules():
+    return await AlertRule.find_all().to_list()
+
+
+@router.post("/rules", response_model=AlertRule, status_code=201)
+async def create_rule(rule_in: AlertRuleIn):
+    rule = AlertRule(**rule_in.model_dump())
+    await rule.insert()
+    await pubsub.publish(ALERT_RULES_CHANNEL, {"rule_id": str(rule.id)})
+    return rule
+
+
+@router.put("/rules/{id}", response_model=AlertRule)
+async def update_rule(id: PydanticObjectId, rule_in: AlertRuleIn):
+    rule = await AlertRule.get(id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    await rule.update({"$set": rule_in.model_dump()})
+    await pubsub.publish(ALERT_RULES_CHANNEL, {"rule_id": str(id)})
+    rule = await AlertRule.get(id)
+    # Una regla desactivada ya no se evalúa: sus alertas activas no se resolverían nunca
+    if not rule.enabled:
+        await alert_engine.resolve_rule(rule)
+    return rule
+
+
+@router.delete("/rules/{id}", status_code=204)
+async def delete_rule(id: PydanticObjectId):
+    rule = await AlertRule.get(id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    await rule.delete()
+    await pubsub.publish(ALERT_RULES_CHANNEL, {"rule_id": str(id)})
+    await alert_engine.resolve_rule(rule)
+    return None
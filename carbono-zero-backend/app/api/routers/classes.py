@@ -1,20 +1,65 @@
 # app/api/routers/classes.py
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
 from beanie import PydanticObjectId
-from ...models.models import Class, UpdateClass, SensorReading, ClassOut
+from ...core.config import settings
+from ...models.models import Class, UpdateClass, ClassOut, DeletionJob
+from ...services.pubsub import pubsub
+from ...services.deletion import deletion_worker
+from ...services import pagination
+
+# Canal por el que se avisa a todos los workers que cambió una clase
+CLASSES_CHANNEL = "classes-changed"
+
+# Campos que se pueden pedir en /page con `fields`, y el orden de sus páginas
+CLASS_FIELDS = tuple(ClassOut.model_fields)
+CLASS_SORT = [("_id", 1)]
 
 router = APIRouter()
 
 @router.post("/", response_model=ClassOut, status_code=201)
 async def create_class(cls: Class):
     await cls.insert()
+    await pubsub.publish(CLASSES_CHANNEL, {"class_id": str(cls.id)})
     return cls
 
 @router.get("/", response_model=List[ClassOut])
 async def get_all_classes():
     return await Class.find_all().to_list()
 
+@router.get("/page")
+async def get_classes_page(
+        limit: int = Query(settings.PAGE_DEFAULT_LIMIT, ge=1, le=settings.PAGE_MAX_LIMIT),
+        cursor: Optional[str] = None,
+        day: Optional[int] = Query(None, ge=0, le=6),
+        sensor_id: Optional[str] = None,
+        fields: Optional[str] = None,
+):
+    """
+    Clases paginadas por cursor, en orden de creación. Filtra por día de la semana
+    (0 = lunes) y sensor; con `fields=id,name` solo se leen y envían esos campos.
+    La respuesta es {"items": [...], "next_cursor": ...}; sin más páginas, next_cursor es null.
+    """
+    try:
+        selected = pagination.parse_fields(fields, CLASS_FIELDS, always=("id",))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query = {}
+    if day is not None:
+        query["schedule_day"] = day
+    if sensor_id is not None:
+        query["sensor_id"] = sensor_id
+
+    def to_item(doc: dict) -> dict:
+        return {field: str(doc["_id"]) if field == "id" else doc.get(field) for field in selected}
+
+    try:
+        return pagination.paged_response(
+            Class.get_motor_collection(), query, CLASS_SORT, limit, cursor, selected, to_item
+        )
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.put("/{id}", response_model=ClassOut)
 async def update_class(id: PydanticObjectId, cls_update: UpdateClass):
     cls = await Class.get(id)
@@ -23,13 +68,16 @@ async def update_class(id: PydanticObjectId, cls_update: UpdateClass):
     update_data = cls_update.model_dump(exclude_unset=True)
     if update_data:
         await cls.update({"$set": update_data})
+        await pubsub.publish(CLASSES_CHANNEL, {"class_id": str(id)})
     return await Class.get(id)
 
-@router.delete("/{id}", status_code=204)
+@router.delete("/{id}", response_model=DeletionJob, status_code=202)
 async def delete_class(id: PydanticObjectId):
     cls_to_delete = await Class.get(id)
     if not cls_to_delete:
         raise HTTPException(status_code=404, detail="Class not found")
-    await SensorReading.find(SensorReading.session_id == str(id)).delete()
+    # La clase desaparece al instante; sus lecturas, rollups, agregados y alertas se
+    # borran en segundo plano por bloques (progreso en /api/jobs/{job_id})
     await cls_to_delete.delete()
-    return None
\ No newline at end of file
+    await pubsub.publish(CLASSES_CHANNEL, {"class_id": str(id)})
+    return await deletion_worker.enqueue_class(str(id))
\ No newline at end of file
@@ -0,0 +1,24 @@
+# app/api/routers/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from ...core.container import container
+from ...core.startup import startup
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def liveness():
+    """El proceso responde; no depende de MongoDB."""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    200 cuando terminó el arranque (base de datos, índices y subsistemas) y la API
+    puede atender peticiones; 503 mientras arranca o si el último intento falló
+    (el arranque se reintenta solo; `error` dice por qué).
+    """
+    body = {**startup.as_dict(), "subsystems": container.created()}
+    return JSONResponse(body, status_code=200 if startup.ready else 503)
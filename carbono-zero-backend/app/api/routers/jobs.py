@@ -0,0 +1,41 @@
+# app/api/routers/jobs.py
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Literal, Optional
+from beanie import PydanticObjectId
+from ...models.models import DeletionJob
+from ...services.deletion import deletion_worker
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[DeletionJob])
+async def get_jobs(
+        status: Optional[Literal["pending", "running", "done", "failed"]] = None,
+        limit: int = Query(50, ge=1, le=500),
+):
+    """Trabajos de borrado más recientes (cascadas de clases y barridos de retención)."""
+    query = {"status": status} if status else {}
+    return await DeletionJob.find(query).sort(-DeletionJob.created_at).limit(limit).to_list()
+
+
+@router.get("/stats")
+async def get_job_stats():
+    return deletion_worker.stats()
+
+
+@router.get("/{id}", response_model=DeletionJob)
+async def get_job(id: PydanticObjectId):
+    """Estado y progreso (documentos borrados / total por paso) de un trabajo."""
+    job = await DeletionJob.get(id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/retention", response_model=DeletionJob, status_code=202)
+async def run_retention():
+    """Programa un barrido de retención ahora, sin esperar al siguiente periodo."""
+    job = await deletion_worker.enqueue_retention(force=True)
+    if job is None:
+        raise HTTPException(status_code=409, detail="Retention is disabled")
+    return job
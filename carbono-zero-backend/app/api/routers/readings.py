@@ -1,66 +1,333 @@
 # app/api/routers/readings.py
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from datetime import datetime, time, timedelta
-from typing import Optional
-import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime, time, timedelta
+from pydantic import ValidationError
+from typing import List, Literal, Optional
 from ...services.websocket_manager import manager
-from ...models.models import ReadingPayload, SensorReading
+from ...services.ingest_buffer import ingest_buffer, IngestBufferFull
+from ...services import export
+from ...services import history as history_service
+from ...services import edge_codec
+from ...services import pagination
+from ...services.session_state import session_state, DEFAULT_SENSOR_ID
+from ...services.response_cache import history_cache, cached_response
+from ...services.latest import latest_readings
+from ...core.config import settings
+from ...core.metrics import SENSOR_READING_AGE_SECONDS
+from ...core.timeutils import utcnow, to_utc_naive, as_utc
+from ...models.models import ReadingPayload, SensorReading, BatchReadingItem
 
 router = APIRouter()
 
+# Campos que se pueden pedir en /raw con `fields`
+READING_FIELDS = ("id", "timestamp", "session_id", "sensor_id", "co2", "temperature", "humidity", "seq", "spool_id")
+
+def build_reading(payload: ReadingPayload, session_id: Optional[str], sensor_id: Optional[str]) -> SensorReading:
+    """
+    Arma el documento de la lectura. Si no se indica la sesión, se usa la activa
+    para el sensor (desde la caché). Sin hora del sensor se usa la hora de llegada (UTC).
+    """
+    sensor_id = payload.sensor_id or sensor_id
+    if session_id is None:
+        session_id = session_state.get_active(sensor_id or DEFAULT_SENSOR_ID)
+    data = payload.model_dump(exclude_none=True, exclude={"sensor_id", "session_id"})
+    reading = SensorReading(**data, session_id=session_id, sensor_id=sensor_id)
+    # Cuánto tardó la lectura en llegar desde el sensor (0 si no trae su propia hora)
+    SENSOR_READING_AGE_SECONDS.labels(sensor_id or DEFAULT_SENSOR_ID).observe(
+        max(0.0, (utcnow() - reading.timestamp).total_seconds())
+    )
+    return reading
+
+
+def live_message(reading: SensorReading) -> Optional[dict]:
+    """Mensaje para los dashboards en vivo, o None si la lectura es un reenvío antiguo."""
+    age = (utcnow() - reading.timestamp).total_seconds()
+    if age > settings.LIVE_BROADCAST_MAX_AGE_SECONDS:
+        return None
+    return {
+        "co2": reading.co2,
+        "temperature": reading.temperature,
+        "humidity": reading.humidity,
+        "timestamp": as_utc(reading.timestamp),
+    }
+
+
+async def enqueue(readings: List[SensorReading]):
+    """Encola en el buffer de ingesta; si está lleno (MongoDB caído), el cliente reintenta más tarde."""
+    try:
+        await ingest_buffer.add(readings)
+    except IngestBufferFull as e:
+        raise HTTPException(
+            status_code=503, detail="Ingest buffer is full, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
 @router.post("/", status_code=202)
-async def receive_sensor_reading(payload: ReadingPayload, session_id: str):
-    reading_doc = SensorReading(**payload.model_dump(), session_id=session_id)
-    await reading_doc.insert()
-    await manager.broadcast_to_session(payload.model_dump(), session_id)
+async def receive_sensor_reading(
+        payload: ReadingPayload,
+        session_id: Optional[str] = None,
+        sensor_id: Optional[str] = None
+):
+    reading_doc = build_reading(payload, session_id, sensor_id)
+    # La lectura se encola y se escribe junto con otras en un solo insert_many
+    await enqueue([reading_doc])
+    message = live_message(reading_doc)
+    if message is not None:
+        await manager.broadcast_to_session(message, reading_doc.session_id)
     return {"status": "received"}
 
+
+async def ingest_items(items: List[BatchReadingItem]) -> int:
+    """
+    Encola un lote de lecturas (pueden ser de varias sesiones y llegar fuera de
+    orden). A cada sesión solo se le envía en vivo la lectura más reciente del
+    lote, si no es un reenvío antiguo.
+    """
+    reading_docs = [build_reading(item, item.session_id, None) for item in items]
+    await enqueue(reading_docs)
+
+    latest_by_session: dict[str, SensorReading] = {}
+    for reading in reading_docs:
+        latest = latest_by_session.get(reading.session_id)
+        if latest is None or reading.timestamp >= latest.timestamp:
+            latest_by_session[reading.session_id] = reading
+    for session_id, reading in latest_by_session.items():
+        message = live_message(reading)
+        if message is not None:
+            await manager.broadcast_to_session(message, session_id)
+    return len(reading_docs)
+
+
+@router.post("/batch", status_code=202)
+async def receive_sensor_readings_batch(items: List[BatchReadingItem]):
+    """Recibe un arreglo de lecturas y las encola todas de una vez."""
+    return {"status": "received", "count": await ingest_items(items)}
+
+
+@router.post("/compact", status_code=202)
+async def receive_compact_readings(request: Request):
+    """
+    Recibe un lote compacto del Pi (diferencias entre lecturas, en JSON o msgpack;
+    ver app/services/edge_codec.py) y lo encola igual que /batch.
+    """
+    try:
+        batch = edge_codec.load_body(await request.body(), request.headers.get("content-type", ""))
+        items = [BatchReadingItem(**item) for item in edge_codec.decode(batch)]
+    except edge_codec.UnsupportedEncoding:
+        raise HTTPException(status_code=415, detail="msgpack payloads require msgpack on the server")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid compact payload: {e}")
+    return {"status": "received", "count": await ingest_items(items)}
+
+
+@router.get("/ingest-stats")
+async def get_ingest_stats():
+    """Contadores del buffer de ingesta (profundidad de cola y latencia de escritura)."""
+    return ingest_buffer.stats()
+
+
+@router.get("/broadcast-stats")
+async def get_broadcast_stats():
+    """Clientes conectados, mensajes en cola y descartados por sesión."""
+    return manager.stats()
+
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Aciertos, fallos e invalidaciones de la caché del historial."""
+    return history_cache.stats()
+
+@router.get("/latest")
+async def get_latest_readings(session_id: Optional[str] = None):
+    """
+    Última lectura y mediana móvil de CO2 por sesión, desde la caché en memoria
+    (no consulta MongoDB). Incluye la referencia de baseline actual.
+    """
+    if session_id is not None:
+        latest = latest_readings.latest(session_id)
+        if latest is None:
+            raise HTTPException(status_code=404, detail="No readings for this session")
+        return latest
+    return {
+        "baseline_co2": latest_readings.baseline_co2(),
+        "sessions": latest_readings.all_latest(),
+    }
+
+
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     await manager.connect(websocket, session_id)
     try:
+        # Los envíos los hace la tarea del canal; aquí solo esperamos el cierre del cliente
         while True:
-            await asyncio.sleep(1)
+            await websocket.receive_text()
     except WebSocketDisconnect:
         manager.disconnect(websocket, session_id)
 
 
+def resolve_date_range(
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        start_time: Optional[time] = None,
+        end_time: Optional[time] = None,
+) -> tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Convierte los parámetros de fecha/hora en un rango [inicio, fin) en UTC.
+    Las fechas sin zona se interpretan en la hora local; sin hora de fin se incluye el día completo.
+    """
+    s_date = e_date = None
+    if start_date:
+        s_date = datetime.combine(start_date, start_time) if start_time else start_date
+        s_date = to_utc_naive(s_date)
+    if end_date:
+        e_date = datetime.combine(end_date, end_time) if end_time else end_date + timedelta(days=1)
+        e_date = to_utc_naive(e_date)
+    return s_date, e_date
+
+
+@router.get("/export/{class_id}")
+async def export_class_readings(
+        class_id: str,
+        format: Literal["csv", "parquet"] = "csv",
+        resolution: Literal["raw", "1m", "15m", "1h", "1d"] = "raw",
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+):
+    """
+    Descarga las lecturas de una clase en CSV o Parquet. Se leen con un cursor y se
+    envían por bloques, así que meses de datos no se cargan en la memoria del backend.
+    Con `resolution` distinta de "raw" se exportan promedio, mínimo y máximo por intervalo.
+    """
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow on the server")
+
+    s_date, e_date = resolve_date_range(start_date, end_date)
+    columns = export.columns_for(resolution)
+    rows = export.iter_rows(class_id, resolution, s_date, e_date)
+    if format == "parquet":
+        body, media_type = export.stream_parquet(rows, columns), "application/vnd.apache.parquet"
+    else:
+        body, media_type = export.stream_csv(rows, columns), "text/csv; charset=utf-8"
+
+    filename = f"{class_id}_{resolution}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/raw")
+async def get_raw_readings(
+        session_id: str,
+        day: Optional[date] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        order: Literal["asc", "desc"] = "asc",
+        limit: int = Query(settings.PAGE_DEFAULT_LIMIT, ge=1, le=settings.PAGE_MAX_LIMIT),
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+):
+    """
+    Lecturas crudas de una sesión, paginadas por cursor sobre (timestamp, id).
+    `day` es un día local completo y `start`/`end` acotan por hora (sin zona se
+    toman en hora local); si se combinan, vale la intersección. Con
+    `fields=timestamp,co2` solo se leen y envían esos campos (más id y timestamp).
+    La respuesta es {"items": [...], "next_cursor": ...}; sin más páginas, next_cursor es null.
+    """
+    try:
+        selected = pagination.parse_fields(fields, READING_FIELDS, always=("id", "timestamp"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    bounds_start, bounds_end = [], []
+    if day is not None:
+        day_start, day_end = resolve_date_range(datetime.combine(day, time()), datetime.combine(day, time()))
+        bounds_start.append(day_start)
+        bounds_end.append(day_end)
+    if start is not None:
+        bounds_start.append(to_utc_naive(start))
+    if end is not None:
+        bounds_end.append(to_utc_naive(end))
+    query: dict = {"session_id": session_id}
+    if bounds_start or bounds_end:
+        query["timestamp"] = {}
+        if bounds_start:
+            query["timestamp"]["$gte"] = max(bounds_start)
+        if bounds_end:
+            query["timestamp"]["$lt"] = min(bounds_end)
+
+    direction = 1 if order == "asc" else -1
+    sort = [("timestamp", direction), ("_id", direction)]
+
+    def to_item(doc: dict) -> dict:
+        item = {}
+        for field in selected:
+            if field == "id":
+                item["id"] = str(doc["_id"])
+            elif field == "timestamp":
+                item["timestamp"] = as_utc(doc["timestamp"])
+            else:
+                item[field] = doc.get(field)
+        return item
+
+    try:
+        return pagination.paged_response(
+            SensorReading.get_motor_collection(), query, sort, limit, cursor, selected, to_item
+        )
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/history/{class_id}")
 async def get_class_history(
+        request: Request,
         class_id: str,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         start_time: Optional[time] = None,
-        end_time: Optional[time] = None
+        end_time: Optional[time] = None,
+        max_points: Optional[int] = Query(None, ge=10, le=5000),
+        downsample: Literal["bins", "lttb"] = "bins",
 ):
     """
     Busca el historial de una clase. Si se proveen fechas, filtra por ellas.
-    Siempre agrupa los resultados en intervalos de 15 minutos.
+    Sin `max_points` agrupa en intervalos de 15 minutos; con `max_points` elige el
+    intervalo más fino que no supera esa cantidad de puntos para el rango pedido.
+    Con `downsample=lttb` agrupa más fino y reduce con LTTB, conservando los picos.
+    Cada punto trae el promedio (`co2`), mínimo y máximo de CO2 del intervalo.
+    La respuesta se guarda en caché por clase y rango, y lleva ETag.
     """
-    match_filter = {"session_id": class_id}
+    s_date = e_date = None
 
-    # Construir el filtro de fecha/hora si se proporcionan los parámetros
+    # Construir el filtro de fecha/hora si se proporcionan los parámetros.
     if start_date and end_date:
-        s_date = datetime.combine(start_date, start_time) if start_time else start_date
-        e_date = datetime.combine(end_date, end_time) if end_time else end_date + timedelta(days=1)
-        match_filter["timestamp"] = {"$gte": s_date, "$lt": e_date}
-
-    pipeline = [
-        {"$match": match_filter},
-        {
-            "$group": {
-                "_id": {
-                    "$dateTrunc": {
-                        "date": "$timestamp",
-                        "unit": "minute",
-                        "binSize": 15
-                    }
-                },
-                "avg_co2": {"$avg": "$co2"}
-            }
-        },
-        {"$sort": {"_id": 1}},
-        {"$project": {"timestamp": "$_id", "co2": "$avg_co2", "_id": 0}}
-    ]
-    history = await SensorReading.aggregate(pipeline).to_list()
-    return history
\ No newline at end of file
+        s_date, e_date = resolve_date_range(start_date, end_date, start_time, end_time)
+
+    cache_key = ("history", class_id, s_date, e_date, max_points, downsample)
+    entry = history_cache.get(cache_key)
+    if entry is not None:
+        return cached_response(request, entry)
+
+    # Si llegan lecturas mientras se calcula, el resultado se envía pero no se guarda
+    generation = history_cache.generation
+    bin_name = history_service.DEFAULT_BIN
+    if max_points is not None:
+        # Sin rango explícito, el intervalo se elige según las lecturas que existen
+        extent = (s_date, e_date) if s_date else await history_service.data_extent(class_id)
+        target = max_points * history_service.LTTB_OVERSAMPLE if downsample == "lttb" else max_points
+        if extent is not None:
+            bin_name = history_service.choose_bin(extent[0], extent[1], target)
+
+    history = await history_service.get_history(class_id, bin_name, s_date, e_date)
+    for point in history:
+        point["timestamp"] = as_utc(point["timestamp"])
+    if max_points is not None and downsample == "lttb":
+        history = history_service.lttb(history, max_points)
+
+    entry = history_cache.set(cache_key, history, session_id=class_id, start=s_date, end=e_date, generation=generation)
+    return cached_response(request, entry)
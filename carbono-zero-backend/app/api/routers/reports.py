@@ -1,19 +1,69 @@
 # app/api/routers/reports.py
-from fastapi import APIRouter
-from ...models.models import SensorReading
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Literal, Optional
+from datetime import date, datetime
+from beanie import PydanticObjectId
+from ...core.config import settings
+from ...core.container import container
+from ...core.timeutils import LOCAL_TZ
+from ...models.models import Class
+from ...services import rankings as rankings_service
+from ...services.response_cache import cached_response
 
 router = APIRouter()
 
+# El servicio de emisiones (y NumPy) se carga con la primera consulta
+get_emissions_service = container.provider("emissions")
+
 @router.get("/class-rankings")
-async def get_class_rankings():
-    pipeline = [
-        {"$match": {"session_id": {"$regex": "^[a-f0-9]{24}$"}}},
-        {"$group": {"_id": "$session_id", "avgCo2": {"$avg": "$co2"}}},
-        {"$addFields": {"class_id": {"$toObjectId": "$_id"}}},
-        {"$lookup": {"from": "classes", "localField": "class_id", "foreignField": "_id", "as": "classDetails"}},
-        {"$unwind": "$classDetails"},
-        {"$sort": {"avgCo2": -1}},
-        {"$project": {"id": "$_id", "name": "$classDetails.name", "avgCo2": "$avgCo2", "_id": 0}}
-    ]
-    rankings = await SensorReading.aggregate(pipeline).to_list()
-    return rankings
\ No newline at end of file
+async def get_class_rankings(
+        request: Request,
+        period: Literal["all", "week", "last_week", "month", "last_month"] = "all"
+):
+    """
+    Ranking de clases por CO2 promedio. Se sirve desde los agregados por clase
+    que se actualizan en cada ingesta (ver app/services/rankings.py), con ETag.
+    """
+    entry = await rankings_service.get_rankings(period)
+    return cached_response(request, entry)
+
+
+async def get_class_or_404(class_id: PydanticObjectId) -> Class:
+    cls = await Class.get(class_id)
+    if not cls:
+        raise HTTPException(status_code=404, detail="Class not found")
+    return cls
+
+
+@router.get("/emissions/{class_id}")
+async def get_class_emissions(
+        class_id: PydanticObjectId,
+        day: Optional[date] = None,
+        tax_rate: float = Query(settings.CARBON_TAX_USD_PER_TON, gt=0),
+        emissions_service=Depends(get_emissions_service),
+):
+    """
+    Emisiones de CO2 por ocupación, ventilación estimada e impuesto al carbono de
+    una clase en un día (por defecto hoy). `tax_rate` en USD por tonelada de CO2.
+    """
+    cls = await get_class_or_404(class_id)
+    day = day or datetime.now(LOCAL_TZ).date()
+    return await emissions_service.get_class_day(cls, day, tax_rate)
+
+
+@router.get("/emissions/{class_id}/daily")
+async def get_class_emissions_daily(
+        class_id: PydanticObjectId,
+        start_date: date,
+        end_date: date,
+        tax_rate: float = Query(settings.CARBON_TAX_USD_PER_TON, gt=0),
+        emissions_service=Depends(get_emissions_service),
+):
+    """Lo mismo que /emissions/{class_id}, para cada día del rango en que hubo clase."""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days > 366:
+        raise HTTPException(status_code=400, detail="Date range cannot exceed one year")
+    cls = await get_class_or_404(class_id)
+    days = await emissions_service.class_days(str(cls.id), start_date, end_date)
+    return [await emissions_service.get_class_day(cls, day, tax_rate) for day in days]
@@ -1,46 +1,233 @@
 # app/api/routers/sensor_control.py
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from ...core.container import container
+from ...services.session_state import DEFAULT_SENSOR_ID
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Este manager solo manejará la conexión con el script del sensor.
-# Es un objeto simple para mantener el estado de la conexión.
+COMMAND_CHANNEL = "sensor-commands"
+ACK_CHANNEL = "sensor-acks"
+PRESENCE_CHANNEL = "sensor-presence"
+
+# Comandos de sesión: solo importa el último pendiente para cada sensor
+SESSION_COMMANDS = {"start_session", "stop_session"}
+
+
+@dataclass
+class SensorConnection:
+    sensor_id: str
+    websocket: WebSocket
+    connected_at: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.time)
+    latency_ms: float | None = None
+    # Los scripts antiguos no responden a los pings; a esos no se les aplica el timeout
+    answers_pings: bool = False
+
+
+# Este manager maneja las conexiones con los scripts de los sensores, una por sensor_id.
+# Guarda los comandos pendientes de confirmación para reenviarlos al reconectar.
 class SensorControlManager:
-    def __init__(self):
-        self.active_connection: WebSocket | None = None
-        print("SensorControlManager inicializado.")
+    def __init__(self, heartbeat_seconds: float = 15.0):
+        self.heartbeat_seconds = heartbeat_seconds
+        self.connections: dict[str, SensorConnection] = {}
+        self.pending: dict[str, OrderedDict[str, dict]] = {}
+        # Último estado conocido de cada sensor, incluidos los conectados a otros workers
+        self.presence: dict[str, dict] = {}
+        self._pubsub = None
+        self._heartbeat_task: asyncio.Task | None = None
+        logger.info("SensorControlManager inicializado.")
+
+    def attach_pubsub(self, pubsub):
+        """
+        Publica los comandos en el backend de pub/sub para que los entregue
+        el worker que tenga la conexión con el sensor.
+        """
+        self._pubsub = pubsub
+        pubsub.subscribe(COMMAND_CHANNEL, self._on_command)
+        pubsub.subscribe(ACK_CHANNEL, self._on_ack)
+        pubsub.subscribe(PRESENCE_CHANNEL, self._on_presence)
 
-    async def connect(self, websocket: WebSocket):
+    async def _publish(self, channel: str, message: dict, local_handler):
+        if self._pubsub is not None:
+            await self._pubsub.publish(channel, message)
+        else:
+            await local_handler(message)
+
+    def start(self):
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+
+    # --- Conexiones ---
+
+    async def connect(self, websocket: WebSocket, sensor_id: str):
         await websocket.accept()
-        self.active_connection = websocket
-        print("🔌 Conexión con el script del sensor establecida.")
+        self.connections[sensor_id] = SensorConnection(sensor_id=sensor_id, websocket=websocket)
+        logger.info(f"🔌 Conexión con el sensor '{sensor_id}' establecida.")
+        await self._publish_presence(sensor_id, connected=True)
 
-    def disconnect(self):
-        self.active_connection = None
-        print("🔌 Conexión con el script del sensor perdida.")
+        # Reenvía los comandos que quedaron sin confirmar mientras estaba desconectado
+        for command in list(self.pending.get(sensor_id, {}).values()):
+            await self._send(sensor_id, command)
 
-    async def send_command(self, command: dict):
-        if self.active_connection:
-            await self.active_connection.send_json(command)
-            print(f"▶️ Comando enviado al sensor: {command}")
-        else:
-            print("⚠️ No se pudo enviar el comando: No hay conexión con el script del sensor.")
+    async def disconnect(self, websocket: WebSocket, sensor_id: str):
+        connection = self.connections.get(sensor_id)
+        # Si el sensor ya se reconectó con otro WebSocket, no borramos la conexión nueva
+        if connection is None or connection.websocket is not websocket:
+            return
+        del self.connections[sensor_id]
+        logger.info(f"🔌 Conexión con el sensor '{sensor_id}' perdida.")
+        await self._publish_presence(sensor_id, connected=False)
+
+    async def _send(self, sensor_id: str, command: dict) -> bool:
+        connection = self.connections.get(sensor_id)
+        if connection is None:
+            return False
+        try:
+            await connection.websocket.send_json(command)
+            return True
+        except Exception:
+            await self.disconnect(connection.websocket, sensor_id)
+            return False
+
+    # --- Comandos ---
+
+    async def send_command(self, command: dict, sensor_id: str = DEFAULT_SENSOR_ID) -> str:
+        """
+        Encola un comando para el sensor. Queda pendiente hasta que el sensor lo
+        confirme con {"type": "ack", "command_id": ...}, y se reenvía al reconectar.
+        """
+        command = {**command, "command_id": uuid.uuid4().hex}
+        await self._publish(COMMAND_CHANNEL, {"sensor_id": sensor_id, "command": command}, self._on_command)
+        return command["command_id"]
+
+    async def _on_command(self, envelope: dict):
+        sensor_id, command = envelope["sensor_id"], envelope["command"]
+        queue = self.pending.setdefault(sensor_id, OrderedDict())
+        if command.get("command") in SESSION_COMMANDS:
+            for command_id, queued in list(queue.items()):
+                if queued.get("command") in SESSION_COMMANDS:
+                    del queue[command_id]
+        queue[command["command_id"]] = command
+
+        if await self._send(sensor_id, command):
+            logger.info(f"▶️ Comando enviado al sensor '{sensor_id}': {command}")
+        elif self._pubsub is None:
+            logger.warning(f"⚠️ Sensor '{sensor_id}' desconectado. El comando se enviará al reconectar.")
+
+    async def _on_ack(self, message: dict):
+        queue = self.pending.get(message["sensor_id"])
+        if queue is not None:
+            queue.pop(message["command_id"], None)
+
+    # --- Mensajes del sensor y heartbeats ---
+
+    async def handle_message(self, sensor_id: str, text: str):
+        connection = self.connections.get(sensor_id)
+        if connection is None:
+            return
+        connection.last_seen = time.time()
+        try:
+            message = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(message, dict):
+            return
+
+        if message.get("type") == "ack" and message.get("command_id"):
+            await self._publish(
+                ACK_CHANNEL, {"sensor_id": sensor_id, "command_id": message["command_id"]}, self._on_ack
+            )
+        elif message.get("type") == "pong" and isinstance(message.get("ts"), (int, float)):
+            connection.latency_ms = round((time.time() - message["ts"]) * 1000, 1)
+            connection.answers_pings = True
+            await self._publish_presence(sensor_id, connected=True)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            now = time.time()
+            for sensor_id, connection in list(self.connections.items()):
+                # Un sensor que no responde en 3 heartbeats se da por desconectado
+                if connection.answers_pings and now - connection.last_seen > 3 * self.heartbeat_seconds:
+                    logger.warning(f"⚠️ El sensor '{sensor_id}' no responde. Cerrando conexión.")
+                    try:
+                        await connection.websocket.close()
+                    except Exception:
+                        pass
+                    await self.disconnect(connection.websocket, sensor_id)
+                    continue
+                await self._send(sensor_id, {"command": "ping", "ts": now})
+
+    async def _publish_presence(self, sensor_id: str, connected: bool):
+        connection = self.connections.get(sensor_id)
+        presence = {
+            "sensor_id": sensor_id,
+            "connected": connected,
+            "worker": self._pubsub.instance_id if self._pubsub is not None else None,
+            "last_seen": connection.last_seen if connection else time.time(),
+            "latency_ms": connection.latency_ms if connection else None,
+        }
+        await self._publish(PRESENCE_CHANNEL, presence, self._on_presence)
+
+    async def _on_presence(self, presence: dict):
+        self.presence[presence["sensor_id"]] = presence
+
+    def status(self) -> list[dict]:
+        now = time.time()
+        sensors = []
+        for sensor_id, presence in sorted(self.presence.items()):
+            sensors.append({
+                **presence,
+                "seconds_since_seen": round(now - presence["last_seen"], 1),
+                "pending_commands": len(self.pending.get(sensor_id, {})),
+            })
+        return sensors
+
+
+def get_sensor_manager() -> SensorControlManager:
+    """La instancia única del manager para toda la aplicación, desde el contenedor."""
+    return container.get("sensor_control")
 
-# Creamos una instancia única del manager para toda la aplicación
-sensor_manager = SensorControlManager()
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, sensor_id: str = DEFAULT_SENSOR_ID):
     """
     Este es el endpoint al que el script de Python se conectará
     para recibir órdenes (ej: 'inicia monitoreo para la clase X').
+    Cada sensor se identifica con el parámetro `sensor_id`.
     """
-    await sensor_manager.connect(websocket)
+    sensor_manager = get_sensor_manager()
+    await sensor_manager.connect(websocket, sensor_id)
     try:
-        # Mantenemos la conexión abierta indefinidamente, esperando
+        # El script responde a los pings y confirma los comandos recibidos
         while True:
-            # En el futuro, el script podría enviar pings de 'estoy vivo'
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            await sensor_manager.handle_message(sensor_id, text)
     except WebSocketDisconnect:
-        sensor_manager.disconnect()
\ No newline at end of file
+        await sensor_manager.disconnect(websocket, sensor_id)
+
+
+@router.get("/sensors")
+async def get_sensors_status():
+    """Sensores conocidos, si están conectados, su latencia y sus comandos pendientes."""
+    return get_sensor_manager().status()
@@ -1,9 +1,100 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
 
+    # Buffer de escritura de lecturas: se vacía al llegar a N lecturas o cada X segundos
+    INGEST_BUFFER_MAX_SIZE: int = 500
+    INGEST_BUFFER_FLUSH_SECONDS: float = 1.0
+    # Lecturas pendientes como máximo (si MongoDB no responde); al llenarse, los POST responden 503
+    INGEST_BUFFER_MAX_PENDING: int = 50_000
+    # Espera máxima entre reintentos de un lote que no se pudo escribir
+    INGEST_RETRY_MAX_SECONDS: float = 30.0
+
+    # Almacenamiento de sensor_readings: "standard" o "timeseries" (MongoDB 5.0+)
+    SENSOR_READINGS_STORAGE: Literal["standard", "timeseries"] = "standard"
+
+    # Historial desde los rollups precalculados (1m, 15m, 1h) en lugar de las lecturas crudas
+    ROLLUPS_ENABLED: bool = True
+
+    # Segundos que se reutiliza un ranking ya calculado
+    RANKINGS_CACHE_SECONDS: float = 30.0
+
+    # Caché del historial por clase y rango: expiración y cantidad máxima de respuestas (LRU).
+    # Las entradas también se invalidan al escribir lecturas del rango o al cambiar la clase
+    RESPONSE_CACHE_SECONDS: float = 300.0
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+
+    # Cola por cliente WebSocket y política para clientes lentos: "latest" o "drop_oldest"
+    WS_CLIENT_QUEUE_SIZE: int = 32
+    WS_SLOW_CLIENT_POLICY: Literal["latest", "drop_oldest"] = "latest"
+
+    # Pub/sub entre workers: "memory" (un solo proceso) o "mongo" (colección capped compartida)
+    PUBSUB_BACKEND: Literal["memory", "mongo"] = "memory"
+    PUBSUB_CAPPED_SIZE_MB: int = 16
+
+    # Estado de las sesiones activas: "memory" (se pierde al reiniciar) o "mongo" (persistente y compartido)
+    SESSION_STATE_BACKEND: Literal["memory", "mongo"] = "memory"
+
+    # Intervalo de ping a los scripts de los sensores
+    SENSOR_HEARTBEAT_SECONDS: float = 15.0
+
+    # Minutos hacia atrás que el planificador revisa al arrancar (clases ya en curso)
+    SCHEDULER_CATCHUP_MINUTES: int = 120
+    # Si este proceso corre el planificador de clases. Con varios workers, solo uno debería
+    # tenerlo en true (RUN_SCHEDULER=false en los demás)
+    RUN_SCHEDULER: bool = True
+
+    # Segundos que una petición espera a que termine el arranque (MongoDB, índices) antes de responder 503
+    STARTUP_WAIT_SECONDS: float = 10.0
+
+    # Zona horaria local: las fechas sin zona se interpretan en ella; en la BD todo se guarda en UTC
+    LOCAL_TIMEZONE: str = "America/Lima"
+    # Lecturas más antiguas que esto (reenvíos) se guardan pero no se envían en vivo
+    LIVE_BROADCAST_MAX_AGE_SECONDS: float = 60.0
+    # Días que se recuerdan los (sensor_id, spool_id, seq) ya recibidos para descartar duplicados
+    DEDUP_RETENTION_DAYS: int = 30
+
+    # Minutos de lecturas con los que se calcula la mediana móvil de CO2 de cada sesión
+    # (la del baseline es la referencia al iniciar una clase)
+    BASELINE_MEDIAN_MINUTES: float = 30.0
+
+    # Emisiones e impuesto al carbono: CO2 exterior de referencia (si no hay baseline medido),
+    # tasa por defecto en USD por tonelada y hueco máximo entre lecturas que se considera continuo
+    OUTDOOR_CO2_PPM: float = 420.0
+    CARBON_TAX_USD_PER_TON: float = 11.0
+    EMISSIONS_MAX_GAP_SECONDS: float = 300.0
+
+    # Alertas: lotes de lecturas en espera de evaluación (si se llena, se descartan y se cuentan)
+    ALERTS_QUEUE_SIZE: int = 1000
+
+    # Borrado en segundo plano (clases eliminadas y retención): documentos por bloque y pausa entre bloques
+    DELETION_CHUNK_SIZE: int = 5000
+    DELETION_CHUNK_PAUSE_SECONDS: float = 0.1
+    # Días que se guardan las lecturas crudas del baseline y de las clases (0 = para siempre).
+    # Los rollups, rankings y totales de emisiones se conservan siempre
+    BASELINE_RETENTION_DAYS: int = 30
+    CLASS_READINGS_RETENTION_DAYS: int = 0
+    # Horas entre barridos de retención (entre todos los workers)
+    RETENTION_SWEEP_HOURS: float = 6.0
+
+    # Filas por bloque en la exportación CSV/Parquet (también el tamaño de lote del cursor)
+    EXPORT_CHUNK_ROWS: int = 5000
+
+    # Listas paginadas por cursor (/api/classes/page, /api/readings/raw): tamaño por defecto y máximo de página
+    PAGE_DEFAULT_LIMIT: int = 100
+    PAGE_MAX_LIMIT: int = 5000
+
+    # Logs: nivel, formato ("text" o "json") y escritura desde un hilo aparte (QueueHandler)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["text", "json"] = "text"
+    LOG_ASYNC: bool = False
+
+    # Métricas de Prometheus en /metrics (peticiones, MongoDB, WebSockets, planificador)
+    METRICS_ENABLED: bool = True
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,68 @@
+# app/core/container.py
+"""
+Contenedor de los subsistemas pesados de la aplicación (planificador, control de
+sensores, emisiones). Cada uno se registra con una función que lo crea, y se crea
+la primera vez que se pide: importar app.main no construye nada ni importa sus
+dependencias (NumPy en el caso de las emisiones).
+
+    container.get("emissions")                   # lo crea si hace falta
+    container.peek("scheduler")                  # None si nadie lo creó (ej. RUN_SCHEDULER=false)
+    Depends(container.provider("emissions"))     # como dependencia de FastAPI
+"""
+
+from datetime import timedelta
+from typing import Any, Callable
+
+from .config import settings
+
+
+class Container:
+    def __init__(self):
+        self._factories: dict[str, Callable[[], Any]] = {}
+        self._instances: dict[str, Any] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        if name in self._factories:
+            raise ValueError(f"Subsistema ya registrado: {name}")
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        if name not in self._instances:
+            self._instances[name] = self._factories[name]()
+        return self._instances[name]
+
+    def peek(self, name: str) -> Any | None:
+        """La instancia si ya se creó; no la crea."""
+        return self._instances.get(name)
+
+    def provider(self, name: str) -> Callable[[], Any]:
+        def provide():
+            return self.get(name)
+        return provide
+
+    def created(self) -> list[str]:
+        return list(self._instances)
+
+
+# Las importaciones van dentro de cada función para que no se hagan al importar la app
+
+def _scheduler():
+    from .scheduler import ClassScheduler
+    return ClassScheduler(catchup=timedelta(minutes=settings.SCHEDULER_CATCHUP_MINUTES))
+
+
+def _sensor_control():
+    from ..api.routers.sensor_control import SensorControlManager
+    return SensorControlManager(heartbeat_seconds=settings.SENSOR_HEARTBEAT_SECONDS)
+
+
+def _emissions():
+    from ..services.emissions import EmissionsService
+    return EmissionsService(max_gap=settings.EMISSIONS_MAX_GAP_SECONDS)
+
+
+# Creamos una instancia única del contenedor para toda la aplicación
+container = Container()
+container.register("scheduler", _scheduler)
+container.register("sensor_control", _sensor_control)
+container.register("emissions", _emissions)
@@ -0,0 +1,35 @@
+# app/core/jsonenc.py
+"""
+Serialización JSON de las respuestas que arma la aplicación a mano (caché del
+historial, listas paginadas). Si `orjson` está instalado (pip install orjson) se
+usa en lugar de json de la biblioteca estándar; el resultado es el mismo JSON
+compacto en UTF-8, unas cuantas veces más rápido.
+"""
+
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def orjson_available() -> bool:
+    return orjson is not None
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
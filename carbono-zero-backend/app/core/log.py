@@ -0,0 +1,67 @@
+# app/core/log.py
+
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from .config import settings
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Atributos propios de LogRecord; el resto vienen de `extra=` y van como campos del JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos pasados en `extra=`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """
+    Configura el logger raíz según LOG_LEVEL y LOG_FORMAT. Con LOG_ASYNC los registros
+    solo se encolan (QueueHandler) y un hilo aparte los formatea y escribe, para que
+    el event loop nunca espere a la consola o al disco.
+    """
+    global _listener
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    if settings.LOG_ASYNC:
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(QueueHandler(records))
+        _listener = QueueListener(records, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+    else:
+        root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+
+def stop_logging():
+    """Escribe los registros que quedan en la cola del modo asíncrono."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,288 @@
+# app/core/metrics.py
+"""
+Métricas en el formato de texto de Prometheus, servidas en /metrics.
+
+Implementación mínima sin dependencias (contadores, gauges e histogramas con
+etiquetas). Cada worker expone sus propios valores; Prometheus los distingue por
+instancia. Las etiquetas por sesión están acotadas por la cantidad de clases.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+from pymongo import monitoring
+
+# Buckets de latencia (segundos) para peticiones, consultas y envíos
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets para retrasos que pueden ser de minutos (planificador, lecturas reenviadas)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+REGISTRY: list["Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            # setdefault: si dos hilos (listener de pymongo) crean la misma serie, gana una
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def remove(self, *values):
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(child.get())}"]
+
+
+class _Value:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """El valor se calcula al exponer las métricas (profundidad de colas, etc.)."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self.labels().set_function(function)
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: "_HistogramValue"):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # El último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        """Context manager que observa lo que tarda el bloque (también con awaits dentro)."""
+        return _Timer(self)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def _render_child(self, key, child: _HistogramValue) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Métricas de la aplicación ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por router y ruta.",
+    ("router", "route", "method"),
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Peticiones HTTP por router, ruta y código de estado.",
+    ("router", "route", "method", "status"),
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds", "Duración de los comandos de MongoDB por comando y colección.",
+    ("command", "collection"),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "Comandos de MongoDB que fallaron.", ("command", "collection"),
+)
+DB_PIPELINE_SECONDS = Histogram(
+    "db_pipeline_duration_seconds", "Duración de las consultas de agregación de la aplicación.", ("pipeline",),
+)
+INGEST_FLUSH_SECONDS = Histogram(
+    "ingest_flush_duration_seconds", "Duración de cada escritura del buffer de ingesta (dedup + insert_many).",
+)
+INGEST_QUEUE_DEPTH = Gauge("ingest_queue_depth", "Lecturas en el buffer de ingesta esperando a escribirse.")
+SENSOR_READING_AGE_SECONDS = Histogram(
+    "sensor_reading_age_seconds", "Antigüedad de cada lectura al llegar a la API (uplink del sensor).",
+    ("sensor_id",), buckets=LAG_BUCKETS,
+)
+WS_CONNECTIONS = Gauge("websocket_connections", "Dashboards conectados por sesión.", ("session_id",))
+WS_SEND_SECONDS = Histogram(
+    "websocket_send_duration_seconds", "Duración del envío de cada mensaje a un dashboard.", ("session_id",),
+)
+WS_DROPPED = Counter(
+    "websocket_dropped_messages_total", "Mensajes descartados por clientes lentos.", ("session_id",),
+)
+SCHEDULER_LAG_SECONDS = Histogram(
+    "scheduler_event_lag_seconds", "Retraso entre la hora de un evento de clase y su procesamiento.",
+    ("kind",), buckets=LAG_BUCKETS,
+)
+SCHEDULER_TIMELINE_EVENTS = Gauge("scheduler_timeline_events", "Eventos de clase pendientes en la línea de tiempo.")
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Listener de pymongo que mide cada comando (find, aggregate, insert, ...)."""
+
+    def __init__(self):
+        self._started: dict[int, tuple[str, str]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        self._started[event.request_id] = (event.command_name, collection)
+
+    def _labels(self, event) -> tuple[str, str]:
+        return self._started.pop(event.request_id, (event.command_name, ""))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        MONGO_COMMAND_SECONDS.labels(*self._labels(event)).observe(event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        labels = self._labels(event)
+        MONGO_COMMAND_SECONDS.labels(*labels).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(*labels).inc()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP. La ruta se etiqueta con su plantilla
+    (/api/readings/history/{class_id}), no con la URL, para no multiplicar las series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            router = route.tags[0] if getattr(route, "tags", None) else "root"
+            HTTP_REQUEST_SECONDS.labels(router, path, scope["method"]).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(router, path, scope["method"], status["code"]).inc()
+
+
+# Creamos una instancia única del listener de MongoDB para toda la aplicación
+mongo_command_timer = MongoCommandTimer()
@@ -1,64 +1,172 @@
 # app/core/scheduler.py
 
-import httpx
-from datetime import datetime
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+import asyncio
+import heapq
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, time
+
 from beanie import PydanticObjectId
 
 from ..models.models import Class
-from ..api.routers.sessions import active_session_info  # Importamos el estado de la sesión
+from ..services.session_state import session_state, DEFAULT_SENSOR_ID, DEFAULT_SESSION_ID  # Estado compartido de sesiones
+from ..services.session_service import start_class_session, stop_sessions, ClassNotFoundError
+from .metrics import SCHEDULER_LAG_SECONDS, SCHEDULER_TIMELINE_EVENTS
+from .timeutils import LOCAL_TZ  # Zona horaria configurada en LOCAL_TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+
+# Días de eventos que se precalculan hacia adelante
+HORIZON = timedelta(days=8)
+# Como máximo se duerme esto entre revisiones, para extender el horizonte a tiempo
+MAX_SLEEP_SECONDS = 3600
+# Tras un error (ej. MongoDB caído) se reintenta con espera exponencial hasta este máximo
+RETRY_MAX_SECONDS = 60.0
+
 
-# La URL base de nuestra propia API
-API_BASE_URL = "http://localhost:8000"
+@dataclass(order=True)
+class ScheduleEvent:
+    when: datetime
+    # Los "stop" se ordenan antes que los "start" del mismo minuto (clases consecutivas)
+    priority: int
+    kind: str = field(compare=False)  # "start" o "stop"
+    class_id: str = field(compare=False)
+    class_name: str = field(compare=False)
+    sensor_id: str = field(compare=False)
+    ends_at: datetime = field(compare=False)
 
 
-async def check_schedules():
+def _parse_hhmm(value: str) -> time:
+    hours, minutes = value.split(":")
+    return time(int(hours), int(minutes))
+
+
+def build_events(classes: list[Class], since: datetime, until: datetime) -> list[ScheduleEvent]:
+    """Genera los eventos de inicio y fin de cada clase que caen en (since, until]."""
+    events = []
+    day = since.astimezone(LOCAL_TZ).date()
+    last_day = until.astimezone(LOCAL_TZ).date()
+    while day <= last_day:
+        for cls in classes:
+            if cls.schedule_day != day.weekday():
+                continue
+            try:
+                starts_at = datetime.combine(day, _parse_hhmm(cls.schedule_start), LOCAL_TZ)
+                ends_at = datetime.combine(day, _parse_hhmm(cls.schedule_end), LOCAL_TZ)
+            except ValueError:
+                logger.warning(f"⚠️ Horario inválido en la clase {cls.name}: {cls.schedule_start}-{cls.schedule_end}")
+                continue
+            sensor_id = cls.sensor_id or DEFAULT_SENSOR_ID
+            for kind, when, priority in (("start", starts_at, 1), ("stop", ends_at, 0)):
+                if since < when <= until:
+                    events.append(ScheduleEvent(when, priority, kind, str(cls.id), cls.name, sensor_id, ends_at))
+        day += timedelta(days=1)
+    return events
+
+
+class ClassScheduler:
     """
-    Esta es la tarea que se ejecutará cada minuto.
-    Revisa los horarios de las clases y decide si iniciar o detener una sesión.
+    Planificador de clases por eventos. Precalcula una línea de tiempo con los
+    próximos inicios y fines de clase y duerme hasta el siguiente evento. Solo
+    vuelve a leer las clases cuando cambian (ver `invalidate`). Si despierta
+    tarde, procesa todos los eventos vencidos desde la última vez.
     """
-    now = datetime.now()
-    current_day = now.weekday()  # Lunes = 0, Martes = 1, ...
-    current_time_str = now.strftime("%H:%M")
-
-    print(
-        f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] ⏰ Planificador ejecutándose... Día: {current_day}, Hora: {current_time_str}")
-
-    all_classes = await Class.find_all().to_list()
-    current_session_id = active_session_info["active_session_id"]
-
-    # Usamos un cliente HTTP asíncrono para hacer llamadas a nuestra propia API
-    async with httpx.AsyncClient() as client:
-        # Lógica para INICIAR una sesión
-        if current_session_id == "baseline_main":
-            for cls in all_classes:
-                # Comparamos el día y la hora de inicio
-                if cls.schedule_day == current_day and cls.schedule_start == current_time_str:
-                    print(f"✅ Coincidencia de INICIO encontrada para la clase: {cls.name}")
-                    try:
-                        # Llama al endpoint para iniciar la sesión
-                        await client.post(f"{API_BASE_URL}/api/sessions/start/{cls.id}")
-                        print(f"🚀 Orden de INICIO enviada para la clase {cls.id}")
-                        break  # Salimos del bucle para no iniciar múltiples clases a la vez
-                    except httpx.RequestError as e:
-                        print(f"❌ Error al enviar orden de INICIO: {e}")
-
-        # Lógica para DETENER una sesión
-        else:
-            # Buscamos la clase que está actualmente activa
-            active_class = await Class.get(PydanticObjectId(current_session_id))
-            if active_class:
-                # Comparamos el día y la hora de fin
-                if active_class.schedule_day == current_day and active_class.schedule_end == current_time_str:
-                    print(f"✅ Coincidencia de FIN encontrada para la clase: {active_class.name}")
-                    try:
-                        # Llama al endpoint para detener TODAS las sesiones
-                        await client.post(f"{API_BASE_URL}/api/sessions/stop")
-                        print(f"🛑 Orden de FIN enviada.")
-                    except httpx.RequestError as e:
-                        print(f"❌ Error al enviar orden de FIN: {e}")
-
-
-# Creamos una instancia del planificador
-scheduler = AsyncIOScheduler(timezone="America/Lima")  # Asegúrate que el timezone sea el correcto
-scheduler.add_job(check_schedules, 'interval', minutes=1)
\ No newline at end of file
+
+    def __init__(self, catchup: timedelta):
+        self.catchup = catchup
+        self._timeline: list[ScheduleEvent] = []
+        self._built_until: datetime | None = None
+        self._last_processed: datetime | None = None
+        self._needs_rebuild = True
+        self._retry_delay: float | None = None  # None mientras no haya errores
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            # Al arrancar se recuperan los eventos de la ventana de catch-up
+            self._last_processed = datetime.now(LOCAL_TZ) - self.catchup
+            SCHEDULER_TIMELINE_EVENTS.set_function(lambda: len(self._timeline))
+            # Evento nuevo en cada arranque: queda atado al event loop que lo usó
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def invalidate(self):
+        """Marca la línea de tiempo para recalcularla (se creó, editó o borró una clase)."""
+        self._needs_rebuild = True
+        self._wakeup.set()
+
+    async def _rebuild(self, now: datetime):
+        all_classes = await Class.find_all().to_list()
+        self._built_until = now + HORIZON
+        self._timeline = build_events(all_classes, self._last_processed, self._built_until)
+        heapq.heapify(self._timeline)
+        self._needs_rebuild = False
+        logger.info(f"🗓️ Línea de tiempo recalculada: {len(self._timeline)} eventos hasta {self._built_until:%Y-%m-%d %H:%M}.")
+
+    async def _run(self):
+        while True:
+            now = datetime.now(LOCAL_TZ)
+            try:
+                if self._needs_rebuild or self._built_until is None or now + timedelta(days=1) > self._built_until:
+                    await self._rebuild(now)
+                await self._process_due(now)
+                self._retry_delay = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._retry_delay = 1.0 if self._retry_delay is None else min(self._retry_delay * 2, RETRY_MAX_SECONDS)
+                logger.error(f"❌ Error en el planificador: {e}. Reintentando en {self._retry_delay:.0f} s...")
+
+            # Tras un error se espera al reintento, no al próximo evento (que puede estar vencido)
+            sleep_for = self._retry_delay or MAX_SLEEP_SECONDS
+            if self._timeline and self._retry_delay is None:
+                sleep_for = min(sleep_for, max(0.0, (self._timeline[0].when - datetime.now(LOCAL_TZ)).total_seconds()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process_due(self, now: datetime):
+        while self._timeline and self._timeline[0].when <= now:
+            event = heapq.heappop(self._timeline)
+            lag = (now - event.when).total_seconds()
+            SCHEDULER_LAG_SECONDS.labels(event.kind).observe(lag)
+            current_session_id = session_state.get_active(event.sensor_id)
+
+            if event.kind == "start":
+                # Un inicio perdido cuya clase ya terminó no se recupera
+                if event.ends_at <= now:
+                    continue
+                if current_session_id != DEFAULT_SESSION_ID:
+                    continue
+                logger.info(f"✅ INICIO de la clase {event.class_name} (retraso {lag:.0f} s)")
+                try:
+                    await start_class_session(PydanticObjectId(event.class_id), event.sensor_id)
+                    logger.info(f"🚀 Orden de INICIO enviada para la clase {event.class_id}")
+                except ClassNotFoundError:
+                    logger.warning(f"⚠️ La clase {event.class_id} ya no existe.")
+                except Exception:
+                    # Vuelve a la línea de tiempo para reintentarlo (ver `_run`)
+                    heapq.heappush(self._timeline, event)
+                    raise
+            elif current_session_id == event.class_id:
+                logger.info(f"✅ FIN de la clase {event.class_name} (retraso {lag:.0f} s)")
+                try:
+                    await stop_sessions(event.sensor_id)
+                except Exception:
+                    heapq.heappush(self._timeline, event)
+                    raise
+                logger.info(f"🛑 Orden de FIN enviada.")
+        self._last_processed = now
+
+
+# La instancia la crea el contenedor (app/core/container.py) solo en el proceso que
+# corre el planificador (RUN_SCHEDULER)
@@ -0,0 +1,85 @@
+# app/core/startup.py
+"""
+Estado del arranque de la aplicación. La conexión a MongoDB, los índices y los
+subsistemas se inician en segundo plano: el servidor acepta conexiones desde el
+primer momento y responde /health/live y /health/ready, y las demás rutas esperan
+a que el arranque termine (ver `wait_until_ready`).
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+
+from .config import settings
+
+
+class StartupState:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Vuelve a "starting"; se llama al comenzar cada arranque (lifespan)."""
+        self.status = "starting"  # "starting", "ready" o "failed"
+        self.error: str | None = None
+        # Segundos de cada paso del arranque, en el orden en que se hicieron
+        self.steps: dict[str, float] = {}
+        self.seconds: float | None = None
+        self._began = time.perf_counter()
+        self._done = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round(time.perf_counter() - started, 4)
+
+    def mark_ready(self):
+        self.status = "ready"
+        self.seconds = round(time.perf_counter() - self._began, 4)
+        self._done.set()
+
+    def mark_failed(self, error: Exception):
+        self.status = "failed"
+        self.error = f"{type(error).__name__}: {error}"
+        self._done.set()
+
+    def retry(self):
+        """Vuelve a "starting" para otro intento; conserva el error del anterior hasta que se supere."""
+        error = self.error
+        self.reset()
+        self.error = error
+
+    async def wait(self, timeout: float) -> bool:
+        """Espera a que termine el arranque; True si la app quedó lista."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    def as_dict(self) -> dict:
+        return {"status": self.status, "error": self.error, "seconds": self.seconds, "steps": self.steps}
+
+
+# Creamos una instancia única del estado de arranque para toda la aplicación
+startup = StartupState()
+
+
+async def wait_until_ready():
+    """
+    Dependencia de los routers de la API: una petición que llega mientras la app
+    arranca espera hasta STARTUP_WAIT_SECONDS en lugar de fallar contra una base
+    de datos que todavía no está inicializada.
+    """
+    if startup.ready:
+        return
+    if not await startup.wait(settings.STARTUP_WAIT_SECONDS):
+        raise HTTPException(status_code=503, detail="Service is starting, try again shortly")
@@ -0,0 +1,34 @@
+# app/core/timeutils.py
+
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from .config import settings
+
+# Zona horaria de las aulas: se usa para interpretar fechas sin zona y para los periodos
+LOCAL_TZ = ZoneInfo(settings.LOCAL_TIMEZONE)
+
+
+def utcnow() -> datetime:
+    """Hora actual en UTC sin tzinfo, que es como MongoDB devuelve las fechas."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """
+    Normaliza una fecha a UTC sin tzinfo para guardarla. Las fechas sin zona
+    (scripts antiguos, parámetros de consulta) se interpretan en la hora local.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=LOCAL_TZ)
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def as_utc(value: datetime) -> datetime:
+    """Marca como UTC una fecha leída de MongoDB, para que el JSON lleve '+00:00'."""
+    return value.replace(tzinfo=timezone.utc)
+
+
+def to_local(value: datetime) -> datetime:
+    """Convierte una fecha UTC sin tzinfo a la hora local de las aulas."""
+    return as_utc(value).astimezone(LOCAL_TZ)
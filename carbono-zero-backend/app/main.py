@@ -1,38 +1,270 @@
 # app/main.py
 
-from fastapi import FastAPI
+import asyncio
+import logging
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager
+from pymongo.errors import PyMongoError
 
 # --- CAMBIOS AQUÍ ---
 from .core.config import settings
-from .core.scheduler import scheduler  # Importamos nuestro planificador
-from .models.models import Class, SensorReading
-from .api.routers import classes, readings, reports, sessions, sensor_control
+from .core.log import configure_logging, stop_logging
+from .core import metrics
+from .core.container import container  # Planificador, control de sensores y emisiones, creados al usarlos
+from .core.startup import startup, wait_until_ready
+from .services.ingest_buffer import ingest_buffer
+from .services.pubsub import pubsub
+from .services.websocket_manager import manager
+from .services.session_state import session_state
+from .services import rollups, rankings, saved_emissions
+from .services.alerts import alert_engine, ALERT_RULES_CHANNEL
+from .services.deletion import deletion_worker
+from .services.latest import latest_readings, written_samples
+from .services.response_cache import history_cache, written_ranges, READINGS_CHANNEL
+from .models.models import (
+    Class, SensorReading, ReadingRollup, ClassAggregate, ActiveSession, ReadingReceipt, SessionEmissions,
+    AlertRule, Alert, DeletionJob,
+)
+from .api.routers import classes, readings, reports, sessions, sensor_control, alerts, jobs, health
+from .api.routers.classes import CLASSES_CHANNEL
 
+logger = logging.getLogger(__name__)
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+DOCUMENT_MODELS = [
+    Class, SensorReading, ReadingRollup, ClassAggregate, ActiveSession, ReadingReceipt, SessionEmissions,
+    AlertRule, Alert, DeletionJob,
+]
+# Índices reemplazados por otros con distinta clave; se borran al arrancar para que no sigan aplicándose
+LEGACY_INDEXES = {
+    ReadingReceipt: ["sensor_seq"],  # Ahora la clave incluye spool_id
+}
+# Espera máxima entre reintentos de conexión a MongoDB durante el arranque
+DB_RETRY_MAX_SECONDS = 30.0
+# Espera máxima entre intentos de arranque completos tras un fallo (ej. un índice que no se pudo crear)
+STARTUP_RETRY_MAX_SECONDS = 60.0
+
+
+async def on_classes_changed(message: dict):
+    # Cambió una clase: se recalcula la línea de tiempo y se descartan su historial y los rankings en caché.
+    # El planificador y las emisiones solo existen si este proceso ya los usó
+    scheduler = container.peek("scheduler")
+    if scheduler is not None:
+        scheduler.invalidate()
+    emissions = container.peek("emissions")
+    if emissions is not None:
+        emissions.forget_session(message["class_id"])
+    history_cache.invalidate_session(message["class_id"])
+    rankings.rankings_cache.invalidate()
+
+
+async def publish_written_ranges(readings: list[SensorReading]):
+    # Se avisa a todos los workers qué rangos de lecturas cambiaron, para invalidar sus cachés,
+    # junto con las lecturas para su caché de últimos valores
+    await pubsub.publish(READINGS_CHANNEL, {
+        "ranges": written_ranges(readings),
+        "samples": written_samples(readings),
+    })
+
+
+async def on_readings_written(message: dict):
+    latest_readings.apply_samples(message.get("samples", {}))
+    # Las alertas se evalúan en todos los workers sobre las mismas lecturas
+    alert_engine.submit_samples(message.get("samples", {}))
+    # Los totales de emisiones de hoy solo existen si este proceso ya los calculó
+    emissions = container.peek("emissions")
+    if emissions is not None:
+        emissions.apply_samples(message.get("samples", {}))
+    ranges = message["ranges"]
+    history_cache.invalidate_ranges(ranges)
+    # Los rankings solo dependen de las sesiones de clases, no del baseline
+    rankings.rankings_cache.invalidate_ranges({
+        session_id: bounds for session_id, bounds in ranges.items()
+        if rankings.CLASS_SESSION_RE.match(session_id)
+    })
+
+
+async def create_indexes(model):
+    # Beanie guarda los índices de `Settings` envueltos en IndexModelField
+    indexes = [getattr(index, "index", index) for index in model.get_settings().indexes or []]
+    collection = model.get_motor_collection()
+    if model in LEGACY_INDEXES:
+        existing = await collection.index_information()
+        for name in LEGACY_INDEXES[model]:
+            if name in existing:
+                await collection.drop_index(name)
+                logger.info(f"🧹 Índice obsoleto {name} borrado de {collection.name}.")
+    if indexes:
+        await collection.create_indexes(indexes)
+
+
+async def connect_database(client: AsyncIOMotorClient):
+    """Inicializa Beanie; si MongoDB todavía no responde (ej. arrancó después que la API), reintenta."""
+    delay = 1.0
+    while True:
+        try:
+            # Los índices se crean aparte y en paralelo (ver start_subsystems)
+            await init_beanie(database=client.get_default_database(), document_models=DOCUMENT_MODELS,
+                              skip_indexes=True)
+            return
+        except PyMongoError as e:
+            startup.error = f"{type(e).__name__}: {e}"
+            logger.warning(f"⚠️ MongoDB no responde ({e}). Reintentando en {delay:.0f} s...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, DB_RETRY_MAX_SECONDS)
+
+
+async def start_subsystems(client: AsyncIOMotorClient, stack: AsyncExitStack):
+    """
+    Arranque en segundo plano, mientras el servidor ya responde /health. Cada
+    subsistema que se inicia registra su parada en `stack`, así el cierre detiene
+    (en orden inverso) solo lo que llegó a arrancar.
+    """
     # Conexión a la base de datos
-    print("Iniciando conexión a la base de datos...")
-    client = AsyncIOMotorClient(settings.DATABASE_URL)
-    await init_beanie(database=client.get_default_database(), document_models=[Class, SensorReading])
-    print("✅ Conexión a la base de datos establecida.")
+    logger.info("Iniciando conexión a la base de datos...")
+    with startup.step("database"):
+        await connect_database(client)
+    startup.error = None
+    logger.info("✅ Conexión a la base de datos establecida.")
+
+    # Los índices se crean mientras siguen los demás pasos; en una base ya creada no cambian nada
+    indexes = asyncio.gather(*(create_indexes(model) for model in DOCUMENT_MODELS))
+
+    try:
+        # --- Pub/sub entre workers para WebSockets y comandos al sensor ---
+        with startup.step("pubsub"):
+            await pubsub.start(client.get_default_database())
+            stack.push_async_callback(pubsub.stop)
+            sensor_manager = container.get("sensor_control")
+            manager.attach_pubsub(pubsub)
+            sensor_manager.attach_pubsub(pubsub)
+            session_state.attach_pubsub(pubsub)
+            pubsub.subscribe(CLASSES_CHANNEL, on_classes_changed)
+            pubsub.subscribe(READINGS_CHANNEL, on_readings_written)
+            pubsub.subscribe(ALERT_RULES_CHANNEL, alert_engine.reload_rules)
+        logger.info(f"✅ Pub/sub iniciado ({settings.PUBSUB_BACKEND}).")
+
+        # --- Recuperar las sesiones activas y precargar las últimas lecturas y la mediana del baseline ---
+        with startup.step("state"):
+            await session_state.load()
+            await latest_readings.load()
 
-    # --- Iniciar el planificador ---
-    print("▶️ Iniciando el planificador de horarios...")
-    scheduler.start()
-    print("✅ Planificador iniciado.")
+        # --- Heartbeats con los sensores ---
+        sensor_manager.start()
+        stack.push_async_callback(sensor_manager.stop)
 
-    yield  # La aplicación se mantiene viva aquí
+        # --- Motor de alertas sobre las lecturas que llegan ---
+        with startup.step("alerts"):
+            await alert_engine.load()
+            alert_engine.attach_manager(manager)
+            alert_engine.start()
+            stack.push_async_callback(alert_engine.stop)
 
+        # --- Borrados en segundo plano y retención de lecturas ---
+        deletion_worker.start()
+        stack.push_async_callback(deletion_worker.stop)
+
+        # --- Iniciar el buffer de ingesta de lecturas ---
+        # Se detiene antes que las alertas y los borrados: sus últimas lecturas todavía se evalúan
+        if settings.ROLLUPS_ENABLED:
+            ingest_buffer.add_flush_listener(rollups.apply_readings)
+        ingest_buffer.add_flush_listener(rankings.apply_readings)
+        # Sin crear el servicio de emisiones (NumPy): solo borra totales guardados de días pasados
+        ingest_buffer.add_flush_listener(saved_emissions.forget_saved_days)
+        # Al final, cuando los agregados ya están actualizados
+        ingest_buffer.add_flush_listener(publish_written_ranges)
+        ingest_buffer.start()
+        stack.push_async_callback(stop_ingest_buffer)
+        metrics.INGEST_QUEUE_DEPTH.set_function(lambda: ingest_buffer.queue_depth)
+
+        with startup.step("indexes"):
+            await indexes
+    except BaseException:
+        indexes.cancel()
+        raise
+
+    # --- Iniciar el planificador (solo en el proceso con RUN_SCHEDULER) ---
+    if settings.RUN_SCHEDULER:
+        logger.info("▶️ Iniciando el planificador de horarios...")
+        scheduler = container.get("scheduler")
+        scheduler.start()
+        stack.callback(stop_scheduler, scheduler)
+        logger.info("✅ Planificador iniciado.")
+    else:
+        logger.info("⏭️ Este proceso no corre el planificador (RUN_SCHEDULER=false).")
+
+
+async def stop_ingest_buffer():
+    # --- Vaciar el buffer de ingesta antes de cerrar la conexión ---
+    logger.info("⏹️ Escribiendo lecturas pendientes...")
+    await ingest_buffer.stop()
+    logger.info(f"✅ Buffer de ingesta vaciado: {ingest_buffer.stats()}")
+
+
+def stop_scheduler(scheduler):
     # --- Detener el planificador de forma segura ---
-    print("⏹️ Deteniendo el planificador...")
+    logger.info("⏹️ Deteniendo el planificador...")
     scheduler.shutdown()
-    print("✅ Planificador detenido.")
-    print("Cerrando conexión.")
+    logger.info("✅ Planificador detenido.")
+
+
+async def run_startup(client: AsyncIOMotorClient, stack: AsyncExitStack):
+    """
+    Arranca los subsistemas; si algo falla, detiene lo que llegó a iniciarse y lo
+    reintenta con espera exponencial, así un fallo pasajero no deja la API caída.
+    """
+    delay = 1.0
+    while True:
+        attempt = AsyncExitStack()
+        try:
+            await start_subsystems(client, attempt)
+        except asyncio.CancelledError:
+            await attempt.aclose()
+            raise
+        except Exception as e:
+            logger.exception(f"❌ Falló el arranque: {e}. Reintentando en {delay:.0f} s...")
+            startup.mark_failed(e)
+            try:
+                await attempt.aclose()
+            except Exception as stop_error:
+                logger.error(f"❌ Error al detener el intento de arranque: {stop_error}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, STARTUP_RETRY_MAX_SECONDS)
+            startup.retry()
+            continue
+        # El cierre de la aplicación detiene lo que arrancó este intento
+        stack.push_async_callback(attempt.aclose)
+        break
+    startup.mark_ready()
+    logger.info(f"✅ Aplicación lista en {startup.seconds:.2f} s: {startup.steps}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El logging se configura al arrancar el servidor, no al importar la app
+    configure_logging()
+    startup.reset()
+    listeners = [metrics.mongo_command_timer] if settings.METRICS_ENABLED else []
+    client = AsyncIOMotorClient(settings.DATABASE_URL, event_listeners=listeners)
+    # El servidor empieza a aceptar conexiones ya; el resto del arranque sigue en segundo plano
+    # y las rutas de la API esperan a que termine (ver app/core/startup.py)
+    async with AsyncExitStack() as stack:
+        task = asyncio.create_task(run_startup(client, stack))
+
+        yield  # La aplicación se mantiene viva aquí
+
+        # Si el arranque no terminó, se corta; el stack detiene lo que sí llegó a iniciarse
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    logger.info("Cerrando conexión.")
+    stop_logging()
 
 
 app = FastAPI(title="Carbono Zero 683 API", lifespan=lifespan)
@@ -46,13 +278,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Incluimos los routers de la API
-app.include_router(classes.router, prefix="/api/classes", tags=["Classes"])
-app.include_router(readings.router, prefix="/api/readings", tags=["Sensor Readings"])
-app.include_router(reports.router, prefix="/api/reports", tags=["Reports"]) # <--- NUEVA LÍNEA
-app.include_router(sessions.router, prefix="/api/sessions", tags=["Sessions"]) # <--- NUEVA LÍNEA
-app.include_router(sensor_control.router, prefix="/ws/sensor-control", tags=["Sensor Control"]) # <--- NUEVA LÍNEA
+# Métricas de cada petición (latencia por router y ruta)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Incluimos los routers de la API; sus rutas esperan a que termine el arranque
+ready = [Depends(wait_until_ready)]
+app.include_router(classes.router, prefix="/api/classes", tags=["Classes"], dependencies=ready)
+app.include_router(readings.router, prefix="/api/readings", tags=["Sensor Readings"], dependencies=ready)
+app.include_router(reports.router, prefix="/api/reports", tags=["Reports"], dependencies=ready) # <--- NUEVA LÍNEA
+app.include_router(sessions.router, prefix="/api/sessions", tags=["Sessions"], dependencies=ready) # <--- NUEVA LÍNEA
+app.include_router(sensor_control.router, prefix="/ws/sensor-control", tags=["Sensor Control"], dependencies=ready) # <--- NUEVA LÍNEA
+app.include_router(alerts.router, prefix="/api/alerts", tags=["Alerts"], dependencies=ready)
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"], dependencies=ready)
+# Sondas de liveness y readiness: responden desde el primer momento
+app.include_router(health.router, prefix="/health", tags=["Health"])
 
 @app.get("/")
 def read_root():
-    return {"Proyecto": "Carbono Zero 683 API"}
\ No newline at end of file
+    return {"Proyecto": "Carbono Zero 683 API"}
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        """Métricas de este worker en el formato de texto de Prometheus."""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -1,8 +1,11 @@
 # app/models/models.py
-from beanie import Document, PydanticObjectId
-from pydantic import BaseModel, Field
-from typing import Optional
+from beanie import Document, PydanticObjectId, TimeSeriesConfig, Granularity
+from pydantic import BaseModel, Field, field_validator
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from typing import Literal, Optional
 from datetime import datetime, time
+from ..core.config import settings
+from ..core.timeutils import utcnow, to_utc_naive
 
 # Modelo de respuesta para el frontend
 class ClassOut(BaseModel):
@@ -15,6 +18,7 @@ class ClassOut(BaseModel):
     volume: float
     area: float
     ventilation: str
+    sensor_id: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -29,6 +33,7 @@ class Class(Document):
     volume: float
     area: float
     ventilation: str
+    sensor_id: Optional[str] = None  # Sensor del aula; None usa el sensor por defecto
 
     class Settings:
         name = "classes"
@@ -43,6 +48,7 @@ class UpdateClass(BaseModel):
     volume: Optional[float] = None
     area: Optional[float] = None
     ventilation: Optional[str] = None
+    sensor_id: Optional[str] = None
 
 # Modelo para las lecturas de sensores (sin cambios)
 class SensorReading(Document):
@@ -50,13 +56,230 @@ class SensorReading(Document):
     co2: float
     temperature: float
     humidity: float
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp: datetime = Field(default_factory=utcnow)  # Siempre en UTC
+    sensor_id: Optional[str] = None
+    seq: Optional[int] = None  # Número de secuencia del sensor, para descartar duplicados
+    spool_id: Optional[str] = None  # Cola del Pi que asignó `seq` (dos Pi repiten los mismos números)
 
     class Settings:
         name = "sensor_readings"
+        # Índice compuesto para historial, rankings y la búsqueda del último baseline
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("timestamp", DESCENDING)], name="session_id_timestamp"),
+        ]
+        # En modo "timeseries" la colección se crea como colección de series de tiempo.
+        # Beanie solo la crea si aún no existe; para datos antiguos ver app/scripts/migrate_readings.py
+        if settings.SENSOR_READINGS_STORAGE == "timeseries":
+            timeseries = TimeSeriesConfig(
+                time_field="timestamp",
+                meta_field="session_id",
+                granularity=Granularity.seconds,
+            )
 
-# Modelo para el payload que llega del sensor (sin cambios)
+# Modelo para el payload que llega del sensor
 class ReadingPayload(BaseModel):
     co2: float
     temperature: float
     humidity: float
+    timestamp: Optional[datetime] = None  # Hora de medición; si falta se usa la de llegada
+    sensor_id: Optional[str] = None
+    seq: Optional[int] = None
+    spool_id: Optional[str] = None
+
+    @field_validator("timestamp")
+    @classmethod
+    def normalize_timestamp(cls, value: Optional[datetime]) -> Optional[datetime]:
+        return to_utc_naive(value) if value is not None else None
+
+# Modelo para cada elemento del endpoint de ingesta por lotes
+class BatchReadingItem(ReadingPayload):
+    session_id: Optional[str] = None  # Si falta, se usa la sesión activa del sensor
+
+# Modelo para los agregados precalculados (rollups) de lecturas por intervalo
+class ReadingRollup(Document):
+    session_id: str
+    granularity: str  # "1m", "15m" o "1h"
+    bucket_start: datetime
+    samples: int = 0  # Lecturas del intervalo (no `count`: taparía Document.count)
+    co2_sum: float = 0.0
+    co2_min: float = 0.0
+    co2_max: float = 0.0
+    temperature_sum: float = 0.0
+    temperature_min: float = 0.0
+    temperature_max: float = 0.0
+    humidity_sum: float = 0.0
+    humidity_min: float = 0.0
+    humidity_max: float = 0.0
+
+    class Settings:
+        name = "reading_rollups"
+        indexes = [
+            IndexModel(
+                [("session_id", ASCENDING), ("granularity", ASCENDING), ("bucket_start", ASCENDING)],
+                name="session_granularity_bucket",
+                unique=True,
+            ),
+        ]
+
+# Modelo para los agregados acumulados de CO2 por clase y periodo (rankings)
+class ClassAggregate(Document):
+    session_id: str
+    period: str  # "all", "week:2025-W25" o "month:2025-06"
+    samples: int = 0  # Lecturas acumuladas (no `count`: taparía Document.count)
+    co2_sum: float = 0.0
+
+    class Settings:
+        name = "class_aggregates"
+        indexes = [
+            IndexModel([("period", ASCENDING), ("session_id", ASCENDING)], name="period_session", unique=True),
+        ]
+
+# Modelo para las sesiones activas, una por sensor o aula
+class ActiveSession(Document):
+    sensor_id: str
+    session_id: str
+    started_at: datetime = Field(default_factory=utcnow)
+
+    class Settings:
+        name = "active_sessions"
+        indexes = [
+            IndexModel([("sensor_id", ASCENDING)], name="sensor_id", unique=True),
+        ]
+
+# Modelo para los totales de emisiones de una clase en un día ya terminado (ver app/services/emissions.py)
+class SessionEmissions(Document):
+    session_id: str
+    day: str  # Fecha local "YYYY-MM-DD"
+    readings: int = 0
+    seconds: float = 0.0  # Tiempo cubierto por lecturas (sin contar los huecos)
+    co2_integral: float = 0.0  # Integral de CO2 en el tiempo (ppm·s)
+    co2_delta: float = 0.0  # Variación neta de CO2 en los intervalos válidos (ppm)
+    co2_max: float = 0.0
+    seconds_above_limit: float = 0.0
+    first_ts: Optional[float] = None
+    last_ts: Optional[float] = None
+    last_co2: Optional[float] = None
+    baseline_co2: float
+    computed_at: datetime = Field(default_factory=utcnow)
+
+    class Settings:
+        name = "session_emissions"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("day", ASCENDING)], name="session_day", unique=True),
+        ]
+
+# Modelo para las reglas de alerta (ver app/services/alerts.py)
+class AlertRule(Document):
+    name: str
+    session_id: Optional[str] = None  # None: se aplica a todas las clases
+    metric: Literal["co2", "temperature", "humidity"] = "co2"
+    kind: Literal["threshold", "rate_of_rise"] = "threshold"
+    direction: Literal["above", "below"] = "above"
+    threshold: float  # Valor límite, o ppm/min (unidades/min) en las reglas de subida
+    clear_threshold: Optional[float] = None  # Histéresis: valor para dar por resuelta la alerta
+    duration_seconds: float = 0.0  # Tiempo que debe mantenerse la condición (debounce)
+    window_seconds: float = 300.0  # Ventana para calcular la velocidad de subida
+    enabled: bool = True
+    key: Optional[str] = None  # Solo las reglas predeterminadas: evita crearlas dos veces
+
+    class Settings:
+        name = "alert_rules"
+        indexes = [
+            IndexModel(
+                [("key", ASCENDING)], name="key", unique=True,
+                partialFilterExpression={"key": {"$type": "string"}},
+            ),
+        ]
+
+# Modelo para crear o actualizar una regla de alerta
+class AlertRuleIn(BaseModel):
+    name: str
+    session_id: Optional[str] = None
+    metric: Literal["co2", "temperature", "humidity"] = "co2"
+    kind: Literal["threshold", "rate_of_rise"] = "threshold"
+    direction: Literal["above", "below"] = "above"
+    threshold: float
+    clear_threshold: Optional[float] = None
+    duration_seconds: float = Field(0.0, ge=0)
+    window_seconds: float = Field(300.0, gt=0)
+    enabled: bool = True
+
+# Modelo para las alertas disparadas
+class Alert(Document):
+    rule_id: PydanticObjectId
+    rule_name: str
+    session_id: str
+    sensor_id: Optional[str] = None
+    metric: str
+    kind: str
+    state: Literal["active", "resolved"] = "active"
+    value: float  # Valor observado al disparar (o ppm/min)
+    threshold: float
+    started_at: datetime
+    resolved_at: Optional[datetime] = None
+    # "<rule_id>:<session_id>" mientras está activa: una sola alerta activa por regla y
+    # sesión aunque varios workers detecten el mismo cambio
+    active_key: Optional[str] = None
+
+    class Settings:
+        name = "alerts"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("started_at", DESCENDING)], name="session_started"),
+            IndexModel([("state", ASCENDING)], name="state"),
+            IndexModel(
+                [("active_key", ASCENDING)], name="active_key", unique=True,
+                partialFilterExpression={"active_key": {"$type": "string"}},
+            ),
+        ]
+
+# Modelo para los borrados en segundo plano: cascada de una clase o barrido de retención
+# (ver app/services/deletion.py)
+class DeletionJob(Document):
+    kind: Literal["class", "retention"]
+    session_id: Optional[str] = None  # Clase borrada; None en los barridos de retención
+    baseline_cutoff: Optional[datetime] = None  # Retención: se borran las lecturas anteriores (UTC)
+    classes_cutoff: Optional[datetime] = None
+    status: Literal["pending", "running", "done", "failed"] = "pending"
+    total: dict[str, int] = {}  # Documentos por paso al empezarlo (progreso)
+    deleted: dict[str, int] = {}
+    completed_steps: list[str] = []
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None  # Si deja de avanzar, otro worker retoma el trabajo
+    unique_key: Optional[str] = None  # Barridos programados: uno por tipo y periodo aunque lo encolen varios workers
+
+    class Settings:
+        name = "deletion_jobs"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+            IndexModel(
+                [("unique_key", ASCENDING)], name="unique_key", unique=True,
+                partialFilterExpression={"unique_key": {"$type": "string"}},
+            ),
+        ]
+
+# Modelo para los (sensor_id, spool_id, seq) ya recibidos: evita guardar dos veces un reenvío
+class ReadingReceipt(Document):
+    sensor_id: str
+    spool_id: Optional[str] = None
+    seq: int
+    received_at: datetime = Field(default_factory=utcnow)
+    # Llamada a filter_new que creó el recibo, para deshacerla si falla a medias
+    batch_id: Optional[str] = None
+
+    class Settings:
+        name = "reading_receipts"
+        indexes = [
+            IndexModel(
+                [("sensor_id", ASCENDING), ("spool_id", ASCENDING), ("seq", ASCENDING)],
+                name="sensor_spool_seq",
+                unique=True,
+            ),
+            IndexModel(
+                [("received_at", ASCENDING)],
+                name="received_at_ttl",
+                expireAfterSeconds=settings.DEDUP_RETENTION_DAYS * 24 * 3600,
+            ),
+        ]
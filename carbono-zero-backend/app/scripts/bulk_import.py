@@ -0,0 +1,301 @@
+# app/scripts/bulk_import.py
+"""
+Carga masiva de lecturas en una base de datos en uso, desde:
+  - los CSV que escribe hardware/sensors/read-sensors.py (datos_scd30.csv) o los
+    exportados por /api/readings/export, y
+  - el volcado de mongodump en mongo-backup/CarbonoZero683 (archivos .bson).
+
+Las fuentes se leen en streaming, cada fila se valida con ReadingPayload/SensorReading
+y se escriben lotes con `insert_many(ordered=False)` en paralelo. Una lectura se
+considera duplicada si ya existe otra de la misma sesión y el mismo sensor con el
+mismo timestamp (al milisegundo), así que reimportar un archivo no duplica datos.
+
+Las horas sin zona (CSV de read-sensors.py y el volcado, anterior al paso a UTC)
+se interpretan en LOCAL_TIMEZONE; usar `--dump-times utc` si el volcado ya es UTC.
+Al terminar se recalculan los rollups y los rankings (salvo `--no-rebuild`).
+
+Uso (desde carbono-zero-backend/):
+    python -m app.scripts.bulk_import csv datos_scd30.csv otro.csv --session-id baseline_main --sensor-id pi-aula2
+    python -m app.scripts.bulk_import dump ../mongo-backup/CarbonoZero683 --with-classes
+"""
+
+import argparse
+import asyncio
+import csv
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import bson
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from ..core.config import settings
+from ..core.timeutils import to_utc_naive
+from ..models.models import Class, ClassAggregate, ReadingPayload, ReadingRollup, SensorReading
+from ..services.dedup import DUPLICATE_KEY_ERROR
+from ..services.rankings import rebuild_rankings
+from ..services.rollups import rebuild_rollups
+from ..services.session_state import DEFAULT_SESSION_ID
+
+PROGRESS_SECONDS = 5.0
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.inserted = 0
+        self.sessions: set[str] = set()
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.read / elapsed if elapsed else 0.0
+
+    def maybe_report(self):
+        now = time.perf_counter()
+        if now - self._last_report >= PROGRESS_SECONDS:
+            self._last_report = now
+            print(f"   … {self.read} filas leídas, {self.inserted} insertadas ({self.rate:,.0f} filas/s)")
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        return (
+            f"{self.read} filas en {elapsed:.1f} s ({self.rate:,.0f} filas/s): "
+            f"{self.inserted} insertadas, {self.duplicates} duplicadas, {self.invalid} inválidas"
+        )
+
+
+def truncate_ms(ts: datetime) -> datetime:
+    """MongoDB guarda las fechas al milisegundo; se recorta para comparar duplicados."""
+    return ts.replace(microsecond=ts.microsecond // 1000 * 1000)
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# --- Fuentes ---
+
+def csv_readings(paths: list[Path], session_id: str, sensor_id: str | None, stats: ImportStats) -> Iterator[SensorReading]:
+    """Lee CSV de read-sensors.py (co2_ppm, ...) o de la exportación del backend (co2, ...)."""
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                stats.read += 1
+                try:
+                    payload = ReadingPayload(
+                        co2=row.get("co2_ppm") or row.get("co2"),
+                        temperature=row.get("temperatura_c") or row.get("temperature"),
+                        humidity=row.get("humedad_pct") or row.get("humidity"),
+                        timestamp=row.get("timestamp"),
+                    )
+                except ValidationError:
+                    stats.invalid += 1
+                    continue
+                if payload.timestamp is None:
+                    stats.invalid += 1
+                    continue
+                yield SensorReading(
+                    session_id=session_id,
+                    sensor_id=row.get("sensor_id") or sensor_id,
+                    co2=payload.co2,
+                    temperature=payload.temperature,
+                    humidity=payload.humidity,
+                    timestamp=truncate_ms(payload.timestamp),
+                )
+
+
+def dump_readings(dump_dir: Path, local_times: bool, stats: ImportStats) -> Iterator[SensorReading]:
+    """Lee sensor_readings.bson del volcado sin cargar el archivo entero."""
+    with open(dump_dir / "sensor_readings.bson", "rb") as f:
+        for doc in bson.decode_file_iter(f):
+            stats.read += 1
+            try:
+                reading = SensorReading.model_validate(doc)
+            except ValidationError:
+                stats.invalid += 1
+                continue
+            if local_times and "sensor_id" not in doc:
+                reading.timestamp = to_utc_naive(reading.timestamp)
+            reading.timestamp = truncate_ms(reading.timestamp)
+            yield reading
+
+
+def to_document(reading: SensorReading) -> dict:
+    # sensor_id se guarda aunque sea None: marca la lectura como ya convertida a UTC
+    doc = reading.model_dump(exclude={"id", "revision_id"})
+    if reading.id is not None:
+        doc["_id"] = reading.id
+    return doc
+
+
+# --- Escritura ---
+
+ReadingKey = tuple[str, str | None, datetime]
+
+
+def reading_key(reading: SensorReading) -> ReadingKey:
+    # Dos sensores pueden medir en el mismo milisegundo dentro de una sesión
+    return reading.session_id, reading.sensor_id, reading.timestamp
+
+
+async def existing_keys(readings: list[SensorReading]) -> set[ReadingKey]:
+    """Busca con el índice (session_id, timestamp) las lecturas del lote que ya existen."""
+    ranges: dict[str, list[datetime]] = {}
+    for reading in readings:
+        bounds = ranges.setdefault(reading.session_id, [reading.timestamp, reading.timestamp])
+        bounds[0] = min(bounds[0], reading.timestamp)
+        bounds[1] = max(bounds[1], reading.timestamp)
+
+    keys = set()
+    collection = SensorReading.get_motor_collection()
+    for session_id, (start, end) in ranges.items():
+        cursor = collection.find(
+            {"session_id": session_id, "timestamp": {"$gte": start, "$lte": end}},
+            {"_id": 0, "timestamp": 1, "sensor_id": 1},
+        )
+        async for doc in cursor:
+            keys.add((session_id, doc.get("sensor_id"), doc["timestamp"]))
+    return keys
+
+
+def claim_keys(readings: list[SensorReading], in_flight: set[ReadingKey], stats: ImportStats) -> list[SensorReading]:
+    """
+    Reserva las claves del lote antes de despacharlo. Descarta las repetidas dentro del
+    lote o en otro lote todavía en vuelo, que aún no aparecería en `existing_keys`.
+    """
+    claimed = []
+    for reading in readings:
+        key = reading_key(reading)
+        if key in in_flight:
+            stats.duplicates += 1
+            continue
+        in_flight.add(key)
+        claimed.append(reading)
+    return claimed
+
+
+async def write_batch(readings: list[SensorReading], stats: ImportStats):
+    existing = await existing_keys(readings)
+    docs = []
+    for reading in readings:
+        if reading_key(reading) in existing:
+            stats.duplicates += 1
+            continue
+        docs.append(to_document(reading))
+        stats.sessions.add(reading.session_id)
+    if not docs:
+        return
+
+    try:
+        result = await SensorReading.get_motor_collection().insert_many(docs, ordered=False)
+        stats.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        # Un _id repetido (volcado ya restaurado) no es un error: se cuenta como duplicado
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        stats.inserted += e.details.get("nInserted", 0)
+        stats.duplicates += len(errors)
+
+
+async def import_readings(readings: Iterable[SensorReading], stats: ImportStats, batch_size: int, workers: int):
+    """Escribe los lotes con hasta `workers` insert_many en vuelo a la vez."""
+    semaphore = asyncio.Semaphore(workers)
+    tasks: list[asyncio.Task] = []
+    # Claves de los lotes en vuelo; se liberan cuando su insert_many terminó
+    in_flight: set[ReadingKey] = set()
+
+    def finished(keys: list[ReadingKey]):
+        in_flight.difference_update(keys)
+        semaphore.release()
+
+    # Se adquiere antes de leer el siguiente lote, así solo hay `workers` lotes en memoria
+    for batch in batched(readings, batch_size):
+        await semaphore.acquire()
+        batch = claim_keys(batch, in_flight, stats)
+        task = asyncio.create_task(write_batch(batch, stats))
+        task.add_done_callback(lambda _, keys=[reading_key(r) for r in batch]: finished(keys))
+        tasks.append(task)
+        stats.maybe_report()
+        # Deja correr las escrituras mientras se lee la fuente
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+
+async def import_classes(dump_dir: Path):
+    path = dump_dir / "classes.bson"
+    with open(path, "rb") as f:
+        docs = [Class.model_validate(doc) for doc in bson.decode_file_iter(f)]
+    if not docs:
+        return
+    inserted = duplicates = 0
+    try:
+        result = await Class.get_motor_collection().insert_many([to_document(doc) for doc in docs], ordered=False)
+        inserted = len(result.inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        inserted, duplicates = e.details.get("nInserted", 0), len(errors)
+    print(f"✅ Clases: {inserted} insertadas, {duplicates} ya existían.")
+
+
+async def run(args):
+    client = AsyncIOMotorClient(settings.DATABASE_URL)
+    await init_beanie(database=client.get_default_database(), document_models=[
+        Class, SensorReading, ReadingRollup, ClassAggregate,
+    ])
+
+    stats = ImportStats()
+    if args.source == "csv":
+        readings = csv_readings(args.paths, args.session_id, args.sensor_id, stats)
+    else:
+        dump_dir = args.paths[0]
+        if args.with_classes:
+            await import_classes(dump_dir)
+        readings = dump_readings(dump_dir, args.dump_times == "local", stats)
+
+    print(f"📥 Importando lecturas ({args.source}) en lotes de {args.batch_size} con {args.workers} escrituras en paralelo...")
+    await import_readings(readings, stats, args.batch_size, args.workers)
+    print(f"✅ {stats.summary()}")
+
+    if args.rebuild and stats.inserted:
+        started = time.perf_counter()
+        for session_id in sorted(stats.sessions):
+            await rebuild_rollups(session_id=session_id)
+        await rebuild_rankings()
+        print(f"✅ Rollups y rankings recalculados en {time.perf_counter() - started:.1f} s.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa lecturas desde CSV o desde un volcado de mongodump.")
+    parser.add_argument("source", choices=["csv", "dump"])
+    parser.add_argument("paths", nargs="+", type=Path,
+                        help="Archivos CSV, o la carpeta del volcado (p. ej. mongo-backup/CarbonoZero683).")
+    parser.add_argument("--session-id", default=DEFAULT_SESSION_ID, help="Sesión de las lecturas de un CSV.")
+    parser.add_argument("--sensor-id", default=None, help="Sensor que generó el CSV.")
+    parser.add_argument("--with-classes", action="store_true", help="Importa también classes.bson del volcado.")
+    parser.add_argument("--dump-times", choices=["local", "utc"], default="local",
+                        help="Zona de las horas del volcado (los anteriores al paso a UTC están en hora local).")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--no-rebuild", dest="rebuild", action="store_false",
+                        help="No recalcula rollups ni rankings al terminar.")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
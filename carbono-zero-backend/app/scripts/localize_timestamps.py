@@ -0,0 +1,62 @@
+# app/scripts/localize_timestamps.py
+"""
+Convierte a UTC los `timestamp` de las lecturas antiguas, que se guardaban con la
+hora local del servidor (datetime.now()) sin zona horaria. Desde que las lecturas
+se guardan en UTC, las antiguas quedan desfasadas en el historial y los rollups.
+
+Solo se tocan las lecturas anteriores a `--before` (el momento en que se actualizó
+el backend), así que es seguro ejecutarlo una sola vez. Debe correrse antes de
+migrar a una colección de series de tiempo, y después recalcular los agregados:
+    python -m app.scripts.localize_timestamps --before 2025-07-01T00:00
+    python -m app.scripts.rebuild_rollups
+    python -m app.scripts.rebuild_rankings
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from ..core.config import settings
+
+
+async def run(before: datetime, timezone: str):
+    client = AsyncIOMotorClient(settings.DATABASE_URL)
+    readings = client.get_default_database()["sensor_readings"]
+    # `before` está en hora local, igual que las lecturas que se van a convertir.
+    # Las lecturas nuevas siempre tienen el campo sensor_id (aunque sea null)
+    legacy_filter = {"timestamp": {"$lt": before}, "sensor_id": {"$exists": False}}
+    total = await readings.count_documents(legacy_filter)
+    print(f"🔁 Convirtiendo {total} lecturas de hora local ({timezone}) a UTC...")
+
+    # La hora guardada es la hora local "de pared": se separa en partes y se vuelve a
+    # armar indicando la zona horaria, con lo que MongoDB obtiene el instante UTC correcto
+    parts = {"$dateToParts": {"date": "$timestamp"}}
+    result = await readings.update_many(legacy_filter, [
+        {"$set": {"_parts": parts}},
+        {"$set": {
+            "timestamp": {"$dateFromParts": {
+                "year": "$_parts.year", "month": "$_parts.month", "day": "$_parts.day",
+                "hour": "$_parts.hour", "minute": "$_parts.minute", "second": "$_parts.second",
+                "millisecond": "$_parts.millisecond", "timezone": timezone,
+            }},
+            # Marca para no volver a convertirlas
+            "sensor_id": None,
+        }},
+        {"$unset": "_parts"},
+    ])
+    print(f"✅ {result.modified_count} lecturas convertidas.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte a UTC las lecturas antiguas guardadas en hora local.")
+    parser.add_argument("--before", type=datetime.fromisoformat, required=True,
+                        help="Hora local en la que se desplegó el backend que guarda en UTC.")
+    parser.add_argument("--timezone", default=settings.LOCAL_TIMEZONE)
+    args = parser.parse_args()
+    asyncio.run(run(args.before, args.timezone))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# app/scripts/migrate_readings.py
+"""
+Migra la colección `sensor_readings` existente a una colección de series de tiempo
+(timeField="timestamp", metaField="session_id") y crea los índices compuestos.
+
+Uso (desde carbono-zero-backend/):
+    python -m app.scripts.migrate_readings [--batch-size 5000] [--drop-legacy]
+
+Para datos del respaldo `mongo-backup`, primero restaurarlo con
+    mongorestore --uri "$DATABASE_URL" mongo-backup/
+y luego ejecutar este script. Las colecciones de series de tiempo no se pueden
+renombrar, así que la colección original se renombra a `sensor_readings_legacy`
+y se copian sus documentos por lotes a la nueva colección.
+
+Si se interrumpe, se puede volver a ejecutar: mientras exista
+`sensor_readings_legacy`, sigue copiando desde el último _id guardado en
+`migrations` y no duplica lo que ya se copió. La colección antigua solo se
+elimina (--drop-legacy) cuando todas sus lecturas están en la nueva.
+"""
+
+import argparse
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from ..core.config import settings
+
+COLLECTION = "sensor_readings"
+LEGACY_COLLECTION = "sensor_readings_legacy"
+# Último _id copiado de la colección antigua, para reanudar
+CHECKPOINTS_COLLECTION = "migrations"
+CHECKPOINT_ID = "sensor_readings_timeseries"
+INDEXES = [IndexModel([("session_id", ASCENDING), ("timestamp", DESCENDING)], name="session_id_timestamp")]
+
+
+async def is_timeseries(db, name: str) -> bool:
+    async for info in db.list_collections(filter={"name": name}):
+        return info.get("type") == "timeseries"
+    return False
+
+
+async def copy_batch(target, batch: list[dict]) -> int:
+    """Inserta las lecturas del lote que todavía no están en `target` (reanudaciones)."""
+    ids = [doc["_id"] for doc in batch]
+    timestamps = [doc["timestamp"] for doc in batch if doc.get("timestamp") is not None]
+    query = {"_id": {"$in": ids}}
+    if len(timestamps) == len(batch):
+        # El rango de tiempo permite a MongoDB leer solo los buckets del lote
+        query["timestamp"] = {"$gte": min(timestamps), "$lte": max(timestamps)}
+    present = {doc["_id"] async for doc in target.find(query, {"_id": 1})}
+    missing = [doc for doc in batch if doc["_id"] not in present]
+    if missing:
+        await target.insert_many(missing, ordered=False)
+    return len(missing)
+
+
+async def copy_legacy(db, batch_size: int) -> bool:
+    """Copia lo que falta de la colección antigua. Devuelve True si quedaron todas las lecturas."""
+    legacy = db[LEGACY_COLLECTION]
+    target = db[COLLECTION]
+    checkpoints = db[CHECKPOINTS_COLLECTION]
+    checkpoint = await checkpoints.find_one({"_id": CHECKPOINT_ID})
+    query = {"_id": {"$gt": checkpoint["last_id"]}} if checkpoint else {}
+    if checkpoint:
+        print(f"⏯️ Reanudando desde la lectura {checkpoint['last_id']}.")
+
+    total = await legacy.estimated_document_count()
+    copied = scanned = 0
+    started = time.perf_counter()
+    batch = []
+    async for doc in legacy.find(query, batch_size=batch_size).sort("_id", ASCENDING):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            copied += await copy_batch(target, batch)
+            scanned += len(batch)
+            await checkpoints.update_one({"_id": CHECKPOINT_ID}, {"$set": {"last_id": batch[-1]["_id"]}}, upsert=True)
+            batch = []
+            print(f"  {scanned} revisadas, {copied} copiadas (de ~{total})...")
+    if batch:
+        copied += await copy_batch(target, batch)
+        scanned += len(batch)
+        await checkpoints.update_one({"_id": CHECKPOINT_ID}, {"$set": {"last_id": batch[-1]["_id"]}}, upsert=True)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {copied} lecturas copiadas ({scanned} revisadas) en {elapsed:.1f} s.")
+
+    # Verificación: todas las lecturas antiguas (hasta el último _id) deben estar en la nueva colección.
+    # Las que la API escribió después de migrar tienen _id mayores y no entran en la cuenta
+    last = await legacy.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    legacy_count = await legacy.count_documents({})
+    migrated_count = await target.count_documents({"_id": {"$lte": last["_id"]}}) if last else 0
+    if migrated_count != legacy_count:
+        print(f"⚠️ La colección nueva tiene {migrated_count} de las {legacy_count} lecturas antiguas.")
+        return False
+    print(f"✅ Las {legacy_count} lecturas antiguas están en '{COLLECTION}'.")
+    return True
+
+
+async def migrate(batch_size: int, drop_legacy: bool):
+    client = AsyncIOMotorClient(settings.DATABASE_URL)
+    db = client.get_default_database()
+    existing = await db.list_collection_names()
+
+    if COLLECTION in existing and await is_timeseries(db, COLLECTION):
+        print(f"✅ '{COLLECTION}' ya es una colección de series de tiempo. Se aseguran los índices.")
+        await db[COLLECTION].create_indexes(INDEXES)
+        if LEGACY_COLLECTION not in existing:
+            return
+    else:
+        if COLLECTION in existing:
+            if LEGACY_COLLECTION in existing:
+                print(f"❌ Existen '{COLLECTION}' (sin series de tiempo) y '{LEGACY_COLLECTION}'. "
+                      f"Revísalas antes de migrar.")
+                return
+            print(f"🔁 Renombrando '{COLLECTION}' → '{LEGACY_COLLECTION}'...")
+            await db[COLLECTION].rename(LEGACY_COLLECTION)
+            # Una migración anterior ya terminada no debe servir de punto de partida
+            await db[CHECKPOINTS_COLLECTION].delete_one({"_id": CHECKPOINT_ID})
+
+        print(f"🆕 Creando '{COLLECTION}' como colección de series de tiempo...")
+        await db.create_collection(
+            COLLECTION,
+            timeseries={"timeField": "timestamp", "metaField": "session_id", "granularity": "seconds"},
+        )
+        await db[COLLECTION].create_indexes(INDEXES)
+
+        if LEGACY_COLLECTION not in await db.list_collection_names():
+            print("✅ No hay datos antiguos que copiar.")
+            return
+
+    complete = await copy_legacy(db, batch_size)
+    if drop_legacy and complete:
+        await db[LEGACY_COLLECTION].drop()
+        await db[CHECKPOINTS_COLLECTION].delete_one({"_id": CHECKPOINT_ID})
+        print(f"🗑️ '{LEGACY_COLLECTION}' eliminada.")
+    elif drop_legacy:
+        print(f"⚠️ No se elimina '{LEGACY_COLLECTION}': vuelve a ejecutar el script para completar la copia.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra sensor_readings a una colección de series de tiempo.")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop-legacy", action="store_true", help="Elimina la colección antigua al terminar.")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size, args.drop_legacy))
+
+
+if __name__ == "__main__":
+    main()
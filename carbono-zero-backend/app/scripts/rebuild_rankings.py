@@ -0,0 +1,34 @@
+# app/scripts/rebuild_rankings.py
+"""
+Recalcula los agregados por clase usados por /api/reports/class-rankings
+(periodos "all", semanal y mensual) a partir de `sensor_readings`.
+
+Uso (desde carbono-zero-backend/):
+    python -m app.scripts.rebuild_rankings
+"""
+
+import asyncio
+import time
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from ..core.config import settings
+from ..models.models import ClassAggregate, SensorReading
+from ..services.rankings import rebuild_rankings
+
+
+async def run():
+    client = AsyncIOMotorClient(settings.DATABASE_URL)
+    await init_beanie(database=client.get_default_database(), document_models=[SensorReading, ClassAggregate])
+    started = time.perf_counter()
+    await rebuild_rankings()
+    print(f"✅ Agregados por clase recalculados en {time.perf_counter() - started:.1f} s.")
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# app/scripts/rebuild_rollups.py
+"""
+Recalcula los rollups de lecturas (1m, 15m, 1h) a partir de `sensor_readings`.
+Útil tras migrar o restaurar datos antiguos, o si el cálculo incremental falló.
+
+Uso (desde carbono-zero-backend/):
+    python -m app.scripts.rebuild_rollups [--session-id <id>] [--start 2025-06-01T00:00] [--end 2025-07-01T00:00]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from ..core.config import settings
+from ..models.models import ReadingRollup, SensorReading
+from ..services.rollups import rebuild_rollups
+
+
+async def run(session_id: str | None, start: datetime | None, end: datetime | None):
+    client = AsyncIOMotorClient(settings.DATABASE_URL)
+    await init_beanie(database=client.get_default_database(), document_models=[SensorReading, ReadingRollup])
+    started = time.perf_counter()
+    await rebuild_rollups(session_id=session_id, start=start, end=end)
+    print(f"✅ Rollups recalculados en {time.perf_counter() - started:.1f} s.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula los rollups de lecturas.")
+    parser.add_argument("--session-id", default=None)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None)
+    args = parser.parse_args()
+    asyncio.run(run(args.session_id, args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# app/scripts/rename_count_fields.py
+"""
+Renombra el campo `count` a `samples` en los documentos guardados antes del
+cambio de nombre (un campo `count` tapaba el método Document.count de Beanie).
+
+Si la API nueva ya sumó lecturas en `samples`, se suman las dos cantidades, así
+que se puede ejecutar con la API corriendo y más de una vez.
+
+Uso (desde carbono-zero-backend/):
+    python -m app.scripts.rename_count_fields
+"""
+
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from ..core.config import settings
+
+COLLECTIONS = ["reading_rollups", "class_aggregates"]
+
+
+async def run():
+    client = AsyncIOMotorClient(settings.DATABASE_URL)
+    db = client.get_default_database()
+    for name in COLLECTIONS:
+        result = await db[name].update_many({"count": {"$exists": True}}, [
+            {"$set": {"samples": {"$add": [{"$ifNull": ["$samples", 0]}, "$count"]}}},
+            {"$unset": "count"},
+        ])
+        print(f"✅ '{name}': {result.modified_count} documentos actualizados.")
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
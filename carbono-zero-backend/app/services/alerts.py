@@ -0,0 +1,315 @@
+# app/services/alerts.py
+
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from beanie import PydanticObjectId
+from pymongo.errors import DuplicateKeyError
+
+from ..core.config import settings
+from ..core.timeutils import as_utc, utcnow
+from ..models.models import Alert, AlertRule, SensorReading
+from .rankings import CLASS_SESSION_RE
+
+logger = logging.getLogger(__name__)
+
+# Canal por el que se avisa a todos los workers que cambiaron las reglas
+ALERT_RULES_CHANNEL = "alert-rules-changed"
+
+# Reglas que se crean si la colección está vacía (una sola vez aunque arranquen varios workers)
+DEFAULT_RULES = [
+    {"key": "co2_high", "name": "CO2 alto", "metric": "co2", "kind": "threshold", "threshold": 1000.0,
+     "clear_threshold": 900.0, "duration_seconds": 300.0},
+    {"key": "co2_rising", "name": "CO2 subiendo rápido", "metric": "co2", "kind": "rate_of_rise", "threshold": 50.0,
+     "clear_threshold": 10.0, "duration_seconds": 60.0, "window_seconds": 300.0},
+]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class RuleState:
+    """Estado de una regla en una sesión: O(1) por lectura (la ventana es amortizada)."""
+    active: bool = False
+    since: Optional[float] = None  # Desde cuándo se cumple la condición de cambio (debounce)
+    last_ts: float = 0.0
+    alert_id: Optional[PydanticObjectId] = None
+    window: deque = field(default_factory=deque)
+
+
+@dataclass
+class AlertEvent:
+    transition: str  # "triggered" o "resolved"
+    rule: AlertRule
+    state: RuleState
+    session_id: str
+    sensor_id: Optional[str]
+    value: float
+    timestamp: datetime
+
+
+def observe(rule: AlertRule, state: RuleState, ts: float, value: float) -> Optional[float]:
+    """Valor que compara la regla: la lectura, o su velocidad (unidades/min) en la ventana."""
+    if rule.kind == "threshold":
+        return value
+    window = state.window
+    window.append((ts, value))
+    while window[0][0] < ts - rule.window_seconds:
+        window.popleft()
+    oldest_ts, oldest_value = window[0]
+    # Con menos de media ventana de datos la pendiente es puro ruido
+    if ts - oldest_ts < rule.window_seconds / 2:
+        return None
+    return (value - oldest_value) / (ts - oldest_ts) * 60
+
+
+def step(rule: AlertRule, state: RuleState, ts: float, observed: float) -> Optional[str]:
+    """
+    Avanza la máquina de estados de la regla. Se dispara cuando el valor supera el
+    umbral durante `duration_seconds` y se resuelve cuando vuelve del otro lado de
+    `clear_threshold` (histéresis) durante el mismo tiempo.
+    """
+    above = rule.direction == "above"
+    if not state.active:
+        changing = observed > rule.threshold if above else observed < rule.threshold
+    else:
+        clear = rule.threshold if rule.clear_threshold is None else rule.clear_threshold
+        changing = observed < clear if above else observed > clear
+
+    if not changing:
+        state.since = None
+        return None
+    if state.since is None:
+        state.since = ts
+    if ts - state.since < rule.duration_seconds:
+        return None
+    state.active = not state.active
+    state.since = None
+    return "triggered" if state.active else "resolved"
+
+
+class AlertEngine:
+    """
+    Evalúa las reglas de alerta sobre las lecturas escritas. Cada worker recibe todos
+    los lotes por pub/sub (READINGS_CHANNEL) y solo los encola (O(1)); una tarea de
+    fondo los evalúa, así que todos los workers llegan al mismo estado. Ante un cambio,
+    el primer worker que lo registra en `alerts` lo envía a los dashboards de la sesión.
+    """
+
+    def __init__(self, queue_size: int, publisher: Optional[Callable[[AlertEvent], Awaitable[None]]] = None):
+        self.queue_size = queue_size
+        self._queue: asyncio.Queue[list[SensorReading]] = asyncio.Queue(maxsize=queue_size)
+        self._publisher = publisher or self._persist_and_broadcast
+        self._task: asyncio.Task | None = None
+        self._manager = None
+        self._by_session: dict[str, list[AlertRule]] = {}
+        self._global: list[AlertRule] = []
+        self._states: dict[tuple[PydanticObjectId, str], RuleState] = {}
+
+        self.total_evaluated = 0
+        self.total_dropped = 0
+        self.total_triggered = 0
+        self.total_resolved = 0
+
+    def attach_manager(self, manager):
+        self._manager = manager
+
+    # --- Reglas y estado ---
+
+    def set_rules(self, rules: list[AlertRule]):
+        self._by_session, self._global = {}, []
+        for rule in rules:
+            if not rule.enabled:
+                continue
+            if rule.session_id is None:
+                self._global.append(rule)
+            else:
+                self._by_session.setdefault(rule.session_id, []).append(rule)
+        ids = {rule.id for rule in rules if rule.enabled}
+        self._states = {key: state for key, state in self._states.items() if key[0] in ids}
+
+    def rules_for(self, session_id: str) -> list[AlertRule]:
+        rules = self._by_session.get(session_id, [])
+        if CLASS_SESSION_RE.match(session_id):
+            return self._global + rules if rules else self._global
+        return rules
+
+    async def load(self):
+        """Carga las reglas (creando las predeterminadas) y recupera las alertas activas."""
+        if await AlertRule.find_all().count() == 0:
+            collection = AlertRule.get_motor_collection()
+            for rule in DEFAULT_RULES:
+                defaults = AlertRule(**rule).model_dump(exclude={"id", "revision_id"})
+                try:
+                    await collection.update_one({"key": rule["key"]}, {"$setOnInsert": defaults}, upsert=True)
+                except DuplicateKeyError:
+                    pass  # Otro worker la creó al mismo tiempo
+        await self.reload_rules()
+        async for alert in Alert.find(Alert.state == "active"):
+            state = self._states.setdefault((alert.rule_id, alert.session_id), RuleState())
+            state.active = True
+            state.alert_id = alert.id
+
+    async def reload_rules(self, message: dict | None = None):
+        self.set_rules(await AlertRule.find_all().to_list())
+
+    # --- Evaluación ---
+
+    def submit(self, readings: list[SensorReading]):
+        """Encola un lote para evaluar sin esperar; si la cola está llena se descarta."""
+        try:
+            self._queue.put_nowait(readings)
+        except asyncio.QueueFull:
+            self.total_dropped += len(readings)
+
+    def submit_samples(self, samples: dict[str, list[list]]):
+        """Encola un lote escrito en el formato de `written_samples` ([timestamp, co2, ...] por sesión)."""
+        readings = [
+            # model_construct: sin validación, solo para evaluar
+            SensorReading.model_construct(
+                session_id=session_id, timestamp=ts, co2=co2, temperature=temperature, humidity=humidity,
+                sensor_id=sensor_id,
+            )
+            for session_id, rows in samples.items()
+            if self.rules_for(session_id)
+            for ts, co2, temperature, humidity, sensor_id in rows
+        ]
+        if readings:
+            self.submit(readings)
+
+    def evaluate(self, readings: list[SensorReading]) -> list[AlertEvent]:
+        events = []
+        for reading in readings:
+            rules = self.rules_for(reading.session_id)
+            if not rules:
+                continue
+            ts = (reading.timestamp - _EPOCH).total_seconds()
+            for rule in rules:
+                key = (rule.id, reading.session_id)
+                state = self._states.get(key)
+                if state is None:
+                    state = self._states[key] = RuleState()
+                # Las lecturas atrasadas (reenvíos) no cambian el estado en vivo
+                if ts <= state.last_ts:
+                    continue
+                state.last_ts = ts
+                observed = observe(rule, state, ts, getattr(reading, rule.metric))
+                if observed is None:
+                    continue
+                transition = step(rule, state, ts, observed)
+                if transition:
+                    events.append(AlertEvent(
+                        transition, rule, state, reading.session_id, reading.sensor_id, observed, reading.timestamp,
+                    ))
+            self.total_evaluated += 1
+        return events
+
+    async def _run(self):
+        while True:
+            readings = await self._queue.get()
+            for event in self.evaluate(readings):
+                if event.transition == "triggered":
+                    self.total_triggered += 1
+                else:
+                    self.total_resolved += 1
+                try:
+                    await self._publisher(event)
+                except Exception as e:
+                    logger.error(f"No se pudo registrar la alerta '{event.rule.name}': {e}")
+
+    async def _persist_and_broadcast(self, event: AlertEvent):
+        # Todos los workers ven el mismo cambio; solo avisa a los dashboards el que lo registra
+        if event.transition == "triggered":
+            alert = Alert(
+                rule_id=event.rule.id,
+                rule_name=event.rule.name,
+                session_id=event.session_id,
+                sensor_id=event.sensor_id,
+                metric=event.rule.metric,
+                kind=event.rule.kind,
+                value=event.value,
+                threshold=event.rule.threshold,
+                started_at=event.timestamp,
+                active_key=f"{event.rule.id}:{event.session_id}",
+            )
+            try:
+                await alert.insert()
+            except DuplicateKeyError:
+                existing = await Alert.find_one(Alert.active_key == alert.active_key)
+                event.state.alert_id = existing.id if existing is not None else None
+                return
+            event.state.alert_id = alert.id
+        else:
+            event.state.alert_id = None
+            if not await resolve_alerts({"rule_id": event.rule.id, "session_id": event.session_id}, event.timestamp):
+                return
+
+        await self._broadcast(event.rule, "active" if event.transition == "triggered" else "resolved",
+                              event.value, event.timestamp, event.session_id)
+
+    async def _broadcast(self, rule: AlertRule, state: str, value: float, timestamp: datetime, session_id: str):
+        if self._manager is not None:
+            await self._manager.broadcast_to_session({
+                "type": "alert",
+                "state": state,
+                "rule_id": str(rule.id),
+                "rule": rule.name,
+                "metric": rule.metric,
+                "kind": rule.kind,
+                "value": round(value, 2),
+                "threshold": rule.threshold,
+                "timestamp": as_utc(timestamp),
+            }, session_id)
+
+    async def resolve_rule(self, rule: AlertRule):
+        """Resuelve las alertas activas de una regla borrada o desactivada y avisa a sus dashboards."""
+        now = utcnow()
+        active = await Alert.find(Alert.rule_id == rule.id, Alert.state == "active").to_list()
+        if not await resolve_alerts({"rule_id": rule.id}, now):
+            return
+        for alert in active:
+            await self._broadcast(rule, "resolved", alert.value, now, alert.session_id)
+
+    def start(self):
+        if self._task is None:
+            # Cola nueva en cada arranque: una asyncio.Queue queda atada al event loop que la usó
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "rules": len(self._global) + sum(len(rules) for rules in self._by_session.values()),
+            "tracked_states": len(self._states),
+            "active_alerts": sum(1 for state in self._states.values() if state.active),
+            "total_evaluated": self.total_evaluated,
+            "total_dropped": self.total_dropped,
+            "total_triggered": self.total_triggered,
+            "total_resolved": self.total_resolved,
+        }
+
+
+async def resolve_alerts(query: dict, resolved_at: datetime) -> bool:
+    """Marca como resueltas las alertas activas de `query`; False si ya no quedaba ninguna."""
+    result = await Alert.get_motor_collection().update_many(
+        {**query, "state": "active"},
+        {"$set": {"state": "resolved", "resolved_at": resolved_at}, "$unset": {"active_key": ""}},
+    )
+    return result.modified_count > 0
+
+
+# Creamos una instancia única del motor de alertas para toda la aplicación
+alert_engine = AlertEngine(queue_size=settings.ALERTS_QUEUE_SIZE)
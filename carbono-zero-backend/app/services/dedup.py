@@ -0,0 +1,106 @@
+# app/services/dedup.py
+
+import logging
+import uuid
+from collections import OrderedDict
+
+from pymongo.errors import BulkWriteError
+
+from ..models.models import ReadingReceipt, SensorReading
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class ReadingDeduplicator:
+    """
+    Descarta las lecturas con un (sensor_id, spool_id, seq) ya recibido, para que los
+    reintentos y reenvíos por lotes no se cuenten dos veces. Las lecturas sin seq siempre
+    pasan. `spool_id` identifica la cola del Pi que numeró la lectura: sin él, dos Pi con
+    el mismo sensor_id (o una cola vuelta a crear) se descartarían entre sí.
+    Primero se consulta una caché LRU en memoria y luego el índice único de
+    `reading_receipts`, que es la fuente de verdad compartida entre workers.
+    """
+
+    def __init__(self, cache_size: int = 100_000):
+        self.cache_size = cache_size
+        self._recent: OrderedDict[tuple[str, str | None, int], None] = OrderedDict()
+        self.total_duplicates = 0
+
+    @staticmethod
+    def _key(reading: SensorReading) -> tuple[str, str | None, int]:
+        return reading.sensor_id, reading.spool_id, reading.seq
+
+    def _remember(self, key: tuple[str, str | None, int]):
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        if len(self._recent) > self.cache_size:
+            self._recent.popitem(last=False)
+
+    async def filter_new(self, readings: list[SensorReading]) -> list[SensorReading]:
+        fresh: list[SensorReading] = []
+        keyed: list[SensorReading] = []
+        seen: set[tuple[str, str | None, int]] = set()
+        for reading in readings:
+            if reading.sensor_id is None or reading.seq is None:
+                fresh.append(reading)
+                continue
+            key = self._key(reading)
+            if key in seen or key in self._recent:
+                self.total_duplicates += 1
+                continue
+            seen.add(key)
+            keyed.append(reading)
+
+        if not keyed:
+            return fresh
+
+        batch_id = uuid.uuid4().hex
+        receipts = [
+            ReadingReceipt(sensor_id=r.sensor_id, spool_id=r.spool_id, seq=r.seq, batch_id=batch_id)
+            for r in keyed
+        ]
+        duplicated: set[int] = set()
+        try:
+            await ReadingReceipt.insert_many(receipts, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != DUPLICATE_KEY_ERROR:
+                    await self._undo(batch_id)
+                    raise
+                duplicated.add(error["index"])
+        except Exception:
+            await self._undo(batch_id)
+            raise
+
+        for index, reading in enumerate(keyed):
+            self._remember(self._key(reading))
+            if index in duplicated:
+                self.total_duplicates += 1
+            else:
+                fresh.append(reading)
+        return fresh
+
+    @staticmethod
+    async def _undo(batch_id: str):
+        # Solo los recibos de esta llamada: los de duplicados guardados antes se conservan
+        try:
+            await ReadingReceipt.get_motor_collection().delete_many({"batch_id": batch_id})
+        except Exception as e:
+            logger.error(f"No se pudieron borrar los recibos del lote {batch_id}: {e}")
+
+    async def forget(self, readings: list[SensorReading]):
+        """Borra los recibos de un lote que no se pudo guardar, para aceptar su reintento."""
+        keys = [self._key(r) for r in readings if r.sensor_id is not None and r.seq is not None]
+        if not keys:
+            return
+        for key in keys:
+            self._recent.pop(key, None)
+        await ReadingReceipt.get_motor_collection().delete_many(
+            {"$or": [{"sensor_id": sensor_id, "spool_id": spool_id, "seq": seq} for sensor_id, spool_id, seq in keys]}
+        )
+
+
+# Creamos una instancia única del deduplicador para toda la aplicación
+deduplicator = ReadingDeduplicator()
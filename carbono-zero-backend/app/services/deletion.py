@@ -0,0 +1,257 @@
+# app/services/deletion.py
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from beanie import Document, PydanticObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ..core.config import settings
+from ..core.timeutils import utcnow
+from ..models.models import (
+    Alert, AlertRule, ClassAggregate, DeletionJob, ReadingRollup, SensorReading, SessionEmissions,
+)
+from .alerts import ALERT_RULES_CHANNEL
+from .pubsub import pubsub
+from .session_state import DEFAULT_SESSION_ID
+
+logger = logging.getLogger(__name__)
+
+# Si un trabajo "running" no avanza en este tiempo (worker caído), otro lo retoma
+JOB_LEASE = timedelta(minutes=2)
+# Cada cuánto renueva su trabajo el worker que lo ejecuta, también durante un borrado largo
+HEARTBEAT_SECONDS = JOB_LEASE.total_seconds() / 4
+# Cada cuánto revisa un worker si hay trabajos creados por otros workers
+POLL_SECONDS = 30.0
+
+# Colecciones que dependen de una clase, en orden: primero las lecturas (lo más pesado)
+CLASS_CASCADE: list[tuple[str, type[Document]]] = [
+    ("sensor_readings", SensorReading),
+    ("reading_rollups", ReadingRollup),
+    ("class_aggregates", ClassAggregate),
+    ("session_emissions", SessionEmissions),
+    ("alerts", Alert),
+    ("alert_rules", AlertRule),
+]
+
+
+def job_steps(job: DeletionJob) -> list[tuple[str, type[Document], dict]]:
+    """Pasos (nombre, modelo, filtro) de un trabajo; siempre los mismos, para poder retomarlo."""
+    if job.kind == "class":
+        return [(name, model, {"session_id": job.session_id}) for name, model in CLASS_CASCADE]
+    steps = []
+    if job.baseline_cutoff is not None:
+        steps.append(("baseline_readings", SensorReading, {
+            "session_id": DEFAULT_SESSION_ID, "timestamp": {"$lt": job.baseline_cutoff},
+        }))
+    if job.classes_cutoff is not None:
+        steps.append(("class_readings", SensorReading, {
+            "session_id": {"$ne": DEFAULT_SESSION_ID}, "timestamp": {"$lt": job.classes_cutoff},
+        }))
+    return steps
+
+
+def retention_cutoffs(now: datetime) -> tuple[Optional[datetime], Optional[datetime]]:
+    baseline_days, classes_days = settings.BASELINE_RETENTION_DAYS, settings.CLASS_READINGS_RETENTION_DAYS
+    return (
+        now - timedelta(days=baseline_days) if baseline_days > 0 else None,
+        now - timedelta(days=classes_days) if classes_days > 0 else None,
+    )
+
+
+class DeletionWorker:
+    """
+    Borra datos en segundo plano y por bloques, para no bloquear las peticiones ni
+    saturar MongoDB: la cascada de una clase eliminada y los barridos de retención
+    de lecturas crudas. Cada trabajo se guarda en `deletion_jobs` con su progreso;
+    cualquier worker puede tomarlo, y si el que lo ejecutaba se cae otro lo retoma
+    desde el paso en que quedó.
+    """
+
+    def __init__(self, chunk_size: int, pause_seconds: float, sweep_interval: timedelta):
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.sweep_interval = sweep_interval
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.total_deleted = 0
+        self.jobs_done = 0
+        self.jobs_failed = 0
+
+    # --- Creación de trabajos ---
+
+    async def enqueue_class(self, session_id: str) -> DeletionJob:
+        job = DeletionJob(kind="class", session_id=session_id)
+        await job.insert()
+        self._wakeup.set()
+        return job
+
+    async def enqueue_retention(self, force: bool = False) -> Optional[DeletionJob]:
+        """
+        Programa un barrido de retención, salvo que ya haya uno pendiente o (sin
+        `force`) se haya hecho otro hace menos de `sweep_interval` en cualquier worker.
+        """
+        now = utcnow()
+        baseline_cutoff, classes_cutoff = retention_cutoffs(now)
+        if baseline_cutoff is None and classes_cutoff is None:
+            return None
+        recent = {"kind": "retention", "status": {"$in": ["pending", "running"]}}
+        if not force:
+            recent = {"kind": "retention", "$or": [
+                {"status": {"$in": ["pending", "running"]}},
+                {"created_at": {"$gt": now - self.sweep_interval}},
+            ]}
+        existing = await DeletionJob.find_one(recent)
+        if existing is not None:
+            return existing
+        job = DeletionJob(kind="retention", baseline_cutoff=baseline_cutoff, classes_cutoff=classes_cutoff)
+        if not force:
+            # Dos workers que revisan a la vez no encolan dos barridos del mismo periodo
+            period = int(now.timestamp() // self.sweep_interval.total_seconds())
+            job.unique_key = f"retention:{period}"
+        try:
+            await job.insert()
+        except DuplicateKeyError:
+            return await DeletionJob.find_one(DeletionJob.unique_key == job.unique_key)
+        self._wakeup.set()
+        return job
+
+    # --- Ejecución ---
+
+    async def _claim(self) -> Optional[DeletionJob]:
+        """Toma de forma atómica el trabajo pendiente más antiguo (o uno abandonado)."""
+        now = utcnow()
+        raw = await DeletionJob.get_motor_collection().find_one_and_update(
+            {"$or": [
+                {"status": "pending"},
+                {"status": "running", "heartbeat_at": {"$lt": now - JOB_LEASE}},
+            ]},
+            {"$set": {"status": "running", "heartbeat_at": now}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        return DeletionJob.model_validate(raw) if raw else None
+
+    async def _update(self, job_id: PydanticObjectId, changes: dict):
+        changes["heartbeat_at"] = utcnow()
+        await DeletionJob.get_motor_collection().update_one({"_id": job_id}, {"$set": changes})
+
+    async def _keep_alive(self, job_id: PydanticObjectId):
+        """Renueva el trabajo mientras corre: un solo delete_many o count_documents puede durar más que JOB_LEASE."""
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await DeletionJob.get_motor_collection().update_one(
+                    {"_id": job_id, "status": "running"}, {"$set": {"heartbeat_at": utcnow()}}
+                )
+            except Exception as e:
+                logger.warning(f"No se pudo renovar el borrado {job_id}: {e}")
+
+    async def _delete_step(self, job: DeletionJob, name: str, model: type[Document], query: dict):
+        collection = model.get_motor_collection()
+        if name not in job.total:
+            job.total[name] = await collection.count_documents(query)
+            await self._update(job.id, {f"total.{name}": job.total[name]})
+        deleted = job.deleted.get(name, 0)
+
+        if model is SensorReading and settings.SENSOR_READINGS_STORAGE == "timeseries":
+            # En series de tiempo el borrado por el meta_field descarta buckets enteros (barato);
+            # los filtros por fecha de la retención requieren MongoDB 7.0+
+            result = await collection.delete_many(query)
+            deleted += result.deleted_count
+            self.total_deleted += result.deleted_count
+        else:
+            while True:
+                ids = [doc["_id"] async for doc in collection.find(query, {"_id": 1}).limit(self.chunk_size)]
+                if not ids:
+                    break
+                result = await collection.delete_many({"_id": {"$in": ids}})
+                deleted += result.deleted_count
+                self.total_deleted += result.deleted_count
+                await self._update(job.id, {f"deleted.{name}": deleted})
+                # Pausa entre bloques para dejar pasar la ingesta y las consultas
+                await asyncio.sleep(self.pause_seconds)
+
+        job.deleted[name] = deleted
+        job.completed_steps.append(name)
+        await self._update(job.id, {f"deleted.{name}": deleted, "completed_steps": job.completed_steps})
+
+    async def _run_job(self, job: DeletionJob):
+        if job.started_at is None:
+            job.started_at = utcnow()
+            await self._update(job.id, {"started_at": job.started_at})
+        keep_alive = asyncio.create_task(self._keep_alive(job.id))
+        try:
+            for name, model, query in job_steps(job):
+                if name not in job.completed_steps:
+                    await self._delete_step(job, name, model, query)
+        except asyncio.CancelledError:
+            # Al apagar se devuelve a la cola; se retoma desde el último paso completado
+            await self._update(job.id, {"status": "pending"})
+            raise
+        except Exception as e:
+            self.jobs_failed += 1
+            logger.error(f"Falló el borrado {job.kind} {job.session_id or ''}: {e}")
+            await self._update(job.id, {"status": "failed", "error": str(e), "finished_at": utcnow()})
+            return
+        finally:
+            keep_alive.cancel()
+
+        await self._update(job.id, {"status": "done", "finished_at": utcnow()})
+        self.jobs_done += 1
+        total = sum(job.deleted.values())
+        logger.info(f"Borrado {job.kind} {job.session_id or ''} terminado: {total} documentos")
+        if job.kind == "class":
+            # La cascada incluye las reglas de alerta propias de la clase
+            await pubsub.publish(ALERT_RULES_CHANNEL, {"session_id": job.session_id})
+        # Las respuestas en caché que aún incluyan lecturas borradas por retención expiran
+        # solas (RESPONSE_CACHE_SECONDS); los rollups no cambian
+
+    async def _run(self):
+        while True:
+            try:
+                await self.enqueue_retention()
+                while (job := await self._claim()) is not None:
+                    await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en el worker de borrados: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            # Evento nuevo en cada arranque: queda atado al event loop que lo usó
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "total_deleted": self.total_deleted,
+            "jobs_done": self.jobs_done,
+            "jobs_failed": self.jobs_failed,
+        }
+
+
+# Creamos una instancia única del worker de borrados para toda la aplicación
+deletion_worker = DeletionWorker(
+    chunk_size=settings.DELETION_CHUNK_SIZE,
+    pause_seconds=settings.DELETION_CHUNK_PAUSE_SECONDS,
+    sweep_interval=timedelta(hours=settings.RETENTION_SWEEP_HOURS),
+)
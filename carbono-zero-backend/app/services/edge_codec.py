@@ -0,0 +1,121 @@
+# app/services/edge_codec.py
+"""
+Decodificador de los lotes compactos que envía el Pi (ver
+hardware/sensors/api_client/edge.py, que tiene el codificador).
+
+Formato v1, en JSON o msgpack (application/x-msgpack, requiere `msgpack`):
+
+    {
+      "v": 1,
+      "sensor_id": "default",
+      "sessions": ["baseline_main", "6855..."],   # Tabla de sesiones del lote
+      "sid": [[0, 12], [1, 30]],                  # Sesión por lectura, en tramos [índice, cantidad]
+      "t0": 1750000000000,                        # Hora de la primera lectura (epoch ms, UTC)
+      "dt": [0, 5000, 5000, ...],                 # Diferencia con la lectura anterior (ms)
+      "seq0": 1234, "dseq": [0, 1, 1, ...],       # Número de secuencia (opcional)
+      "spool_id": "9f86d081884c7d65",             # Cola del Pi que numeró las lecturas (opcional)
+      "co2": [6512, 3, -2, ...],                  # Primer valor y luego diferencias, en enteros
+      "temperature": [2231, 0, 1, ...],           # escalados por SCALES
+      "humidity": [4502, -10, ...]
+    }
+
+Las diferencias entre lecturas vecinas son enteros chicos, que en msgpack ocupan
+un byte y en JSON pocos caracteres.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+FORMAT_VERSION = 1
+# Enteros por unidad: CO2 en décimas de ppm, temperatura y humedad en centésimas
+SCALES = {"co2": 10, "temperature": 100, "humidity": 100}
+MSGPACK_TYPES = ("application/x-msgpack", "application/msgpack")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class UnsupportedEncoding(Exception):
+    pass
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def load_body(body: bytes, content_type: str) -> dict:
+    """Convierte el cuerpo de la petición (JSON o msgpack) en el diccionario del lote."""
+    if content_type.split(";")[0].strip().lower() in MSGPACK_TYPES:
+        if msgpack is None:
+            raise UnsupportedEncoding("msgpack")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise ValueError(f"msgpack inválido: {e}") from e
+    try:
+        return json.loads(body)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON inválido: {e}") from e
+
+
+def _undelta(values: list, count: int, name: str) -> list[int]:
+    if len(values) != count:
+        raise ValueError(f"'{name}' tiene {len(values)} valores y se esperaban {count}")
+    total, out = 0, []
+    for value in values:
+        total += int(value)
+        out.append(total)
+    return out
+
+
+def _expand_runs(runs: list, sessions: list, count: int) -> list:
+    # Se valida la suma de los tramos antes de expandirlos: un lote chico no puede pedir
+    # una lista arbitrariamente grande
+    total = 0
+    for _, run in runs:
+        if int(run) < 0:
+            raise ValueError(f"'sid' tiene un tramo negativo: {run}")
+        total += int(run)
+        if total > count:
+            raise ValueError(f"'sid' cubre más de {count} lecturas")
+    if total != count:
+        raise ValueError(f"'sid' cubre {total} lecturas y se esperaban {count}")
+    return [sessions[index] for index, run in runs for _ in range(int(run))]
+
+
+def decode(batch: dict) -> list[dict]:
+    """Reconstruye las lecturas del lote con el formato de BatchReadingItem."""
+    if not isinstance(batch, dict) or batch.get("v") != FORMAT_VERSION:
+        raise ValueError(f"Se esperaba un lote compacto v{FORMAT_VERSION}")
+    try:
+        count = len(batch["dt"])
+        offsets = _undelta(batch["dt"], count, "dt")
+        values = {name: _undelta(batch[name], count, name) for name in SCALES}
+        session_of = _expand_runs(batch["sid"], batch["sessions"], count)
+        t0 = _EPOCH + timedelta(milliseconds=batch["t0"])
+        timestamps = [t0 + timedelta(milliseconds=offset) for offset in offsets]
+        seqs = None
+        if batch.get("seq0") is not None:
+            seq0 = batch["seq0"]
+            if not isinstance(seq0, int) or isinstance(seq0, bool):
+                raise TypeError(f"'seq0' debe ser un entero, no {type(seq0).__name__}")
+            seqs = [seq0 + offset for offset in _undelta(batch.get("dseq", []), count, "dseq")]
+    except (KeyError, TypeError, IndexError, OverflowError) as e:
+        raise ValueError(f"Lote compacto inválido: {e!r}") from e
+
+    sensor_id = batch.get("sensor_id")
+    return [
+        {
+            "session_id": session_of[i],
+            "sensor_id": sensor_id,
+            "seq": seqs[i] if seqs is not None else None,
+            "spool_id": batch.get("spool_id"),
+            "timestamp": timestamps[i],
+            **{name: values[name][i] / scale for name, scale in SCALES.items()},
+        }
+        for i in range(count)
+    ]
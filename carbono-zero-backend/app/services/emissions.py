@@ -0,0 +1,280 @@
+# app/services/emissions.py
+"""
+Emisiones de CO2 por ocupación, tasa de ventilación estimada e impuesto al carbono
+por clase y día (fecha local).
+
+Modelo (balance de masa de CO2 en el aula, con la clase a aforo completo):
+  - Cada persona exhala CO2_GENERATION_LPS litros de CO2 por segundo.
+  - Emisiones (kg) = personas · generación · densidad del CO2 · tiempo con lecturas.
+  - Ventilación Q (m³/s): de V·dC/dt = N·G·1e6 − Q·(C − C0), integrado en el tiempo:
+        Q = (N·G·1e6·T − V·ΔC) / ∫(C − C0) dt
+    donde C0 es el CO2 del baseline (aula vacía) medido antes de la clase.
+  - Impuesto = toneladas emitidas · tasa (USD/tCO2).
+
+Los totales que se acumulan (tiempo, ∫C dt, ΔC, ...) no dependen del aforo, el
+volumen ni el baseline, así que se calculan una vez con NumPy y se guardan:
+los días terminados en `session_emissions`; el día en curso en memoria de cada
+worker, sumando cada lote escrito que llega por pub/sub (READINGS_CHANNEL).
+"""
+
+from dataclasses import dataclass, fields
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import DB_PIPELINE_SECONDS
+from ..core.timeutils import LOCAL_TZ, as_utc, to_local, to_utc_naive, utcnow
+from ..models.models import Class, SensorReading, SessionEmissions
+from .rankings import CLASS_SESSION_RE
+from .session_state import DEFAULT_SESSION_ID
+
+# CO2 exhalado por una persona sentada (adulto, actividad de aula): ~0.0052 L/s
+CO2_GENERATION_LPS = 0.0052
+# Densidad del CO2 a ~20 °C (g/L)
+CO2_DENSITY_G_PER_L = 1.84
+# Umbral de calidad de aire para contar el tiempo "por encima del límite"
+CO2_LIMIT_PPM = 1000.0
+# Horas de baseline antes de la clase que se promedian como CO2 exterior
+BASELINE_WINDOW = timedelta(hours=24)
+
+
+def from_epoch(ts: float) -> datetime:
+    """Segundos epoch a fecha UTC sin tzinfo, como las guarda MongoDB."""
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class EmissionsTotals:
+    """Sumas acumuladas de un día de clase; se pueden extender con más lecturas."""
+    readings: int = 0
+    seconds: float = 0.0
+    co2_integral: float = 0.0
+    co2_delta: float = 0.0
+    co2_max: float = 0.0
+    seconds_above_limit: float = 0.0
+    first_ts: float | None = None
+    last_ts: float | None = None
+    last_co2: float | None = None
+
+    def add(self, ts: np.ndarray, co2: np.ndarray, max_gap: float):
+        """
+        Suma lecturas ordenadas por tiempo y posteriores a `last_ts`. Los intervalos
+        más largos que `max_gap` (sensor apagado, clase interrumpida) no se cuentan.
+        """
+        if len(ts) == 0:
+            return
+        self.readings += len(ts)
+        self.co2_max = max(self.co2_max, float(co2.max()))
+        if self.first_ts is None:
+            self.first_ts = float(ts[0])
+        if self.last_ts is not None:
+            ts = np.concatenate(([self.last_ts], ts))
+            co2 = np.concatenate(([self.last_co2], co2))
+        self.last_ts, self.last_co2 = float(ts[-1]), float(co2[-1])
+
+        dt = np.diff(ts)
+        valid = (dt > 0) & (dt <= max_gap)
+        dt = dt[valid]
+        mid = ((co2[1:] + co2[:-1]) / 2)[valid]
+        self.seconds += float(dt.sum())
+        self.co2_integral += float((mid * dt).sum())
+        self.co2_delta += float(np.diff(co2)[valid].sum())
+        self.seconds_above_limit += float(dt[mid > CO2_LIMIT_PPM].sum())
+
+    @classmethod
+    def from_document(cls, doc: SessionEmissions) -> "EmissionsTotals":
+        return cls(**{f.name: getattr(doc, f.name) for f in fields(cls)})
+
+    def to_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+def summarize(totals: EmissionsTotals, occupants: int, volume: float, baseline: float, tax_rate: float) -> dict:
+    """Convierte los totales en emisiones, ventilación e impuesto para un aula concreta."""
+    seconds = totals.seconds
+    emissions_kg = occupants * CO2_GENERATION_LPS * CO2_DENSITY_G_PER_L * seconds / 1000
+    tax = emissions_kg / 1000 * tax_rate
+
+    ventilation_m3s = None
+    excess_integral = totals.co2_integral - baseline * seconds
+    # Con CO2 casi igual al baseline el cociente no es confiable (Q tiende a infinito)
+    if seconds and excess_integral > 50 * seconds:
+        generation_m3s = occupants * CO2_GENERATION_LPS / 1000
+        q = (generation_m3s * 1e6 * seconds - volume * totals.co2_delta) / excess_integral
+        ventilation_m3s = q if q > 0 else None
+
+    return {
+        "readings": totals.readings,
+        "start": as_utc(from_epoch(totals.first_ts)) if totals.first_ts else None,
+        "end": as_utc(from_epoch(totals.last_ts)) if totals.last_ts else None,
+        "occupied_minutes": round(seconds / 60, 1),
+        "occupants": occupants,
+        "baseline_co2": round(baseline, 1),
+        "avg_co2": round(totals.co2_integral / seconds, 1) if seconds else None,
+        "max_co2": round(totals.co2_max, 1) if totals.readings else None,
+        "minutes_above_limit": round(totals.seconds_above_limit / 60, 1),
+        "emissions_g": round(emissions_kg * 1000, 1),
+        "emissions_kg": round(emissions_kg, 4),
+        "emissions_kg_per_person": round(emissions_kg / occupants, 4) if occupants else None,
+        "ventilation_lps_per_person": (
+            round(ventilation_m3s * 1000 / occupants, 2) if ventilation_m3s and occupants else None
+        ),
+        "air_changes_per_hour": round(ventilation_m3s * 3600 / volume, 2) if ventilation_m3s and volume else None,
+        "tax_rate_usd_per_ton": tax_rate,
+        "carbon_tax_usd": round(tax, 6),
+        "carbon_tax_usd_per_person": round(tax / occupants, 6) if occupants else None,
+    }
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    """Inicio y fin (UTC) de un día local."""
+    start = datetime.combine(day, datetime.min.time())
+    return to_utc_naive(start), to_utc_naive(start + timedelta(days=1))
+
+
+async def load_arrays(session_id: str, start: datetime, end: datetime) -> tuple[np.ndarray, np.ndarray]:
+    """Lee timestamp y CO2 de las lecturas del rango directo a arreglos de NumPy."""
+    cursor = SensorReading.get_motor_collection().find(
+        {"session_id": session_id, "timestamp": {"$gte": start, "$lt": end}},
+        {"_id": 0, "timestamp": 1, "co2": 1},
+    ).sort("timestamp", 1).batch_size(10_000)
+    ts, co2 = [], []
+    with DB_PIPELINE_SECONDS.labels("emissions_arrays").time():
+        async for doc in cursor:
+            ts.append(as_utc(doc["timestamp"]).timestamp())
+            co2.append(doc["co2"])
+    return np.asarray(ts, dtype=np.float64), np.asarray(co2, dtype=np.float64)
+
+
+async def measured_baseline(before: datetime) -> float:
+    """CO2 promedio del baseline (aula vacía) en las horas previas; si no hay, el exterior."""
+    with DB_PIPELINE_SECONDS.labels("emissions_baseline").time():
+        result = await SensorReading.aggregate([
+            {"$match": {
+                "session_id": DEFAULT_SESSION_ID,
+                "timestamp": {"$gte": before - BASELINE_WINDOW, "$lt": before},
+            }},
+            {"$group": {"_id": None, "avg": {"$avg": "$co2"}}},
+        ]).to_list()
+    if result and result[0]["avg"] is not None:
+        return result[0]["avg"]
+    return settings.OUTDOOR_CO2_PPM
+
+
+class EmissionsService:
+    """
+    Calcula y guarda los totales por (clase, día). Los días ya terminados se leen de
+    `session_emissions`; el día de hoy se mantiene en memoria y se actualiza con cada
+    lote insertado (en cualquier worker), sin volver a leer las lecturas.
+    """
+
+    def __init__(self, max_gap: float):
+        self.max_gap = max_gap
+        self._live: dict[tuple[str, str], tuple[EmissionsTotals, float]] = {}
+        # Sube con cada lote aplicado: un cálculo que empezó antes no sabe si lo incluye
+        self._generation = 0
+
+    async def _compute(self, session_id: str, day: date) -> tuple[EmissionsTotals, float]:
+        start, end = day_bounds(day)
+        ts, co2 = await load_arrays(session_id, start, end)
+        totals = EmissionsTotals()
+        totals.add(ts, co2, self.max_gap)
+        before = from_epoch(totals.first_ts) if totals.first_ts else start
+        baseline = await measured_baseline(before)
+        return totals, baseline
+
+    async def get_totals(self, session_id: str, day: date) -> tuple[EmissionsTotals, float]:
+        key = (session_id, day.isoformat())
+        today = datetime.now(LOCAL_TZ).date()
+        if day >= today:
+            live = self._live.get(key)
+            if live is None:
+                generation = self._generation
+                live = await self._compute(session_id, day)
+                # Si mientras se leían las lecturas llegó un lote, no se sabe si quedó
+                # contado: se devuelve el resultado pero no se guarda en memoria
+                if generation == self._generation:
+                    self._live[key] = live
+            return live
+
+        # Día terminado: se guarda una sola vez
+        self._live.pop(key, None)
+        doc = await SessionEmissions.find_one(
+            SessionEmissions.session_id == session_id, SessionEmissions.day == key[1]
+        )
+        if doc is not None:
+            return EmissionsTotals.from_document(doc), doc.baseline_co2
+        totals, baseline = await self._compute(session_id, day)
+        if totals.readings:
+            await SessionEmissions.get_motor_collection().update_one(
+                {"session_id": session_id, "day": key[1]},
+                {"$set": {**totals.to_dict(), "baseline_co2": baseline, "computed_at": utcnow()}},
+                upsert=True,
+            )
+        return totals, baseline
+
+    async def get_class_day(self, cls: Class, day: date, tax_rate: float) -> dict:
+        totals, baseline = await self.get_totals(str(cls.id), day)
+        return {
+            "class_id": str(cls.id),
+            "day": day.isoformat(),
+            **summarize(totals, cls.capacity, cls.volume, baseline, tax_rate),
+        }
+
+    async def class_days(self, session_id: str, start: date, end: date) -> list[date]:
+        """Días locales del rango en los que la clase tiene lecturas."""
+        range_start, _ = day_bounds(start)
+        _, range_end = day_bounds(end)
+        with DB_PIPELINE_SECONDS.labels("emissions_days").time():
+            result = await SensorReading.aggregate([
+                {"$match": {"session_id": session_id, "timestamp": {"$gte": range_start, "$lt": range_end}}},
+                {"$group": {"_id": {"$dateToString": {
+                    "date": "$timestamp", "format": "%Y-%m-%d", "timezone": settings.LOCAL_TIMEZONE,
+                }}}},
+                {"$sort": {"_id": 1}},
+            ]).to_list()
+        return [date.fromisoformat(row["_id"]) for row in result]
+
+    def apply_samples(self, samples: dict[str, list[list]]):
+        """
+        Suma a los totales de hoy un lote recién escrito, en el formato de
+        `written_samples` ([timestamp, co2, ...] por sesión). Si llegan lecturas
+        atrasadas se descarta el total en memoria para recalcularlo.
+        """
+        batches: dict[tuple[str, str], list[list]] = {}
+        for session_id, rows in samples.items():
+            if not CLASS_SESSION_RE.match(session_id):
+                continue
+            for row in rows:
+                day = to_local(row[0]).date().isoformat()
+                batches.setdefault((session_id, day), []).append(row)
+        if not batches:
+            return
+        self._generation += 1
+
+        today = datetime.now(LOCAL_TZ).date().isoformat()
+        # Los días que ya terminaron dejan de mantenerse en memoria
+        for key in [key for key in self._live if key[1] < today]:
+            del self._live[key]
+
+        for key, batch in batches.items():
+            live = self._live.get(key)
+            if live is None:
+                continue
+            batch.sort(key=lambda row: row[0])
+            ts = np.fromiter((as_utc(row[0]).timestamp() for row in batch), dtype=np.float64, count=len(batch))
+            totals = live[0]
+            # Una lectura que no es posterior a la última sumada puede estar ya contada
+            if totals.last_ts is not None and ts[0] <= totals.last_ts:
+                del self._live[key]
+                continue
+            totals.add(ts, np.fromiter((row[1] for row in batch), dtype=np.float64, count=len(batch)), self.max_gap)
+
+    def forget_session(self, session_id: str):
+        for key in [key for key in self._live if key[0] == session_id]:
+            del self._live[key]
+
+
+# La instancia única la crea el contenedor (app/core/container.py) la primera vez que se
+# pide, para no importar NumPy al arrancar la app
@@ -0,0 +1,230 @@
+# app/services/export.py
+"""
+Exportación del historial de lecturas en CSV o Parquet sin cargarlo en memoria:
+se recorre la colección con un cursor y se emiten bloques de EXPORT_CHUNK_ROWS filas.
+Parquet es opcional y requiere `pyarrow` (pip install pyarrow).
+"""
+
+import csv
+import io
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+
+from ..core.config import settings
+from ..core.timeutils import as_utc
+from ..models.models import ReadingRollup, SensorReading
+from . import rollups
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dependencia opcional
+    pa = pq = None
+
+# Resoluciones disponibles: "raw" son las lecturas tal cual llegaron
+RESOLUTIONS: dict[str, timedelta | None] = {
+    "raw": None,
+    "1m": timedelta(minutes=1),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+
+_DATE_TRUNC = {
+    "1m": {"unit": "minute", "binSize": 1},
+    "15m": {"unit": "minute", "binSize": 15},
+    "1h": {"unit": "hour", "binSize": 1},
+    # Los días se cortan en la medianoche local, no en la de UTC
+    "1d": {"unit": "day", "binSize": 1, "timezone": settings.LOCAL_TIMEZONE},
+}
+
+RAW_COLUMNS = ["timestamp", "sensor_id", "co2", "temperature", "humidity"]
+BUCKET_COLUMNS = ["timestamp", "count"] + [
+    f"{metric}_{stat}" for metric in rollups.METRICS for stat in ("avg", "min", "max")
+]
+
+
+def columns_for(resolution: str) -> list[str]:
+    return RAW_COLUMNS if resolution == "raw" else BUCKET_COLUMNS
+
+
+def _time_filter(start: datetime | None, end: datetime | None) -> dict:
+    time_filter = {}
+    if start:
+        time_filter["$gte"] = start
+    if end:
+        time_filter["$lt"] = end
+    return time_filter
+
+
+def _raw_cursor(session_id: str, start: datetime | None, end: datetime | None):
+    query: dict = {"session_id": session_id}
+    if start or end:
+        query["timestamp"] = _time_filter(start, end)
+    projection = {"_id": 0, **{column: 1 for column in RAW_COLUMNS}}
+    return (
+        SensorReading.get_motor_collection()
+        .find(query, projection)
+        .sort("timestamp", 1)
+        .batch_size(settings.EXPORT_CHUNK_ROWS)
+    )
+
+
+def _rollup_cursor(session_id: str, granularity: str, start: datetime | None, end: datetime | None):
+    query: dict = {"session_id": session_id, "granularity": granularity}
+    if start or end:
+        query["bucket_start"] = _time_filter(start, end)
+    return (
+        ReadingRollup.get_motor_collection()
+        .find(query, {"_id": 0, "session_id": 0, "granularity": 0})
+        .sort("bucket_start", 1)
+        .batch_size(settings.EXPORT_CHUNK_ROWS)
+    )
+
+
+def _bucket_cursor(session_id: str, resolution: str, start: datetime | None, end: datetime | None):
+    match_filter: dict = {"session_id": session_id}
+    if start or end:
+        match_filter["timestamp"] = _time_filter(start, end)
+    group: dict = {
+        "_id": {"$dateTrunc": {"date": "$timestamp", **_DATE_TRUNC[resolution]}},
+        "count": {"$sum": 1},
+    }
+    for metric in rollups.METRICS:
+        group[f"{metric}_avg"] = {"$avg": f"${metric}"}
+        group[f"{metric}_min"] = {"$min": f"${metric}"}
+        group[f"{metric}_max"] = {"$max": f"${metric}"}
+    pipeline = [
+        {"$match": match_filter},
+        {"$group": group},
+        {"$sort": {"_id": 1}},
+        {"$set": {"timestamp": "$_id"}},
+        {"$project": {"_id": 0}},
+    ]
+    return SensorReading.get_motor_collection().aggregate(
+        pipeline, allowDiskUse=True, batchSize=settings.EXPORT_CHUNK_ROWS
+    )
+
+
+async def iter_rows(
+        session_id: str,
+        resolution: str = "raw",
+        start: datetime | None = None,
+        end: datetime | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Recorre las lecturas de una sesión en orden cronológico. Con una resolución
+    agregada, usa los rollups si cubren el rango y si no agrupa las lecturas crudas.
+    """
+    if resolution == "raw":
+        async for doc in _raw_cursor(session_id, start, end):
+            doc["timestamp"] = as_utc(doc["timestamp"])
+            yield doc
+        return
+
+    size = RESOLUTIONS[resolution]
+    granularity = None
+    if settings.ROLLUPS_ENABLED and resolution in rollups.GRANULARITIES:
+        granularity = rollups.pick_granularity(size, start, end)
+    if granularity == resolution:
+        async for doc in _rollup_cursor(session_id, granularity, start, end):
+            row = {"timestamp": as_utc(doc["bucket_start"]), "count": doc["samples"]}
+            for metric in rollups.METRICS:
+                row[f"{metric}_avg"] = doc[f"{metric}_sum"] / doc["samples"]
+                row[f"{metric}_min"] = doc[f"{metric}_min"]
+                row[f"{metric}_max"] = doc[f"{metric}_max"]
+            yield row
+        return
+
+    async for doc in _bucket_cursor(session_id, resolution, start, end):
+        doc["timestamp"] = as_utc(doc["timestamp"])
+        yield doc
+
+
+async def stream_csv(rows: AsyncIterator[dict], columns: list[str]) -> AsyncIterator[bytes]:
+    """Convierte las filas en CSV y lo entrega en bloques de EXPORT_CHUNK_ROWS filas."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    pending = 0
+    async for row in rows:
+        row["timestamp"] = row["timestamp"].isoformat()
+        writer.writerow(row)
+        pending += 1
+        if pending >= settings.EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Destino de escritura para pyarrow que acumula los bytes hasta que se retiran.
+    Lleva la posición total porque el pie del Parquet guarda offsets absolutos.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_schema(columns: list[str]):
+    fields = []
+    for column in columns:
+        if column == "timestamp":
+            fields.append(pa.field(column, pa.timestamp("ms", tz="UTC")))
+        elif column == "sensor_id":
+            fields.append(pa.field(column, pa.string()))
+        elif column == "count":
+            fields.append(pa.field(column, pa.int64()))
+        else:
+            fields.append(pa.field(column, pa.float64()))
+    return pa.schema(fields)
+
+
+async def stream_parquet(rows: AsyncIterator[dict], columns: list[str]) -> AsyncIterator[bytes]:
+    """Escribe un grupo de filas de Parquet por cada bloque y entrega sus bytes al momento."""
+    if pa is None:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow.")
+    schema = _parquet_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    batch: dict[str, list] = {column: [] for column in columns}
+    pending = 0
+    try:
+        async for row in rows:
+            for column in columns:
+                batch[column].append(row.get(column))
+            pending += 1
+            if pending >= settings.EXPORT_CHUNK_ROWS:
+                writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+                batch = {column: [] for column in columns}
+                pending = 0
+                yield sink.drain()
+        if pending:
+            writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def parquet_available() -> bool:
+    return pa is not None
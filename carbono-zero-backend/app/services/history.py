@@ -0,0 +1,153 @@
+# app/services/history.py
+
+from datetime import datetime, timedelta
+
+from ..core.config import settings
+from ..core.metrics import DB_PIPELINE_SECONDS
+from ..core.timeutils import to_local, to_utc_naive
+from ..models.models import SensorReading
+from . import rollups
+
+# Tamaños de bin posibles para el historial, del más fino al más grueso,
+# con su equivalente en $dateTrunc. Todos se alinean a la hora local.
+BIN_SIZES: dict[str, tuple[timedelta, dict]] = {
+    "1m": (timedelta(minutes=1), {"unit": "minute", "binSize": 1}),
+    "5m": (timedelta(minutes=5), {"unit": "minute", "binSize": 5}),
+    "15m": (timedelta(minutes=15), {"unit": "minute", "binSize": 15}),
+    "30m": (timedelta(minutes=30), {"unit": "minute", "binSize": 30}),
+    "1h": (timedelta(hours=1), {"unit": "hour", "binSize": 1}),
+    "3h": (timedelta(hours=3), {"unit": "hour", "binSize": 3}),
+    "6h": (timedelta(hours=6), {"unit": "hour", "binSize": 6}),
+    "12h": (timedelta(hours=12), {"unit": "hour", "binSize": 12}),
+    "1d": (timedelta(days=1), {"unit": "day", "binSize": 1}),
+    "1w": (timedelta(weeks=1), {"unit": "week", "binSize": 1, "startOfWeek": "monday"}),
+}
+
+# Bin usado cuando no se pide una cantidad máxima de puntos (comportamiento original)
+DEFAULT_BIN = "15m"
+
+# Con LTTB se agrupa primero en bins más finos y luego se eligen los puntos más representativos
+LTTB_OVERSAMPLE = 4
+
+
+def choose_bin(start: datetime, end: datetime, max_points: int) -> str:
+    """El bin más fino que deja el rango en `max_points` puntos o menos."""
+    span = end - start
+    for name, (size, _) in BIN_SIZES.items():
+        if span / size <= max_points:
+            return name
+    return name
+
+
+def floor_local(ts: datetime, bin_name: str) -> datetime:
+    """Inicio (UTC) del bin que contiene `ts`, con los bins alineados a la hora local."""
+    size = BIN_SIZES[bin_name][0]
+    wall = to_local(ts).replace(tzinfo=None)
+    if bin_name == "1w":
+        start = datetime.combine(wall.date() - timedelta(days=wall.weekday()), datetime.min.time())
+    else:
+        start = rollups.floor_time(wall, size)
+    return to_utc_naive(start)
+
+
+async def data_extent(session_id: str) -> tuple[datetime, datetime] | None:
+    """Primera y última lectura de la sesión (usa el índice session_id_timestamp)."""
+    collection = SensorReading.get_motor_collection()
+    projection = {"_id": 0, "timestamp": 1}
+    first = await collection.find_one({"session_id": session_id}, projection, sort=[("timestamp", 1)])
+    if first is None:
+        return None
+    last = await collection.find_one({"session_id": session_id}, projection, sort=[("timestamp", -1)])
+    return first["timestamp"], last["timestamp"]
+
+
+def build_history_pipeline(match_filter: dict, bin_name: str = DEFAULT_BIN) -> list:
+    """Pipeline que agrupa las lecturas en bins con promedio, mínimo y máximo de CO2."""
+    return [
+        {"$match": match_filter},
+        {
+            "$group": {
+                "_id": {
+                    "$dateTrunc": {
+                        "date": "$timestamp",
+                        **BIN_SIZES[bin_name][1],
+                        "timezone": settings.LOCAL_TIMEZONE,
+                    }
+                },
+                "avg_co2": {"$avg": "$co2"},
+                "min_co2": {"$min": "$co2"},
+                "max_co2": {"$max": "$co2"},
+                "count": {"$sum": 1},
+            }
+        },
+        {"$sort": {"_id": 1}},
+        {"$project": {
+            "timestamp": "$_id",
+            "co2": "$avg_co2",
+            "co2_min": "$min_co2",
+            "co2_max": "$max_co2",
+            "count": 1,
+            "_id": 0,
+        }}
+    ]
+
+
+async def get_history(
+        session_id: str,
+        bin_name: str = DEFAULT_BIN,
+        start: datetime | None = None,
+        end: datetime | None = None,
+) -> list[dict]:
+    """
+    Historial de CO2 agrupado en bins de `bin_name`. Se lee de los rollups si hay
+    uno alineado con el bin y el rango; si no, se agrupan las lecturas crudas.
+    """
+    if settings.ROLLUPS_ENABLED:
+        granularity = rollups.pick_granularity(BIN_SIZES[bin_name][0], start, end)
+        if granularity:
+            with DB_PIPELINE_SECONDS.labels(f"history_rollup_{granularity}").time():
+                return await rollups.read_history(
+                    session_id, granularity, lambda ts: floor_local(ts, bin_name), start, end
+                )
+
+    match_filter: dict = {"session_id": session_id}
+    if start or end:
+        match_filter["timestamp"] = {}
+        if start:
+            match_filter["timestamp"]["$gte"] = start
+        if end:
+            match_filter["timestamp"]["$lt"] = end
+    with DB_PIPELINE_SECONDS.labels("history_raw").time():
+        return await SensorReading.aggregate(build_history_pipeline(match_filter, bin_name)).to_list()
+
+
+def lttb(points: list[dict], threshold: int, value_key: str = "co2") -> list[dict]:
+    """
+    Largest-Triangle-Three-Buckets: reduce la serie a `threshold` puntos eligiendo
+    en cada tramo el que forma el triángulo más grande con sus vecinos, lo que
+    conserva los picos de CO2 que un promedio simple aplanaría.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points
+
+    xs = [point["timestamp"].timestamp() for point in points]
+    ys = [point[value_key] for point in points]
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Promedio del tramo siguiente, usado como tercer vértice
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, next_start):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
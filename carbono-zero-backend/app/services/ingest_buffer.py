@@ -0,0 +1,223 @@
+# app/services/ingest_buffer.py
+
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable, Callable
+
+from pymongo.errors import BulkWriteError
+
+from ..core.config import settings
+from ..core.metrics import INGEST_FLUSH_SECONDS
+from ..models.models import SensorReading
+from .dedup import deduplicator
+
+logger = logging.getLogger(__name__)
+
+
+class IngestBufferFull(Exception):
+    """El buffer llegó a su máximo; el cliente debe reintentar en `retry_after` segundos."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Buffer de ingesta lleno, reintentar en {retry_after} s")
+        self.retry_after = retry_after
+
+
+class IngestBuffer:
+    """
+    Buffer de escritura diferida (write-behind) para las lecturas de sensores.
+    Acumula los documentos que llegan por POST y los escribe con un solo
+    `insert_many` cuando se alcanza el tamaño máximo o el intervalo de tiempo.
+
+    Si la escritura falla (MongoDB caído), el lote vuelve al principio de la cola y
+    se reintenta con espera exponencial. Mientras tanto la cola puede crecer hasta
+    `max_pending`; al llenarse, `add` lanza IngestBufferFull y la API responde 503.
+    """
+
+    def __init__(self, max_size: int, flush_interval: float, max_pending: int = 50_000,
+                 retry_max_seconds: float = 30.0):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retry_max_seconds = retry_max_seconds
+        # Espera antes del próximo intento; 0 mientras las escrituras funcionan
+        self._retry_delay = 0.0
+        self._pending: list[SensorReading] = []
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Funciones que reciben cada lote ya insertado (rollups, agregados, etc.)
+        self._flush_listeners: list[Callable[[list[SensorReading]], Awaitable[None]]] = []
+
+        # Contadores expuestos en /api/readings/ingest-stats
+        self.total_enqueued = 0
+        self.total_flushed = 0
+        self.total_failed = 0
+        self.total_requeued = 0
+        self.total_rejected = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def add_flush_listener(self, listener: Callable[[list[SensorReading]], Awaitable[None]]):
+        # Cada arranque (lifespan o reintento) vuelve a registrarlos: un listener se agrega una sola vez
+        if listener not in self._flush_listeners:
+            self._flush_listeners.append(listener)
+
+    def start(self):
+        if self._task is None:
+            # Lock y evento nuevos en cada arranque: quedan atados al event loop que los usó
+            self._lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detiene el ciclo de fondo y escribe todo lo pendiente."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if not await self.flush():
+            logger.error(f"❌ No se pudieron escribir {len(self._pending)} lecturas pendientes al cerrar")
+
+    def retry_after(self) -> int:
+        """Segundos que conviene esperar antes de volver a enviar lecturas."""
+        return max(1, math.ceil(self._retry_delay or self.flush_interval))
+
+    async def add(self, readings: list[SensorReading]):
+        if len(self._pending) + len(readings) > self.max_pending:
+            self.total_rejected += len(readings)
+            raise IngestBufferFull(self.retry_after())
+        self._pending.extend(readings)
+        self.total_enqueued += len(readings)
+        if len(self._pending) >= self.max_size:
+            self._wakeup.set()
+
+    async def flush(self) -> bool:
+        """
+        Escribe lo pendiente en lotes de `max_size` (tras un corte de MongoDB la cola
+        puede tener hasta `max_pending`). Devuelve False si un lote falló y volvió a la cola.
+        """
+        async with self._lock:
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+                if not await self._write(batch):
+                    return False
+            return True
+
+    async def _write(self, batch: list[SensorReading]) -> bool:
+        started = time.perf_counter()
+        try:
+            # Se descartan los (sensor_id, spool_id, seq) ya recibidos en reintentos o reenvíos.
+            # Si falla, el deduplicador borra los recibos que alcanzó a crear
+            fresh = await deduplicator.filter_new(batch)
+        except Exception as e:
+            self._requeue(batch, e)
+            self._record(started, [])
+            return False
+
+        inserted = fresh
+        try:
+            if fresh:
+                # Sin orden: un documento inválido no frena al resto del lote
+                await SensorReading.insert_many(fresh, ordered=False)
+        except BulkWriteError as e:
+            # Se guardó todo menos los documentos con error; reintentarlos no cambiaría nada
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            inserted = [reading for index, reading in enumerate(fresh) if index not in failed]
+            rejected = [fresh[index] for index in sorted(failed)]
+            self.total_failed += len(rejected)
+            logger.error(f"No se pudieron escribir {len(rejected)} de {len(fresh)} lecturas: "
+                         f"{e.details.get('writeErrors', [{}])[0].get('errmsg')}")
+            await self._forget(rejected)
+        except Exception as e:
+            # Solo se borran los recibos de este lote: los duplicados ya guardados conservan el suyo
+            await self._forget(fresh)
+            self._requeue(batch, e)
+            self._record(started, [])
+            return False
+
+        self._retry_delay = 0.0
+        self._record(started, inserted)
+        await self._notify(inserted)
+        return True
+
+    def _requeue(self, batch: list[SensorReading], error: Exception):
+        # MongoDB no respondió: el lote vuelve al principio de la cola, en el mismo orden
+        self._pending[:0] = batch
+        self.total_requeued += len(batch)
+        self._retry_delay = min(max(self._retry_delay * 2, self.flush_interval, 0.5), self.retry_max_seconds)
+        logger.error(f"No se pudo escribir un lote de {len(batch)} lecturas: {error}. "
+                     f"Reintentando en {self._retry_delay:.1f} s ({len(self._pending)} pendientes)")
+
+    def _record(self, started: float, inserted: list[SensorReading]):
+        self.total_flushed += len(inserted)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+        INGEST_FLUSH_SECONDS.observe(elapsed_ms / 1000)
+
+    async def _notify(self, inserted: list[SensorReading]):
+        if not inserted:
+            return
+        for listener in self._flush_listeners:
+            try:
+                await listener(inserted)
+            except Exception as e:
+                logger.error(f"Error al procesar el lote en {listener.__qualname__}: {e}")
+
+    @staticmethod
+    async def _forget(readings: list[SensorReading]):
+        # Los recibos de lecturas que no se guardaron se borran para aceptar su reintento
+        try:
+            await deduplicator.forget(readings)
+        except Exception:
+            pass
+
+    async def _run(self):
+        while True:
+            if self._retry_delay:
+                # Tras un error se espera antes de reintentar, aunque la cola siga creciendo
+                await asyncio.sleep(self._retry_delay)
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "total_enqueued": self.total_enqueued,
+            "total_flushed": self.total_flushed,
+            "total_failed": self.total_failed,
+            "total_requeued": self.total_requeued,
+            "total_rejected": self.total_rejected,
+            "total_duplicates": deduplicator.total_duplicates,
+            "flush_count": self.flush_count,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+        }
+
+
+# Creamos una instancia única del buffer para toda la aplicación
+ingest_buffer = IngestBuffer(
+    max_size=settings.INGEST_BUFFER_MAX_SIZE,
+    flush_interval=settings.INGEST_BUFFER_FLUSH_SECONDS,
+    max_pending=settings.INGEST_BUFFER_MAX_PENDING,
+    retry_max_seconds=settings.INGEST_RETRY_MAX_SECONDS,
+)
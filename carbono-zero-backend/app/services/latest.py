@@ -0,0 +1,141 @@
+# app/services/latest.py
+
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from ..core.config import settings
+from ..core.timeutils import as_utc, utcnow
+from ..models.models import Class, SensorReading
+from .session_state import DEFAULT_SESSION_ID
+
+logger = logging.getLogger(__name__)
+
+
+class SessionWindow:
+    """
+    Última lectura de una sesión y el CO2 de los últimos minutos, con los valores
+    también ordenados para sacar la mediana sin recorrer la ventana.
+    """
+
+    __slots__ = ("latest", "samples", "sorted_co2")
+
+    def __init__(self):
+        self.latest: Optional[dict] = None
+        self.samples: deque[tuple[datetime, float]] = deque()
+        self.sorted_co2: list[float] = []
+
+    def add(self, timestamp: datetime, co2: float, reading: dict, window: timedelta):
+        if self.latest is None or timestamp >= self.latest["timestamp"]:
+            self.latest = reading
+        newest = self.latest["timestamp"]
+        if timestamp < newest - window:
+            return  # Reenvío fuera de la ventana: solo cuenta si es la última lectura
+        self.samples.append((timestamp, co2))
+        insort(self.sorted_co2, co2)
+        while self.samples and self.samples[0][0] < newest - window:
+            _, old = self.samples.popleft()
+            del self.sorted_co2[bisect_left(self.sorted_co2, old)]
+
+    def median(self) -> Optional[float]:
+        values = self.sorted_co2
+        if not values:
+            return None
+        mid = len(values) // 2
+        return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+class LatestReadingsCache:
+    """
+    Última lectura y mediana móvil de CO2 por sesión, en memoria. Se alimenta de
+    cada lote que escribe el buffer de ingesta (en todos los workers, vía pub/sub)
+    y se precarga desde la BD al arrancar, así que consultarla no toca MongoDB.
+    La mediana de `baseline_main` es la referencia de CO2 exterior del aula vacía.
+    """
+
+    def __init__(self, window: timedelta):
+        self.window = window
+        self._sessions: dict[str, SessionWindow] = {}
+
+    def _add(self, session_id: str, timestamp: datetime, co2: float, temperature: float,
+             humidity: float, sensor_id: Optional[str]):
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = SessionWindow()
+        state.add(timestamp, co2, {
+            "co2": co2, "temperature": temperature, "humidity": humidity,
+            "timestamp": timestamp, "sensor_id": sensor_id,
+        }, self.window)
+
+    def apply_samples(self, samples: dict[str, list[list]]):
+        """Aplica las muestras {session_id: [[timestamp, co2, temperature, humidity, sensor_id], ...]}."""
+        for session_id, rows in samples.items():
+            for row in rows:
+                self._add(session_id, *row)
+
+    def forget_session(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def load(self):
+        """Precarga la ventana de cada sesión (baseline y clases) con consultas por índice."""
+        session_ids = [DEFAULT_SESSION_ID] + [str(cls.id) for cls in await Class.find_all().to_list()]
+        since = utcnow() - self.window
+
+        async def warm(session_id: str):
+            readings = await SensorReading.find(
+                SensorReading.session_id == session_id, SensorReading.timestamp >= since
+            ).sort(+SensorReading.timestamp).to_list()
+            if not readings:
+                last = await SensorReading.find(
+                    SensorReading.session_id == session_id
+                ).sort(-SensorReading.timestamp).limit(1).first_or_none()
+                readings = [last] if last else []
+            self.apply_samples({session_id: sample_rows(readings)})
+
+        await asyncio.gather(*(warm(session_id) for session_id in session_ids))
+        logger.info(f"Caché de últimas lecturas precargada: {len(self._sessions)} sesiones")
+
+    def latest(self, session_id: str) -> Optional[dict]:
+        state = self._sessions.get(session_id)
+        if state is None or state.latest is None:
+            return None
+        return {
+            **state.latest,
+            "timestamp": as_utc(state.latest["timestamp"]),
+            "median_co2": state.median(),
+            "window_readings": len(state.samples),
+        }
+
+    def all_latest(self) -> dict[str, dict]:
+        entries = {session_id: self.latest(session_id) for session_id in self._sessions}
+        return {session_id: entry for session_id, entry in entries.items() if entry is not None}
+
+    def baseline_co2(self) -> float:
+        """Mediana móvil del CO2 del baseline; sin datos, el CO2 exterior configurado."""
+        state = self._sessions.get(DEFAULT_SESSION_ID)
+        if state is not None:
+            median = state.median()
+            if median is not None:
+                return median
+            if state.latest is not None:
+                return state.latest["co2"]
+        return settings.OUTDOOR_CO2_PPM
+
+
+def sample_rows(readings: list[SensorReading]) -> list[list]:
+    return [[r.timestamp, r.co2, r.temperature, r.humidity, r.sensor_id] for r in readings]
+
+
+def written_samples(readings: list[SensorReading]) -> dict[str, list[list]]:
+    """Muestras de un lote escrito, agrupadas por sesión, para enviarlas por pub/sub."""
+    by_session: dict[str, list[SensorReading]] = {}
+    for reading in readings:
+        by_session.setdefault(reading.session_id, []).append(reading)
+    return {session_id: sample_rows(rows) for session_id, rows in by_session.items()}
+
+
+# Creamos una instancia única de la caché de últimas lecturas para toda la aplicación
+latest_readings = LatestReadingsCache(window=timedelta(minutes=settings.BASELINE_MEDIAN_MINUTES))
@@ -0,0 +1,147 @@
+# app/services/pagination.py
+"""
+Paginación por cursor (keyset) y proyección de campos para las listas de clases
+y de lecturas crudas.
+
+En lugar de saltar documentos (skip), cada página pide los que siguen a la clave
+de orden del último enviado ((timestamp, _id) en las lecturas, _id en las clases).
+El índice resuelve la consulta y pedir la página 1000 cuesta lo mismo que la 1.
+El cursor es opaco para el cliente: se devuelve en `next_cursor` y se manda tal
+cual en la petición siguiente.
+
+La página se envía como JSON por partes, sin armar la lista completa en memoria:
+
+    {"items": [...], "next_cursor": "..."}   # next_cursor es null en la última página
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi.responses import StreamingResponse
+
+from ..core import jsonenc
+
+# Elementos que se serializan juntos antes de enviarse
+STREAM_CHUNK_ITEMS = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _pack(value):
+    if isinstance(value, datetime):
+        return {"d": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"o": str(value)}
+    return value
+
+
+def _unpack(value):
+    if isinstance(value, dict):
+        if "d" in value:
+            return datetime.fromisoformat(value["d"])
+        if "o" in value:
+            return ObjectId(value["o"])
+    return value
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([_pack(value) for value in values], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [_unpack(value) for value in json.loads(raw)]
+    except (ValueError, TypeError, InvalidId) as e:
+        raise InvalidCursor(str(e)) from e
+    if len(values) != size:
+        raise InvalidCursor(f"se esperaban {size} valores")
+    return values
+
+
+def keyset_filter(sort: list[tuple[str, int]], values: list) -> dict:
+    """
+    Filtro de los documentos que siguen a `values` en el orden `sort`. Para
+    [(timestamp, 1), (_id, 1)] queda: timestamp > t, o timestamp == t y _id > id.
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        branch[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        branches.append(branch)
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+
+def parse_fields(fields: str | None, allowed: Iterable[str], always: Iterable[str]) -> list[str]:
+    """
+    Convierte `fields=co2,timestamp` en la lista de campos a devolver. Sin `fields`
+    se devuelven todos. Los de `always` (id y claves del cursor) van siempre.
+    """
+    allowed = list(allowed)
+    if not fields:
+        return allowed
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return [field for field in allowed if field in requested or field in always]
+
+
+def mongo_projection(fields: list[str]) -> dict:
+    """Proyección de MongoDB para `fields`; el id de la API es el _id de la colección."""
+    projection = {("_id" if field == "id" else field): 1 for field in fields}
+    projection.setdefault("_id", 1)
+    return projection
+
+
+async def stream_page(
+        docs: AsyncIterator[dict],
+        limit: int,
+        sort: list[tuple[str, int]],
+        to_item: Callable[[dict], dict],
+) -> AsyncIterator[bytes]:
+    """
+    Envía como JSON una página leída de `docs`, un cursor pedido con `limit + 1`:
+    el documento de más solo indica que hay otra página y no se envía.
+    """
+    yield b'{"items":['
+    count, last, chunk = 0, None, []
+    async for doc in docs:
+        if count == limit:
+            break
+        chunk.append(to_item(doc))
+        count += 1
+        last = doc
+        if len(chunk) == STREAM_CHUNK_ITEMS:
+            # Una sola serialización por bloque; se quitan los corchetes de la lista
+            yield (b"," if count > len(chunk) else b"") + jsonenc.dumps(chunk)[1:-1]
+            chunk = []
+    else:
+        last = None  # No hubo documento de más: es la última página
+    if chunk:
+        yield (b"," if count > len(chunk) else b"") + jsonenc.dumps(chunk)[1:-1]
+    next_cursor = encode_cursor([last[field] for field, _ in sort]) if last is not None else None
+    yield b'],"next_cursor":' + jsonenc.dumps(next_cursor) + b"}"
+
+
+def paged_response(
+        collection,
+        query: dict,
+        sort: list[tuple[str, int]],
+        limit: int,
+        cursor: str | None,
+        fields: list[str],
+        to_item: Callable[[dict], dict],
+) -> StreamingResponse:
+    """Consulta una página de `collection` y la envía en streaming. Lanza InvalidCursor."""
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, len(sort)))]}
+    docs = collection.find(query, mongo_projection(fields)).sort(sort).limit(limit + 1).batch_size(limit + 1)
+    return StreamingResponse(stream_page(docs, limit, sort, to_item), media_type="application/json")
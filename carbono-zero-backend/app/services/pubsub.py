@@ -0,0 +1,158 @@
+# app/services/pubsub.py
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+# Al reanudar el cursor se releen los mensajes de esta ventana (margen para relojes desfasados entre nodos)
+RESUME_WINDOW = timedelta(minutes=5)
+
+
+class PubSubBackend:
+    """
+    Interfaz de publicación/suscripción entre procesos. Cada worker se suscribe a
+    los canales que le interesan y recibe todo lo que publique cualquier worker,
+    incluido él mismo.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, list[Handler]] = {}
+        # Identificador de este proceso, útil para saber quién publicó un mensaje
+        self.instance_id = uuid.uuid4().hex
+
+    def subscribe(self, channel: str, handler: Handler):
+        # Cada arranque (lifespan o reintento) vuelve a suscribir: un handler se registra una sola vez
+        handlers = self._handlers.setdefault(channel, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    async def _dispatch(self, channel: str, message: dict):
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(message)
+            except Exception as e:
+                logger.error(f"Error al procesar un mensaje del canal '{channel}': {e}")
+
+    async def start(self, database=None):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, channel: str, message: dict):
+        raise NotImplementedError
+
+
+class InMemoryPubSub(PubSubBackend):
+    """Backend local: entrega directa a los suscriptores del mismo proceso."""
+
+    async def publish(self, channel: str, message: dict):
+        await self._dispatch(channel, message)
+
+
+class MongoPubSub(PubSubBackend):
+    """
+    Backend entre procesos sobre una colección capped de MongoDB. Cada worker
+    sigue la colección con un cursor tailable, así que funciona también con un
+    mongod standalone (los change streams requieren un replica set).
+
+    Los mensajes se leen en orden natural (el de inserción). Al reanudar no se
+    filtra por _id: los ObjectId de distintos procesos no siguen el orden de
+    inserción, así que se relee desde un poco antes y se salta hasta el último
+    mensaje ya entregado.
+    """
+
+    def __init__(self, collection_name: str, size_bytes: int):
+        super().__init__()
+        self.collection_name = collection_name
+        self.size_bytes = size_bytes
+        self._collection = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self, database=None):
+        try:
+            await database.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # ya existe
+        self._collection = database[self.collection_name]
+        # Un cursor tailable sobre una colección vacía muere enseguida; dejamos un marcador
+        await self._collection.insert_one(self._envelope("_start", {}))
+        last = await self._collection.find_one(sort=[("$natural", -1)])
+        self._task = asyncio.create_task(self._tail(last["_id"], last["published_at"]))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _envelope(self, channel: str, message: dict) -> dict:
+        return {
+            "channel": channel,
+            "message": message,
+            "origin": self.instance_id,
+            "published_at": datetime.now(timezone.utc),
+        }
+
+    async def publish(self, channel: str, message: dict):
+        await self._collection.insert_one(self._envelope(channel, message))
+
+    async def _tail(self, last_id, last_at: datetime):
+        while True:
+            cursor = self._collection.find(
+                {"published_at": {"$gte": last_at - RESUME_WINDOW}},
+                cursor_type=CursorType.TAILABLE_AWAIT,
+            )
+            # Hasta encontrar el último mensaje entregado, lo leído ya se había visto
+            skipped: list[dict] | None = []
+            try:
+                while cursor.alive:
+                    async for doc in cursor:
+                        if skipped is not None:
+                            if doc["_id"] == last_id:
+                                skipped = None
+                            else:
+                                skipped.append(doc)
+                            continue
+                        last_id, last_at = doc["_id"], doc["published_at"]
+                        await self._deliver(doc)
+                    if skipped is not None:
+                        # El último mensaje ya salió de la colección capped: todo lo leído es posterior
+                        logger.warning(f"Pub/sub: el último mensaje visto ya no está; se entregan {len(skipped)}.")
+                        pending, skipped = skipped, None
+                        for doc in pending:
+                            last_id, last_at = doc["_id"], doc["published_at"]
+                            await self._deliver(doc)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Se perdió el cursor de pub/sub ({type(e).__name__}). Reintentando...")
+            await asyncio.sleep(0.5)
+
+    async def _deliver(self, doc: dict):
+        if doc["channel"] in self._handlers:
+            await self._dispatch(doc["channel"], doc["message"])
+
+
+def create_pubsub() -> PubSubBackend:
+    if settings.PUBSUB_BACKEND == "mongo":
+        return MongoPubSub("pubsub_events", settings.PUBSUB_CAPPED_SIZE_MB * 1024 * 1024)
+    return InMemoryPubSub()
+
+
+# Creamos una instancia única del backend para toda la aplicación
+pubsub = create_pubsub()
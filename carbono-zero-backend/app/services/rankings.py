@@ -0,0 +1,164 @@
+# app/services/rankings.py
+
+import logging
+import re
+from datetime import datetime, timedelta
+
+from beanie import PydanticObjectId
+from beanie.operators import In
+from pymongo import UpdateOne
+
+from ..core.config import settings
+from ..core.metrics import DB_PIPELINE_SECONDS
+from ..core.timeutils import LOCAL_TZ, to_local, to_utc_naive
+from ..models.models import Class, ClassAggregate, SensorReading
+from .response_cache import CacheEntry, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Solo las sesiones cuyo id es un ObjectId corresponden a clases (no "baseline_main")
+CLASS_SESSION_RE = re.compile(r"^[a-f0-9]{24}$")
+
+
+def week_key(ts: datetime) -> str:
+    year, week, _ = ts.isocalendar()
+    return f"week:{year}-W{week:02d}"
+
+
+def month_key(ts: datetime) -> str:
+    return f"month:{ts.year}-{ts.month:02d}"
+
+
+def period_keys(ts: datetime) -> tuple[str, str, str]:
+    """Claves de todos los agregados a los que contribuye una lectura (semana y mes locales)."""
+    local = to_local(ts)
+    return "all", week_key(local), month_key(local)
+
+
+def resolve_period(period: str, now: datetime | None = None) -> str:
+    """Traduce un periodo relativo ("week", "last_month", ...) a su clave almacenada."""
+    now = now or datetime.now(LOCAL_TZ)
+    if period == "all":
+        return "all"
+    if period == "week":
+        return week_key(now)
+    if period == "last_week":
+        return week_key(now - timedelta(weeks=1))
+    if period == "month":
+        return month_key(now)
+    if period == "last_month":
+        return month_key(now.replace(day=1) - timedelta(days=1))
+    raise ValueError(f"Periodo desconocido: {period}")
+
+
+def period_range(key: str) -> tuple[datetime | None, datetime | None]:
+    """Rango [inicio, fin) en UTC de una clave de periodo; "all" no tiene límites."""
+    if key == "all":
+        return None, None
+    kind, value = key.split(":")
+    if kind == "week":
+        year, week = value.split("-W")
+        start = datetime.fromisocalendar(int(year), int(week), 1)
+        end = start + timedelta(weeks=1)
+    else:
+        year, month = (int(part) for part in value.split("-"))
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+    return to_utc_naive(start), to_utc_naive(end)
+
+
+# Caché de los rankings ya armados: se invalida al escribir lecturas del periodo o al cambiar una clase
+rankings_cache = ResponseCache(max_entries=64, ttl_seconds=settings.RANKINGS_CACHE_SECONDS)
+
+
+async def apply_readings(readings: list[SensorReading]):
+    """Suma un lote de lecturas recién insertadas a los agregados de cada clase."""
+    totals: dict[tuple[str, str], list[float]] = {}
+    for reading in readings:
+        if not CLASS_SESSION_RE.match(reading.session_id):
+            continue
+        for period in period_keys(reading.timestamp):
+            acc = totals.setdefault((period, reading.session_id), [0, 0.0])
+            acc[0] += 1
+            acc[1] += reading.co2
+
+    if not totals:
+        return
+
+    operations = [
+        UpdateOne(
+            {"period": period, "session_id": session_id},
+            {"$inc": {"samples": samples, "co2_sum": co2_sum}},
+            upsert=True,
+        )
+        for (period, session_id), (samples, co2_sum) in totals.items()
+    ]
+    await ClassAggregate.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+async def get_rankings(period: str = "all") -> CacheEntry:
+    """Rankings de CO2 promedio por clase, servidos desde la caché o desde los agregados."""
+    key = resolve_period(period)
+    entry = rankings_cache.get(key)
+    if entry is None:
+        start, end = period_range(key)
+        generation = rankings_cache.generation
+        entry = rankings_cache.set(key, await compute_rankings(key), start=start, end=end, generation=generation)
+    return entry
+
+
+async def compute_rankings(key: str) -> list[dict]:
+    with DB_PIPELINE_SECONDS.labels("rankings").time():
+        aggregates = await ClassAggregate.find(ClassAggregate.period == key).to_list()
+        ids = [PydanticObjectId(agg.session_id) for agg in aggregates]
+        classes = await Class.find(In(Class.id, ids)).to_list() if ids else []
+    names = {str(cls.id): cls.name for cls in classes}
+
+    rankings = [
+        {"id": agg.session_id, "name": names[agg.session_id], "avgCo2": agg.co2_sum / agg.samples}
+        for agg in aggregates
+        if agg.samples and agg.session_id in names
+    ]
+    rankings.sort(key=lambda item: item["avgCo2"], reverse=True)
+    return rankings
+
+
+async def rebuild_rankings():
+    """Recalcula todos los agregados por clase desde las lecturas crudas."""
+    await ClassAggregate.find_all().delete()
+
+    period_expressions = {
+        "all": {"$literal": "all"},
+        "week": {"$concat": ["week:", {"$dateToString": {
+            "date": "$timestamp", "format": "%G-W%V", "timezone": settings.LOCAL_TIMEZONE,
+        }}]},
+        "month": {"$concat": ["month:", {"$dateToString": {
+            "date": "$timestamp", "format": "%Y-%m", "timezone": settings.LOCAL_TIMEZONE,
+        }}]},
+    }
+    for name, expression in period_expressions.items():
+        pipeline = [
+            {"$match": {"session_id": {"$regex": CLASS_SESSION_RE.pattern}}},
+            {"$group": {
+                "_id": {"session_id": "$session_id", "period": expression},
+                "samples": {"$sum": 1},
+                "co2_sum": {"$sum": "$co2"},
+            }},
+            {"$project": {
+                "_id": 0,
+                "session_id": "$_id.session_id",
+                "period": "$_id.period",
+                "samples": 1,
+                "co2_sum": 1,
+            }},
+            {"$merge": {
+                "into": ClassAggregate.Settings.name,
+                "on": ["period", "session_id"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]
+        await SensorReading.aggregate(pipeline).to_list()
+        logger.info(f"Agregados por clase recalculados para el periodo '{name}'.")
+
+    rankings_cache.invalidate()
@@ -0,0 +1,158 @@
+# app/services/response_cache.py
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Hashable, Optional
+
+from fastapi import Request, Response
+
+from ..core import jsonenc
+from ..core.config import settings
+
+# Canal por el que cada worker avisa qué rangos de lecturas acaba de escribir
+READINGS_CHANNEL = "readings-written"
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: str
+    expires_at: float
+    session_id: Optional[str]  # None: la respuesta depende de todas las sesiones
+    start: Optional[datetime]  # Rango de lecturas (UTC) del que depende; None = sin límite
+    end: Optional[datetime]
+
+    def covers(self, session_id: str, first: datetime, last: datetime) -> bool:
+        """True si alguna lectura de `session_id` entre `first` y `last` cambia esta respuesta."""
+        if self.session_id is not None and self.session_id != session_id:
+            return False
+        if self.start is not None and last < self.start:
+            return False
+        if self.end is not None and first >= self.end:
+            return False
+        return True
+
+
+class ResponseCache:
+    """
+    Caché de respuestas JSON ya serializadas, con expiración (TTL) y desalojo LRU.
+    Cada entrada recuerda la sesión y el rango de tiempo del que depende, para
+    invalidar solo las afectadas cuando se escriben lecturas nuevas. El ETag se
+    calcula una vez al guardar y permite responder 304 a los navegadores.
+
+    Un resultado calculado mientras llegaba una invalidación puede no incluir las
+    lecturas nuevas: quien lo calcula toma `generation` antes y lo pasa a `set`,
+    que en ese caso no lo guarda.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Sube con cada invalidación, aunque no descarte entradas (la respuesta puede estar calculándose)
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(
+            self,
+            key: Hashable,
+            value,
+            session_id: Optional[str] = None,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None,
+            generation: Optional[int] = None,
+    ) -> CacheEntry:
+        """Guarda la respuesta y la devuelve; si `generation` quedó atrás, solo la devuelve."""
+        body = jsonenc.dumps(value)
+        entry = CacheEntry(
+            body=body,
+            etag=f'"{hashlib.sha1(body).hexdigest()}"',
+            expires_at=time.monotonic() + self.ttl_seconds,
+            session_id=session_id,
+            start=start,
+            end=end,
+        )
+        if generation is not None and generation != self.generation:
+            return entry
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def _drop(self, keys: list):
+        self.generation += 1
+        for key in keys:
+            del self._entries[key]
+        self.invalidations += len(keys)
+
+    def invalidate_ranges(self, ranges: dict[str, tuple[datetime, datetime]]):
+        """Descarta las entradas que cubren alguno de los rangos {session_id: (primera, última)}."""
+        self._drop([
+            key for key, entry in self._entries.items()
+            if any(entry.covers(session_id, first, last) for session_id, (first, last) in ranges.items())
+        ])
+
+    def invalidate_session(self, session_id: str):
+        self._drop([key for key, entry in self._entries.items() if entry.session_id == session_id])
+
+    def invalidate(self):
+        self._drop(list(self._entries))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+def written_ranges(readings) -> dict[str, list[datetime]]:
+    """Primera y última hora de las lecturas de un lote, por sesión."""
+    ranges: dict[str, list[datetime]] = {}
+    for reading in readings:
+        bounds = ranges.get(reading.session_id)
+        if bounds is None:
+            ranges[reading.session_id] = [reading.timestamp, reading.timestamp]
+        else:
+            bounds[0] = min(bounds[0], reading.timestamp)
+            bounds[1] = max(bounds[1], reading.timestamp)
+    return ranges
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Compara If-None-Match (lista separada por comas, o "*") con el ETag, token por token."""
+    tokens = {token.strip() for token in if_none_match.split(",")}
+    return "*" in tokens or etag in tokens or f"W/{etag}" in tokens
+
+
+def cached_response(request: Request, entry: CacheEntry) -> Response:
+    """Respuesta con ETag; 304 sin cuerpo si el navegador ya tiene esta versión."""
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# Creamos una instancia única de la caché del historial para toda la aplicación
+history_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_SECONDS,
+)
@@ -0,0 +1,192 @@
+# app/services/rollups.py
+
+import logging
+from datetime import datetime, timedelta
+from typing import Callable
+
+from pymongo import UpdateOne
+
+from ..models.models import ReadingRollup, SensorReading
+
+logger = logging.getLogger(__name__)
+
+# Granularidades mantenidas, de la más fina a la más gruesa
+GRANULARITIES: dict[str, timedelta] = {
+    "1m": timedelta(minutes=1),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+}
+
+# Parámetros de $dateTrunc equivalentes a cada granularidad
+_DATE_TRUNC = {
+    "1m": {"unit": "minute", "binSize": 1},
+    "15m": {"unit": "minute", "binSize": 15},
+    "1h": {"unit": "hour", "binSize": 1},
+}
+
+METRICS = ("co2", "temperature", "humidity")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def floor_time(ts: datetime, size: timedelta) -> datetime:
+    """Redondea `ts` hacia abajo al inicio de su intervalo de tamaño `size`."""
+    epoch = _EPOCH.replace(tzinfo=ts.tzinfo)
+    return ts - (ts - epoch) % size
+
+
+def is_aligned(ts: datetime, size: timedelta) -> bool:
+    return floor_time(ts, size) == ts
+
+
+async def apply_readings(readings: list[SensorReading]):
+    """
+    Suma un lote de lecturas recién insertadas a los rollups de cada granularidad.
+    Primero se combinan en memoria para emitir una sola actualización por intervalo.
+    """
+    buckets: dict[tuple[str, str, datetime], dict] = {}
+    for reading in readings:
+        for granularity, size in GRANULARITIES.items():
+            key = (reading.session_id, granularity, floor_time(reading.timestamp, size))
+            acc = buckets.get(key)
+            if acc is None:
+                acc = buckets[key] = {"samples": 0}
+                for metric in METRICS:
+                    value = getattr(reading, metric)
+                    acc[f"{metric}_sum"] = 0.0
+                    acc[f"{metric}_min"] = value
+                    acc[f"{metric}_max"] = value
+            acc["samples"] += 1
+            for metric in METRICS:
+                value = getattr(reading, metric)
+                acc[f"{metric}_sum"] += value
+                acc[f"{metric}_min"] = min(acc[f"{metric}_min"], value)
+                acc[f"{metric}_max"] = max(acc[f"{metric}_max"], value)
+
+    if not buckets:
+        return
+
+    operations = []
+    for (session_id, granularity, bucket_start), acc in buckets.items():
+        operations.append(UpdateOne(
+            {"session_id": session_id, "granularity": granularity, "bucket_start": bucket_start},
+            {
+                "$inc": {"samples": acc["samples"], **{f"{m}_sum": acc[f"{m}_sum"] for m in METRICS}},
+                "$min": {f"{m}_min": acc[f"{m}_min"] for m in METRICS},
+                "$max": {f"{m}_max": acc[f"{m}_max"] for m in METRICS},
+            },
+            upsert=True,
+        ))
+    await ReadingRollup.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+async def rebuild_rollups(session_id: str | None = None, start: datetime | None = None, end: datetime | None = None):
+    """
+    Recalcula los rollups a partir de las lecturas crudas (compactación completa).
+    Si se indica un rango, debe estar alineado a 1 hora para no pisar intervalos parciales.
+    """
+    for limit in (start, end):
+        if limit is not None and not is_aligned(limit, GRANULARITIES["1h"]):
+            raise ValueError("El rango a recalcular debe estar alineado a la hora.")
+
+    match_filter: dict = {}
+    if session_id:
+        match_filter["session_id"] = session_id
+    if start or end:
+        match_filter["timestamp"] = {}
+        if start:
+            match_filter["timestamp"]["$gte"] = start
+        if end:
+            match_filter["timestamp"]["$lt"] = end
+
+    rollup_filter = {k: v for k, v in match_filter.items() if k == "session_id"}
+    if "timestamp" in match_filter:
+        rollup_filter["bucket_start"] = match_filter["timestamp"]
+    await ReadingRollup.find(rollup_filter).delete()
+
+    for granularity, trunc in _DATE_TRUNC.items():
+        group = {
+            "_id": {
+                "session_id": "$session_id",
+                "bucket_start": {"$dateTrunc": {"date": "$timestamp", **trunc}},
+            },
+            "samples": {"$sum": 1},
+        }
+        for metric in METRICS:
+            group[f"{metric}_sum"] = {"$sum": f"${metric}"}
+            group[f"{metric}_min"] = {"$min": f"${metric}"}
+            group[f"{metric}_max"] = {"$max": f"${metric}"}
+
+        pipeline = [
+            {"$match": match_filter},
+            {"$group": group},
+            {"$addFields": {
+                "session_id": "$_id.session_id",
+                "bucket_start": "$_id.bucket_start",
+                "granularity": granularity,
+            }},
+            {"$project": {"_id": 0}},
+            {"$merge": {
+                "into": ReadingRollup.Settings.name,
+                "on": ["session_id", "granularity", "bucket_start"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]
+        await SensorReading.aggregate(pipeline).to_list()
+        logger.info(f"Rollups '{granularity}' recalculados para {session_id or 'todas las sesiones'}.")
+
+
+def pick_granularity(bin_size: timedelta, start: datetime | None, end: datetime | None) -> str | None:
+    """
+    Elige el rollup más grueso cuyo intervalo divide al tamaño de bin pedido y
+    que está alineado con los límites del rango. Devuelve None si ninguno sirve.
+    """
+    for granularity, size in reversed(GRANULARITIES.items()):
+        if bin_size % size:
+            continue
+        if start is not None and not is_aligned(start, size):
+            continue
+        if end is not None and not is_aligned(end, size):
+            continue
+        return granularity
+    return None
+
+
+async def read_history(
+        session_id: str,
+        granularity: str,
+        bucket_of: Callable[[datetime], datetime],
+        start: datetime | None = None,
+        end: datetime | None = None,
+) -> list[dict]:
+    """
+    Lee los rollups de `granularity` y los reagrupa en los bins que indica `bucket_of`
+    (inicio del bin de cada intervalo). Devuelve los puntos con el mismo formato que
+    el pipeline sobre lecturas crudas: promedio, mínimo y máximo de CO2 y cantidad.
+    """
+    query: dict = {"session_id": session_id, "granularity": granularity}
+    if start or end:
+        query["bucket_start"] = {}
+        if start:
+            query["bucket_start"]["$gte"] = start
+        if end:
+            query["bucket_start"]["$lt"] = end
+
+    bins: dict[datetime, list[float]] = {}
+    cursor = ReadingRollup.get_motor_collection().find(query).sort("bucket_start", 1)
+    async for doc in cursor:
+        bucket = bucket_of(doc["bucket_start"])
+        acc = bins.get(bucket)
+        if acc is None:
+            acc = bins[bucket] = [0, 0.0, doc["co2_min"], doc["co2_max"]]
+        acc[0] += doc["samples"]
+        acc[1] += doc["co2_sum"]
+        acc[2] = min(acc[2], doc["co2_min"])
+        acc[3] = max(acc[3], doc["co2_max"])
+
+    return [
+        {"timestamp": ts, "co2": co2_sum / count, "co2_min": co2_min, "co2_max": co2_max, "count": count}
+        for ts, (count, co2_sum, co2_min, co2_max) in bins.items()
+        if count
+    ]
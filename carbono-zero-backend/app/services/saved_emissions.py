@@ -0,0 +1,30 @@
+# app/services/saved_emissions.py
+"""
+Totales de emisiones guardados en `session_emissions` (días ya terminados; ver
+app/services/emissions.py). Este módulo no importa NumPy: la ingesta lo usa en cada
+lote sin crear el servicio de emisiones.
+"""
+
+from datetime import datetime
+
+from ..core.timeutils import LOCAL_TZ, to_local
+from ..models.models import SensorReading, SessionEmissions
+from .rankings import CLASS_SESSION_RE
+
+
+async def forget_saved_days(readings: list[SensorReading]):
+    """
+    Lecturas de días ya guardados (reenvíos tardíos): se borra el total guardado
+    para recalcularlo en la próxima consulta. Lo hace solo el worker que escribió el lote.
+    """
+    today = datetime.now(LOCAL_TZ).date().isoformat()
+    past = {
+        (reading.session_id, day)
+        for reading in readings
+        if CLASS_SESSION_RE.match(reading.session_id)
+        and (day := to_local(reading.timestamp).date().isoformat()) < today
+    }
+    if past:
+        await SessionEmissions.get_motor_collection().delete_many(
+            {"$or": [{"session_id": session_id, "day": day} for session_id, day in past]}
+        )
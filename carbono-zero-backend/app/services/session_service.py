@@ -0,0 +1,59 @@
+# app/services/session_service.py
+
+from beanie import PydanticObjectId
+
+from ..models.models import Class
+from ..api.routers.sensor_control import get_sensor_manager
+from .session_state import session_state, DEFAULT_SENSOR_ID
+from .latest import latest_readings
+
+
+class ClassNotFoundError(LookupError):
+    pass
+
+
+async def start_class_session(class_id: PydanticObjectId, sensor_id: str | None = None) -> dict:
+    """
+    Inicia una sesión de monitoreo para una clase y le ordena al sensor que
+    empiece a enviar datos con su ID. Lo usan el router de sesiones y el planificador.
+    """
+    target_class = await Class.get(class_id)
+    if not target_class:
+        raise ClassNotFoundError(str(class_id))
+    sensor_id = sensor_id or target_class.sensor_id or DEFAULT_SENSOR_ID
+
+    # Referencia inicial: mediana móvil del baseline, desde la caché en memoria
+    baseline_co2 = latest_readings.baseline_co2()
+
+    # Actualiza el estado compartido de sesiones
+    await session_state.set_active(sensor_id, str(class_id))
+
+    # Envía la orden al script del sensor
+    await get_sensor_manager().send_command({
+        "command": "start_session",
+        "session_id": str(class_id)
+    }, sensor_id)
+
+    return {
+        "message": f"Sesión iniciada para: {target_class.name}",
+        "session_id": str(class_id),
+        "sensor_id": sensor_id,
+        "initial_baseline_co2": baseline_co2
+    }
+
+
+async def stop_sessions(sensor_id: str | None = None) -> dict:
+    """Detiene la sesión del sensor indicado, o todas, y vuelve al modo baseline."""
+    sensor_ids = list(session_state.all_active()) if sensor_id is None else [sensor_id]
+    if sensor_id is None:
+        await session_state.clear_all()
+    else:
+        await session_state.clear(sensor_id)
+
+    for target in sensor_ids or [DEFAULT_SENSOR_ID]:
+        await get_sensor_manager().send_command({
+            "command": "stop_session"
+        }, target)
+    if sensor_id is None:
+        return {"message": "Todas las sesiones detenidas. Sensor volviendo a modo baseline."}
+    return {"message": f"Sesión detenida en el sensor {sensor_id}. Volviendo a modo baseline."}
@@ -0,0 +1,117 @@
+# app/services/session_state.py
+
+import logging
+
+from ..core.config import settings
+from ..models.models import ActiveSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_ID = "baseline_main"
+DEFAULT_SENSOR_ID = "default"
+STATE_CHANNEL = "session-state"
+
+
+class SessionStateStore:
+    """
+    Guarda qué sesión está activa en cada sensor. Las lecturas siempre salen de
+    una caché en memoria (sin consultar la base de datos); las escrituras las
+    implementa cada backend y se propagan a los demás workers vía pub/sub.
+    """
+
+    def __init__(self):
+        self._cache: dict[str, str] = {}
+        self._pubsub = None
+
+    def get_active(self, sensor_id: str = DEFAULT_SENSOR_ID) -> str:
+        return self._cache.get(sensor_id, DEFAULT_SESSION_ID)
+
+    def all_active(self) -> dict[str, str]:
+        return dict(self._cache)
+
+    def attach_pubsub(self, pubsub):
+        self._pubsub = pubsub
+        pubsub.subscribe(STATE_CHANNEL, self._on_pubsub_message)
+
+    async def _on_pubsub_message(self, message: dict):
+        self._apply(message["sensor_id"], message["session_id"])
+
+    def _apply(self, sensor_id: str, session_id: str | None):
+        if session_id is None:
+            self._cache.pop(sensor_id, None)
+        else:
+            self._cache[sensor_id] = session_id
+
+    async def _publish(self, sensor_id: str, session_id: str | None):
+        self._apply(sensor_id, session_id)
+        if self._pubsub is not None:
+            await self._pubsub.publish(STATE_CHANNEL, {"sensor_id": sensor_id, "session_id": session_id})
+
+    async def _publish_clear_all(self):
+        for sensor_id in list(self._cache):
+            await self._publish(sensor_id, None)
+
+    async def load(self):
+        """Carga el estado inicial en la caché."""
+        raise NotImplementedError
+
+    async def set_active(self, sensor_id: str, session_id: str):
+        raise NotImplementedError
+
+    async def clear(self, sensor_id: str):
+        """El sensor vuelve al modo baseline."""
+        raise NotImplementedError
+
+    async def clear_all(self):
+        raise NotImplementedError
+
+
+class InMemorySessionStateStore(SessionStateStore):
+    """Estado solo en memoria: se pierde al reiniciar y no se comparte sin pub/sub."""
+
+    async def load(self):
+        # No hay nada guardado: todos los sensores arrancan en baseline
+        pass
+
+    async def set_active(self, sensor_id: str, session_id: str):
+        await self._publish(sensor_id, session_id)
+
+    async def clear(self, sensor_id: str):
+        await self._publish(sensor_id, None)
+
+    async def clear_all(self):
+        await self._publish_clear_all()
+
+
+class MongoSessionStateStore(SessionStateStore):
+    """Estado persistente en la colección `active_sessions`, un documento por sensor."""
+
+    async def load(self):
+        self._cache = {doc.sensor_id: doc.session_id for doc in await ActiveSession.find_all().to_list()}
+        logger.info(f"Sesiones activas recuperadas: {self._cache}")
+
+    async def set_active(self, sensor_id: str, session_id: str):
+        await ActiveSession.get_motor_collection().update_one(
+            {"sensor_id": sensor_id},
+            {"$set": ActiveSession(sensor_id=sensor_id, session_id=session_id).model_dump(exclude={"id"})},
+            upsert=True,
+        )
+        await self._publish(sensor_id, session_id)
+
+    async def clear(self, sensor_id: str):
+        await ActiveSession.find(ActiveSession.sensor_id == sensor_id).delete()
+        await self._publish(sensor_id, None)
+
+    async def clear_all(self):
+        await ActiveSession.find_all().delete()
+        await self._publish_clear_all()
+
+
+def create_session_state() -> SessionStateStore:
+    if settings.SESSION_STATE_BACKEND == "mongo":
+        return MongoSessionStateStore()
+    return InMemorySessionStateStore()
+
+
+# Creamos una instancia única del estado de sesiones para toda la aplicación
+session_state = create_session_state()
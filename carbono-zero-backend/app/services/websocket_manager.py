@@ -1,52 +1,164 @@
 # app/services/websocket_manager.py
 
 from fastapi import WebSocket
+from datetime import datetime
+import asyncio
+import json
 import logging
 
-# Configura un logger para ver qué está pasando
-logging.basicConfig(level=logging.INFO)
+from ..core.config import settings
+from ..core.metrics import WS_CONNECTIONS, WS_DROPPED, WS_SEND_SECONDS
+
 logger = logging.getLogger(__name__)
 
 
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def serialize_message(message: dict) -> str:
+    """Serializa un mensaje una sola vez, con el mismo formato que WebSocket.send_json."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=_json_default)
+
+
+class ClientChannel:
+    """
+    Cola acotada y tarea de envío de un cliente. Si el cliente es lento y la cola
+    se llena, se aplica la política configurada:
+      - "drop_oldest": se descarta el mensaje más antiguo pendiente.
+      - "latest": se descartan todos los pendientes y solo queda el más reciente.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int, policy: str, session_id: str = ""):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.policy = policy
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.sent = 0
+        self.task: asyncio.Task | None = None
+
+    def offer(self, text: str):
+        if self.queue.full():
+            dropped_before = self.dropped
+            if self.policy == "latest":
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                    self.dropped += 1
+            else:
+                self.queue.get_nowait()
+                self.dropped += 1
+            WS_DROPPED.labels(self.session_id).inc(self.dropped - dropped_before)
+        self.queue.put_nowait(text)
+
+    async def run(self, on_failure):
+        try:
+            while True:
+                text = await self.queue.get()
+                with WS_SEND_SECONDS.labels(self.session_id).time():
+                    await self.websocket.send_text(text)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            on_failure()
+
+
+BROADCAST_CHANNEL = "ws-broadcast"
+
+
 class WebSocketManager:
-    def __init__(self):
-        # El diccionario ahora guarda listas de WebSockets por session_id
-        self.active_connections: dict[str, list[WebSocket]] = {}
+    def __init__(self, max_queue: int = 32, policy: str = "latest"):
+        # El diccionario guarda, por session_id, el canal de envío de cada WebSocket
+        self.active_connections: dict[str, dict[WebSocket, ClientChannel]] = {}
+        self.max_queue = max_queue
+        self.policy = policy
+        self.total_broadcasts = 0
+        self.total_dropped = 0
+        self._pubsub = None
+
+    def attach_pubsub(self, pubsub):
+        """
+        Hace que los mensajes pasen por el backend de pub/sub para que lleguen
+        también a los clientes conectados a otros workers o nodos.
+        """
+        self._pubsub = pubsub
+        pubsub.subscribe(BROADCAST_CHANNEL, self._on_pubsub_message)
+
+    async def _on_pubsub_message(self, envelope: dict):
+        self._deliver_local(envelope["text"], envelope["session_id"])
 
     async def connect(self, websocket: WebSocket, session_id: str):
         await websocket.accept()
-        if session_id not in self.active_connections:
-            self.active_connections[session_id] = []
-        self.active_connections[session_id].append(websocket)
+        channel = ClientChannel(websocket, self.max_queue, self.policy, session_id)
+        channel.task = asyncio.create_task(channel.run(lambda: self._on_send_failure(websocket, session_id)))
+        self.active_connections.setdefault(session_id, {})[websocket] = channel
+        WS_CONNECTIONS.labels(session_id).inc()
         logger.info(f"Cliente conectado al WebSocket para la sesión: {session_id}")
 
     def disconnect(self, websocket: WebSocket, session_id: str):
-        if session_id in self.active_connections:
-            self.active_connections[session_id].remove(websocket)
-            logger.info(f"Cliente desconectado del WebSocket para la sesión: {session_id}")
-            # Si no quedan clientes para esa sesión, eliminamos la entrada del diccionario
-            if not self.active_connections[session_id]:
-                del self.active_connections[session_id]
+        channels = self.active_connections.get(session_id)
+        if channels is None or websocket not in channels:
+            return
+        channel = channels.pop(websocket)
+        WS_CONNECTIONS.labels(session_id).dec()
+        self.total_dropped += channel.dropped
+        if channel.task is not None and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+        logger.info(f"Cliente desconectado del WebSocket para la sesión: {session_id}")
+        # Si no quedan clientes para esa sesión, eliminamos la entrada del diccionario
+        if not channels:
+            del self.active_connections[session_id]
+
+    def _on_send_failure(self, websocket: WebSocket, session_id: str):
+        # Si el envío falla (ej. la conexión fue cerrada por el cliente), lo removemos
+        logger.warning(
+            f"No se pudo enviar mensaje a una conexión cerrada. Eliminando cliente de la sesión: {session_id}")
+        self.disconnect(websocket, session_id)
 
     async def broadcast_to_session(self, message: dict, session_id: str):
-        if session_id in self.active_connections:
-            # Creamos una copia de la lista de conexiones para poder modificarla de forma segura
-            connections_to_broadcast = self.active_connections[session_id][:]
-
-            for connection in connections_to_broadcast:
-                try:
-                    # Intentamos enviar el mensaje
-                    await connection.send_json(message)
-                except Exception:
-                    # Si el envío falla (ej. la conexión fue cerrada por el cliente),
-                    # lo removemos de la lista de conexiones activas.
-                    logger.warning(
-                        f"No se pudo enviar mensaje a una conexión cerrada. Eliminando cliente de la sesión: {session_id}")
-                    self.active_connections[session_id].remove(connection)
-                    # Si ya no hay clientes en la sesión, la eliminamos
-                    if not self.active_connections[session_id]:
-                        del self.active_connections[session_id]
+        """
+        Envía el mensaje a los clientes de la sesión en todos los workers (vía pub/sub)
+        o solo en este proceso si no hay backend de pub/sub configurado.
+        El mensaje viaja ya serializado: las fechas llegan como texto ISO con su zona
+        (MongoDB devolvería datetimes sin zona) y cada worker no lo vuelve a serializar.
+        """
+        text = serialize_message(message)
+        if self._pubsub is not None:
+            await self._pubsub.publish(BROADCAST_CHANNEL, {"session_id": session_id, "text": text})
+        else:
+            self._deliver_local(text, session_id)
+
+    def _deliver_local(self, text: str, session_id: str):
+        """
+        Encola el mensaje para todos los clientes locales de la sesión sin esperar el envío.
+        El texto ya serializado es el mismo para todos y cada cliente lo envía desde su propia tarea,
+        de modo que un cliente lento no retrasa a los demás ni al POST que lo originó.
+        """
+        channels = self.active_connections.get(session_id)
+        if not channels:
+            return
+        self.total_broadcasts += 1
+        for channel in channels.values():
+            channel.offer(text)
+
+    def stats(self) -> dict:
+        sessions = {
+            session_id: {
+                "clients": len(channels),
+                "queued": sum(ch.queue.qsize() for ch in channels.values()),
+                "dropped": sum(ch.dropped for ch in channels.values()),
+            }
+            for session_id, channels in self.active_connections.items()
+        }
+        return {
+            "total_broadcasts": self.total_broadcasts,
+            "total_dropped": self.total_dropped + sum(s["dropped"] for s in sessions.values()),
+            "sessions": sessions,
+        }
 
 
 # Creamos una instancia única del manager para toda la aplicación
-manager = WebSocketManager()
+manager = WebSocketManager(max_queue=settings.WS_CLIENT_QUEUE_SIZE, policy=settings.WS_SLOW_CLIENT_POLICY)
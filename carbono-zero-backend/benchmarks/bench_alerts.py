@@ -0,0 +1,121 @@
+# benchmarks/bench_alerts.py
+"""
+Benchmark del motor de alertas (app/services/alerts.py).
+
+Mide:
+  - lo que añade `alert_engine.submit` a cada lote escrito que llega por pub/sub (solo lo encola)
+  - el costo de evaluar cada lectura con las reglas predeterminadas
+  - que el costo por lectura no crece con la ventana de las reglas de subida (O(1))
+Y verifica con una señal sintética que la histéresis y el debounce no repiten alertas.
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_alerts --sessions 50 --readings 20000
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+
+from beanie import PydanticObjectId  # noqa: E402
+
+from app.models.models import AlertRule, SensorReading  # noqa: E402
+from app.services.alerts import DEFAULT_RULES, AlertEngine  # noqa: E402
+
+INTERVAL = timedelta(seconds=5)
+
+
+def make_rules(window_seconds: float | None = None) -> list[AlertRule]:
+    rules = []
+    for rule in DEFAULT_RULES:
+        data = {**rule}
+        if window_seconds and data["kind"] == "rate_of_rise":
+            data["window_seconds"] = window_seconds
+        # model_construct: sin validación ni colección (no hace falta MongoDB)
+        rules.append(AlertRule.model_construct(
+            id=PydanticObjectId(), session_id=None, direction="above", enabled=True, **data,
+        ))
+    return rules
+
+
+def make_readings(sessions: int, per_session: int, seed: int = 683) -> list[list[SensorReading]]:
+    """Una lectura por sesión y paso; el CO2 sube y baja en ciclos de ~1 h con ruido."""
+    rng = random.Random(seed)
+    ids = [f"{i:024x}" for i in range(sessions)]
+    start = datetime(2025, 6, 2, 8, 0)
+    steps = []
+    for step in range(per_session):
+        ts = start + step * INTERVAL
+        co2 = 700 + 500 * math.sin(step / 120) + rng.gauss(0, 20)
+        steps.append([
+            SensorReading.model_construct(
+                session_id=session_id, sensor_id=None, co2=co2, temperature=22.0, humidity=45.0, timestamp=ts,
+            )
+            for session_id in ids
+        ])
+    return steps
+
+
+async def noop_publisher(event):
+    pass
+
+
+def bench_evaluate(steps: list[list[SensorReading]], rules: list[AlertRule]) -> tuple[float, AlertEngine, int]:
+    engine = AlertEngine(queue_size=10, publisher=noop_publisher)
+    engine.set_rules(rules)
+    events = 0
+    started = time.perf_counter()
+    for batch in steps:
+        events += len(engine.evaluate(batch))
+    return time.perf_counter() - started, engine, events
+
+
+async def bench_submit(steps: list[list[SensorReading]]) -> float:
+    """Tiempo de `submit` por lote, con la tarea de fondo vaciando la cola."""
+    engine = AlertEngine(queue_size=len(steps) + 1, publisher=noop_publisher)
+    engine.set_rules(make_rules())
+    samples = []
+    for batch in steps:
+        started = time.perf_counter()
+        engine.submit(batch[:1])
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motor de alertas.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--readings", type=int, default=20_000, help="Lecturas por sesión.")
+    args = parser.parse_args()
+
+    steps = make_readings(args.sessions, args.readings)
+    total = args.sessions * args.readings
+    rules = make_rules()
+    print(f"📊 {total:,} lecturas ({args.sessions} sesiones) con {len(rules)} reglas")
+
+    elapsed, engine, events = bench_evaluate(steps, rules)
+    per_reading_us = elapsed / total * 1e6
+    print(f"   Evaluación:   {elapsed:.3f} s  ({total / elapsed:,.0f} lecturas/s, {per_reading_us:.2f} µs por lectura)")
+
+    for window in (60.0, 900.0, 3600.0):
+        elapsed_w, _, _ = bench_evaluate(steps, make_rules(window))
+        print(f"   Ventana {window:>6.0f} s: {elapsed_w / total * 1e6:.2f} µs por lectura")
+
+    submit_median = asyncio.run(bench_submit(steps))
+    print(f"   submit():     {submit_median * 1e6:.2f} µs por lote (mediana; es lo único que ve el aviso de pub/sub)")
+
+    stats = engine.stats()
+    cycles = args.readings * INTERVAL.total_seconds() / (2 * math.pi * 120 * INTERVAL.total_seconds())
+    print(f"✅ {events} transiciones ({stats['total_evaluated']:,} lecturas evaluadas, "
+          f"{stats['active_alerts']} alertas activas al final); ~{cycles:.0f} ciclos de CO2 por sesión")
+    if events > args.sessions * (cycles + 1) * 2 * len(rules):
+        raise SystemExit("❌ Más transiciones que ciclos: la histéresis o el debounce no funcionan")
+
+
+if __name__ == "__main__":
+    main()
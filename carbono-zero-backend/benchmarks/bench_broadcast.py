@@ -0,0 +1,136 @@
+# benchmarks/bench_broadcast.py
+"""
+Benchmark de carga del envío a WebSockets con cientos de suscriptores simulados por sesión.
+
+Compara el envío secuencial original (un `send_json` tras otro) con el motor de
+difusión de `WebSocketManager` (serialización única y colas por cliente). Mide:
+  - cuánto tarda `broadcast_to_session` en volver (latencia añadida al POST)
+  - el retraso de entrega a los clientes rápidos (p50/p99)
+  - los mensajes descartados para los clientes lentos
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_broadcast --sessions 4 --subscribers 300 --slow 10 --messages 200
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+
+from app.services.websocket_manager import WebSocketManager  # noqa: E402
+
+# Evita un log por cada suscriptor simulado
+logging.getLogger("app.services.websocket_manager").setLevel(logging.WARNING)
+
+
+class FakeWebSocket:
+    """WebSocket simulado: registra cuándo recibe cada mensaje y puede ser lento."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received_at: list[float] = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received_at.append(time.perf_counter())
+
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+
+async def legacy_broadcast(clients: list[FakeWebSocket], message: dict):
+    # Envío original: secuencial y con una serialización por cliente
+    for client in clients:
+        await client.send_json(message)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(args, engine: str) -> dict:
+    manager = WebSocketManager(max_queue=args.queue, policy=args.policy)
+    sessions: dict[str, list[FakeWebSocket]] = {}
+    for s in range(args.sessions):
+        session_id = f"session-{s}"
+        sessions[session_id] = [
+            FakeWebSocket(args.slow_delay if i < args.slow else 0.0) for i in range(args.subscribers)
+        ]
+        if engine == "engine":
+            for ws in sessions[session_id]:
+                await manager.connect(ws, session_id)
+
+    call_ms: list[float] = []
+    sent_at: dict[str, list[float]] = {sid: [] for sid in sessions}
+    for n in range(args.messages):
+        message = {"co2": 400.0 + n, "temperature": 22.5, "humidity": 48.0}
+        for session_id, clients in sessions.items():
+            started = time.perf_counter()
+            if engine == "engine":
+                await manager.broadcast_to_session(message, session_id)
+            else:
+                await legacy_broadcast(clients, message)
+            call_ms.append((time.perf_counter() - started) * 1000)
+            sent_at[session_id].append(started)
+        await asyncio.sleep(args.interval)
+
+    # Tiempo para que los clientes rápidos terminen de recibir
+    await asyncio.sleep(max(0.2, args.slow_delay * 2))
+
+    delays_ms = []
+    for session_id, clients in sessions.items():
+        for ws in clients[args.slow:]:
+            for sent, received in zip(sent_at[session_id], ws.received_at):
+                delays_ms.append((received - sent) * 1000)
+
+    stats = manager.stats()
+    if engine == "engine":
+        for session_id, clients in sessions.items():
+            for ws in clients:
+                manager.disconnect(ws, session_id)
+
+    return {
+        "broadcast_call_p50_ms": round(percentile(call_ms, 50), 3),
+        "broadcast_call_p99_ms": round(percentile(call_ms, 99), 3),
+        "fast_delivery_p50_ms": round(percentile(delays_ms, 50), 3),
+        "fast_delivery_p99_ms": round(percentile(delays_ms, 99), 3),
+        "fast_delivery_mean_ms": round(statistics.fmean(delays_ms), 3) if delays_ms else 0.0,
+        "dropped_for_slow_clients": stats["total_dropped"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--subscribers", type=int, default=300, help="Suscriptores por sesión.")
+    parser.add_argument("--slow", type=int, default=10, help="Suscriptores lentos por sesión.")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Segundos por envío de un cliente lento.")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=0.01, help="Segundos entre lecturas.")
+    parser.add_argument("--queue", type=int, default=32)
+    parser.add_argument("--policy", choices=("latest", "drop_oldest"), default="latest")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    engines = ["engine"] if args.skip_legacy else ["legacy", "engine"]
+    for engine in engines:
+        result = await run(args, engine)
+        print(f"\n[{engine}]")
+        for key, value in result.items():
+            print(f"  {key:<26} {value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
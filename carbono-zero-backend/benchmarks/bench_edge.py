@@ -0,0 +1,128 @@
+# benchmarks/bench_edge.py
+"""
+Benchmark de la agregación en el Pi (hardware/sensors/api_client/edge.py) y del
+formato compacto que decodifica el backend (app/services/edge_codec.py).
+
+Con lecturas del simulador (una cada 5 s, una clase de por medio) mide:
+  - cuántas lecturas deja pasar el agregador (banda muerta y ventana)
+  - los bytes enviados: JSON de /batch frente al lote compacto en JSON y msgpack
+  - el error del pico de CO2 y el error medio de la serie que ve el backend
+Y comprueba que el lote compacto se decodifique a las mismas lecturas.
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_edge --hours 8 --window 0 --deadband 1
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hardware", "sensors", "api_client"))
+
+from edge import METRICS, EdgeAggregator, dumps, encode_compact, msgpack  # noqa: E402
+from serial_sim import SimulatedSerial  # noqa: E402
+
+from app.services import edge_codec  # noqa: E402
+
+INTERVAL = 5.0
+BATCH_SIZE = 50
+DEADBAND = {"co2": 25.0, "temperature": 0.5, "humidity": 2.0}
+START = datetime(2025, 6, 2, 8, 0).timestamp()
+
+
+def make_samples(hours: float, seed: int = 683) -> list[tuple[float, dict]]:
+    """Lecturas del simulador; la segunda hora de cada tres corresponde a una clase."""
+    sim = SimulatedSerial(seed=seed)
+    samples = []
+    for i in range(int(hours * 3600 / INTERVAL)):
+        sim._count = i
+        data = sim._sample()
+        ts = START + i * INTERVAL
+        session = f"{int(ts // 3600):024x}" if (i * INTERVAL // 3600) % 3 == 1 else "baseline_main"
+        samples.append((ts, {
+            "co2": data["co2_ppm"], "temperature": data["temperatura_c"],
+            "humidity": data["humedad_pct"], "session_id": session,
+        }))
+    return samples
+
+
+def batches(readings: list[dict]) -> list[list[dict]]:
+    # Igual que push_readings: sensor_id y número de secuencia de la cola
+    rows = [{**reading, "sensor_id": "default", "seq": seq} for seq, reading in enumerate(readings, start=1)]
+    return [rows[i:i + BATCH_SIZE] for i in range(0, len(rows), BATCH_SIZE)]
+
+
+def plain_bytes(readings: list[dict]) -> int:
+    return sum(len(json.dumps(batch).encode("utf-8")) for batch in batches(readings))
+
+
+def compact_bytes(readings: list[dict], codec: str) -> int:
+    return sum(len(dumps(encode_compact(batch, "default"), codec)[0]) for batch in batches(readings))
+
+
+def series_error(samples: list[tuple[float, dict]], sent: list[dict]) -> tuple[float, float]:
+    """Error medio del CO2 si el backend mantiene el último valor recibido, y error del pico."""
+    sent_ts = [(datetime.fromisoformat(r["timestamp"]).timestamp(), r["co2"]) for r in sent]
+    errors, j, current = [], 0, sent_ts[0][1]
+    for ts, sample in samples:
+        while j < len(sent_ts) and sent_ts[j][0] <= ts + 1e-6:
+            current = sent_ts[j][1]
+            j += 1
+        errors.append(abs(sample["co2"] - current))
+    peak_error = max(s["co2"] for _, s in samples) - max(r["co2"] for r in sent)
+    return sum(errors) / len(errors), peak_error
+
+
+def check_roundtrip(sent: list[dict]):
+    for batch in batches(sent):
+        body, content_type = dumps(encode_compact(batch, "default"), "msgpack" if msgpack else "delta")
+        decoded = edge_codec.decode(edge_codec.load_body(body, content_type))
+        for original, item in zip(batch, decoded, strict=True):
+            same_time = abs(datetime.fromisoformat(original["timestamp"]).timestamp() - item["timestamp"].timestamp()) < 0.001
+            same_values = all(abs(original[m] - item[m]) <= 0.5 / edge_codec.SCALES[m] + 1e-9 for m in METRICS)
+            if not (same_time and same_values and original["seq"] == item["seq"]
+                    and original["session_id"] == item["session_id"]):
+                raise SystemExit(f"❌ El lote compacto no se decodificó igual: {original} != {item}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la agregación y compresión en el Pi.")
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--window", type=float, default=0.0, help="Segundos de la ventana de promedio.")
+    parser.add_argument("--deadband", type=float, default=1.0, help="Multiplicador de la banda muerta.")
+    args = parser.parse_args()
+
+    samples = make_samples(args.hours)
+    raw = [{**reading, "timestamp": datetime.fromtimestamp(ts).astimezone().isoformat()} for ts, reading in samples]
+    aggregator = EdgeAggregator(args.window, {m: v * args.deadband for m, v in DEADBAND.items()})
+    sent = [reading for ts, sample in samples for reading in aggregator.add(ts, sample)] + aggregator.flush()
+
+    kept = len(sent) / len(samples) * 100
+    print(f"📉 Agregador (ventana {args.window:.0f} s, banda x{args.deadband}): "
+          f"{len(sent)} de {len(samples)} lecturas ({kept:.1f}%)")
+
+    before = plain_bytes(raw)
+    print(f"   Sin agregar, JSON de /batch: {before / 1024:.1f} KiB")
+    sizes = {"JSON /batch": plain_bytes(sent), "compacto JSON": compact_bytes(sent, "delta")}
+    if msgpack is not None:
+        sizes["compacto msgpack"] = compact_bytes(sent, "msgpack")
+    for name, size in sizes.items():
+        print(f"   Agregado, {name}: {size / 1024:.1f} KiB ({before / size:.1f}x menos)")
+    if msgpack is None:
+        print("   (msgpack no está instalado; se omite)")
+
+    mean_error, peak_error = series_error(samples, sent)
+    print(f"   Error medio de CO2: {mean_error:.1f} ppm | error del pico: {peak_error:.1f} ppm")
+    if peak_error > DEADBAND["co2"] * args.deadband:
+        raise SystemExit("❌ El pico de CO2 se perdió más allá de la banda muerta")
+
+    check_roundtrip(sent)
+    print("✅ El lote compacto se decodifica a las mismas lecturas y el pico se conserva")
+
+
+if __name__ == "__main__":
+    main()
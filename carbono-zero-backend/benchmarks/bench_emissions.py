@@ -0,0 +1,121 @@
+# benchmarks/bench_emissions.py
+"""
+Benchmark del cálculo de emisiones, ventilación e impuesto (app/services/emissions.py).
+
+Genera un historial sintético con un modelo de balance de masa (aula de volumen,
+aforo y ventilación conocidos) y mide:
+  - el cálculo completo recorriendo lectura por lectura en Python puro
+  - el mismo cálculo vectorizado con NumPy (EmissionsTotals.add)
+  - la actualización incremental por lotes, como la hace el buffer de ingesta
+Además comprueba que la ventilación estimada se parezca a la usada en la simulación.
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_emissions --readings 5000000 --batch 50
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+
+from app.services.emissions import (  # noqa: E402
+    CO2_GENERATION_LPS, CO2_LIMIT_PPM, EmissionsTotals, summarize,
+)
+
+VOLUME_M3 = 150.0
+OCCUPANTS = 30
+BASELINE_PPM = 420.0
+VENTILATION_M3S = 0.25
+INTERVAL_S = 5.0
+MAX_GAP_S = 300.0
+
+
+def simulate(readings: int, seed: int = 683) -> tuple[np.ndarray, np.ndarray]:
+    """Clases de 2 h con 1 h libre entre ellas; el CO2 sigue V·dC/dt = N·G·1e6 − Q·(C − C0)."""
+    rng = np.random.default_rng(seed)
+    per_class = int(2 * 3600 / INTERVAL_S)
+    classes = -(-readings // per_class)
+    generation = OCCUPANTS * CO2_GENERATION_LPS / 1000 * 1e6
+    k = VENTILATION_M3S / VOLUME_M3
+    steady = BASELINE_PPM + generation / VENTILATION_M3S
+
+    offsets = np.arange(per_class) * INTERVAL_S
+    curve = steady - (steady - BASELINE_PPM) * np.exp(-k * offsets)
+    ts = (np.arange(classes)[:, None] * 3 * 3600 + offsets[None, :]).ravel()[:readings]
+    co2 = np.tile(curve, classes)[:readings] + rng.normal(0, 5, readings)
+    return ts.astype(np.float64) + 1_750_000_000.0, co2
+
+
+def python_totals(ts: np.ndarray, co2: np.ndarray) -> EmissionsTotals:
+    """Versión lectura por lectura, como se haría sin vectorizar."""
+    totals = EmissionsTotals(readings=len(ts), first_ts=float(ts[0]))
+    ts_list, co2_list = ts.tolist(), co2.tolist()
+    totals.co2_max = max(co2_list)
+    for i in range(1, len(ts_list)):
+        dt = ts_list[i] - ts_list[i - 1]
+        if dt <= 0 or dt > MAX_GAP_S:
+            continue
+        mid = (co2_list[i] + co2_list[i - 1]) / 2
+        totals.seconds += dt
+        totals.co2_integral += mid * dt
+        totals.co2_delta += co2_list[i] - co2_list[i - 1]
+        if mid > CO2_LIMIT_PPM:
+            totals.seconds_above_limit += dt
+    totals.last_ts, totals.last_co2 = ts_list[-1], co2_list[-1]
+    return totals
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del cálculo de emisiones.")
+    parser.add_argument("--readings", type=int, default=5_000_000)
+    parser.add_argument("--batch", type=int, default=50, help="Lecturas por lote en la actualización incremental.")
+    args = parser.parse_args()
+
+    ts, co2 = simulate(args.readings)
+    print(f"📊 {args.readings:,} lecturas sintéticas ({args.readings * INTERVAL_S / 3600:,.0f} h de clase)")
+
+    py_totals, py_seconds = timed(python_totals, ts, co2)
+
+    def vectorized():
+        totals = EmissionsTotals()
+        totals.add(ts, co2, MAX_GAP_S)
+        return totals
+
+    np_totals, np_seconds = timed(vectorized)
+
+    def incremental():
+        totals = EmissionsTotals()
+        for start in range(0, len(ts), args.batch):
+            totals.add(ts[start:start + args.batch], co2[start:start + args.batch], MAX_GAP_S)
+        return totals
+
+    inc_totals, inc_seconds = timed(incremental)
+
+    print(f"   Python puro:  {py_seconds:8.3f} s  ({args.readings / py_seconds:,.0f} lecturas/s)")
+    print(f"   NumPy:        {np_seconds:8.3f} s  ({args.readings / np_seconds:,.0f} lecturas/s, "
+          f"{py_seconds / np_seconds:.0f}x)")
+    batches = -(-args.readings // args.batch)
+    print(f"   Incremental:  {inc_seconds:8.3f} s  ({inc_seconds / batches * 1e6:.1f} µs por lote de {args.batch})")
+
+    for name, other in (("NumPy", np_totals), ("incremental", inc_totals)):
+        if not np.isclose(other.co2_integral, py_totals.co2_integral, rtol=1e-9):
+            raise SystemExit(f"❌ El resultado {name} no coincide con el de Python puro")
+
+    summary = summarize(np_totals, OCCUPANTS, VOLUME_M3, BASELINE_PPM, tax_rate=11.0)
+    expected_lps = VENTILATION_M3S * 1000 / OCCUPANTS
+    print(f"✅ Ventilación estimada: {summary['ventilation_lps_per_person']} L/s por persona "
+          f"(simulada: {expected_lps:.2f}); emisiones: {summary['emissions_kg']} kg; "
+          f"impuesto: {summary['carbon_tax_usd']:.4f} USD")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_latest.py
+"""
+Benchmark de la caché de últimas lecturas y mediana móvil (app/services/latest.py).
+
+Mide:
+  - el costo de aplicar cada lectura (ventana ordenada con bisect)
+  - la mediana incremental frente a recalcular statistics.median de la ventana
+  - lo que tarda en armarse la respuesta de /api/readings/latest
+Y comprueba que la mediana coincida con la calculada desde cero.
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_latest --sessions 50 --readings 5000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+
+from app.services.latest import LatestReadingsCache  # noqa: E402
+
+INTERVAL = timedelta(seconds=5)
+WINDOW = timedelta(minutes=30)
+
+
+def make_samples(sessions: int, per_session: int, seed: int = 683) -> list[dict[str, list[list]]]:
+    """Un lote por paso con una lectura de cada sesión, como los que llegan por pub/sub."""
+    rng = random.Random(seed)
+    start = datetime(2025, 6, 2, 8, 0)
+    ids = ["baseline_main"] + [f"{i:024x}" for i in range(sessions - 1)]
+    return [
+        {session_id: [[start + step * INTERVAL, rng.gauss(600, 150), 22.0, 45.0, None]] for session_id in ids}
+        for step in range(per_session)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la caché de últimas lecturas.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--readings", type=int, default=5_000, help="Lecturas por sesión.")
+    args = parser.parse_args()
+
+    batches = make_samples(args.sessions, args.readings)
+    total = args.sessions * args.readings
+    print(f"📊 {total:,} lecturas ({args.sessions} sesiones, ventana de {WINDOW.total_seconds() / 60:.0f} min)")
+
+    cache = LatestReadingsCache(WINDOW)
+    started = time.perf_counter()
+    for batch in batches:
+        cache.apply_samples(batch)
+    elapsed = time.perf_counter() - started
+    print(f"   Aplicar:            {elapsed / total * 1e6:6.2f} µs por lectura")
+
+    # Mediana desde cero sobre la misma ventana, como se haría sin la lista ordenada
+    window = [batch["baseline_main"][0][1] for batch in batches[-(int(WINDOW / INTERVAL) + 1):]]
+    repeats = 10_000
+    started = time.perf_counter()
+    for _ in range(repeats):
+        incremental = cache.baseline_co2()
+    incremental_us = (time.perf_counter() - started) / repeats * 1e6
+    started = time.perf_counter()
+    for _ in range(repeats // 10):
+        recomputed = statistics.median(window)
+    recomputed_us = (time.perf_counter() - started) / (repeats // 10) * 1e6
+    print(f"   Mediana incremental: {incremental_us:6.2f} µs  (desde cero: {recomputed_us:.2f} µs, "
+          f"{len(window)} lecturas)")
+
+    started = time.perf_counter()
+    for _ in range(100):
+        cache.all_latest()
+    print(f"   /latest (todas):     {(time.perf_counter() - started) / 100 * 1e6:6.1f} µs para {args.sessions} sesiones")
+
+    if abs(incremental - recomputed) > 1e-9:
+        raise SystemExit(f"❌ La mediana incremental ({incremental}) no coincide con la calculada ({recomputed})")
+    print(f"✅ Mediana del baseline: {incremental:.1f} ppm (coincide con statistics.median)")
+
+
+if __name__ == "__main__":
+    main()
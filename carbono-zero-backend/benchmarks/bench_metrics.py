@@ -0,0 +1,88 @@
+# benchmarks/bench_metrics.py
+"""
+Benchmark del costo de la instrumentación (app/core/metrics.py y app/core/log.py).
+
+Mide:
+  - lo que cuesta observar un valor en un histograma con etiquetas
+  - cuánto bloquea una llamada a logger.info cuando la salida es lenta (consola
+    o disco ocupados), escribiendo directo frente a LOG_ASYNC (QueueHandler)
+  - lo que tarda en armarse la respuesta de /metrics
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_metrics --observations 1000000 --logs 2000
+"""
+
+import argparse
+import io
+import logging
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+
+from app.core import log, metrics  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+
+class SlowStream(io.StringIO):
+    """Salida que tarda `delay` segundos en cada escritura, como una terminal o disco saturado."""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+def bench_logging(use_async: bool, count: int, delay: float) -> float:
+    settings.LOG_ASYNC = use_async
+    log.configure_logging()
+    stream = SlowStream(delay)
+    root = logging.getLogger()
+    # La salida real está en el handler del listener (async) o directo en el raíz (sync)
+    handler = log._listener.handlers[0] if use_async else root.handlers[0]
+    handler.setStream(stream)
+
+    logger = logging.getLogger("bench")
+    started = time.perf_counter()
+    for i in range(count):
+        logger.info(f"lectura {i} encolada")
+    elapsed = time.perf_counter() - started
+    log.stop_logging()
+    return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de métricas y logs.")
+    parser.add_argument("--observations", type=int, default=1_000_000)
+    parser.add_argument("--logs", type=int, default=2_000)
+    parser.add_argument("--delay-ms", type=float, default=1.0, help="Retraso de cada escritura de la salida lenta.")
+    args = parser.parse_args()
+
+    histogram = metrics.Histogram("bench_seconds", "Benchmark.", ("session_id",))
+    started = time.perf_counter()
+    for i in range(args.observations):
+        histogram.labels("abc").observe(0.003)
+    observe_ns = (time.perf_counter() - started) / args.observations * 1e9
+    print(f"📊 Histograma: {observe_ns:.0f} ns por observación (con búsqueda de etiquetas)")
+
+    for session in range(50):
+        histogram.labels(f"{session:024x}").observe(0.01)
+    started = time.perf_counter()
+    body = metrics.render()
+    print(f"   /metrics: {(time.perf_counter() - started) * 1000:.2f} ms ({len(body.splitlines())} líneas)")
+
+    delay = args.delay_ms / 1000
+    sync_us = bench_logging(False, args.logs, delay) * 1e6
+    async_us = bench_logging(True, args.logs, delay) * 1e6
+    print(f"   logger.info con salida lenta ({args.delay_ms} ms): directo {sync_us:.0f} µs, "
+          f"LOG_ASYNC {async_us:.1f} µs por llamada ({sync_us / async_us:.0f}x)")
+    if async_us >= sync_us:
+        raise SystemExit("❌ El modo asíncrono no redujo el bloqueo del event loop")
+    print("✅ Con LOG_ASYNC el event loop no espera a la salida")
+
+
+if __name__ == "__main__":
+    main()
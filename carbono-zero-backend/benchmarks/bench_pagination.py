@@ -0,0 +1,141 @@
+# benchmarks/bench_pagination.py
+"""
+Benchmark de las páginas en streaming (app/services/pagination.py) y del
+codificador JSON (app/core/jsonenc.py).
+
+Con lecturas sintéticas (sin MongoDB) mide:
+  - lo que tarda en serializarse una página con json de la biblioteca estándar y
+    con orjson (si está instalado)
+  - la memoria máxima al enviar la página por partes frente a armar toda la lista
+    y serializarla de una vez, como hace un response_model
+  - los bytes por lectura con todos los campos y con `fields=timestamp,co2`
+Y comprueba que la página armada por partes sea JSON válido con todas las lecturas.
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_pagination --rows 5000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+
+from app.api.routers.readings import READING_FIELDS  # noqa: E402
+from app.core import jsonenc  # noqa: E402
+from app.core.timeutils import as_utc  # noqa: E402
+from app.services import pagination  # noqa: E402
+
+SORT = [("timestamp", 1), ("_id", 1)]
+
+
+def make_docs(rows: int) -> list[dict]:
+    start = datetime(2025, 6, 2, 8, 0)
+    return [
+        {
+            "_id": ObjectId(), "timestamp": start + timedelta(seconds=5 * i), "session_id": "6855" + "0" * 20,
+            "sensor_id": "default", "co2": 650.0 + i % 400, "temperature": 22.5, "humidity": 45.1, "seq": i,
+        }
+        for i in range(rows + 1)  # Uno de más, como pide paged_response
+    ]
+
+
+class ListCursor:
+    """Imita el cursor de Motor sobre una lista."""
+
+    def __init__(self, docs: list[dict]):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def to_item_for(fields: list[str]):
+    def to_item(doc: dict) -> dict:
+        return {
+            field: str(doc["_id"]) if field == "id" else as_utc(doc["timestamp"]) if field == "timestamp" else doc[field]
+            for field in fields
+        }
+    return to_item
+
+
+async def streamed(docs: list[dict], rows: int, fields: list[str]) -> bytes:
+    parts = [part async for part in pagination.stream_page(ListCursor(docs), rows, SORT, to_item_for(fields))]
+    return b"".join(parts)
+
+
+async def streamed_size(docs: list[dict], rows: int, fields: list[str]) -> int:
+    # Como StreamingResponse: cada parte se envía y se suelta
+    total = 0
+    async for part in pagination.stream_page(ListCursor(docs), rows, SORT, to_item_for(fields)):
+        total += len(part)
+    return total
+
+
+def whole(docs: list[dict], rows: int, fields: list[str]) -> bytes:
+    to_item = to_item_for(fields)
+    return jsonenc.dumps({"items": [to_item(doc) for doc in docs[:rows]], "next_cursor": None})
+
+
+async def peak_kib(docs: list[dict], rows: int, fields: list[str]) -> tuple[float, float]:
+    """Memoria máxima (KiB) enviando por partes y armando la lista completa, dentro del mismo loop."""
+    peaks = []
+    for run in (lambda: streamed_size(docs, rows, fields), lambda: asyncio.sleep(0, whole(docs, rows, fields))):
+        tracemalloc.start()
+        await run()
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return peaks[0], peaks[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las páginas en streaming y del codificador JSON.")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    docs = make_docs(args.rows)
+    all_fields = list(READING_FIELDS)
+    body = asyncio.run(streamed(docs, args.rows, all_fields))
+    page = json.loads(body)
+    if len(page["items"]) != args.rows or page["next_cursor"] is None:
+        raise SystemExit("❌ La página armada por partes no tiene todas las lecturas")
+    if pagination.decode_cursor(page["next_cursor"], len(SORT)) != [docs[args.rows - 1]["timestamp"], docs[args.rows - 1]["_id"]]:
+        raise SystemExit("❌ El cursor no apunta a la última lectura enviada")
+
+    encoders = {"json": None}
+    if jsonenc.orjson_available():
+        encoders["orjson"] = jsonenc.orjson
+    print(f"📄 Página de {args.rows} lecturas ({len(body) / 1024:.0f} KiB):")
+    for name, module in encoders.items():
+        jsonenc.orjson = module
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            asyncio.run(streamed(docs, args.rows, all_fields))
+        print(f"   {name}: {(time.perf_counter() - started) / args.repeat * 1000:.1f} ms por página")
+    if "orjson" not in encoders:
+        print("   (orjson no está instalado; se omite)")
+
+    stream_peak, whole_peak = asyncio.run(peak_kib(docs, args.rows, all_fields))
+    print(f"   Memoria máxima: por partes {stream_peak:.0f} KiB, lista completa {whole_peak:.0f} KiB")
+
+    trimmed = asyncio.run(streamed(docs, args.rows, ["id", "timestamp", "co2"]))
+    print(f"   Bytes por lectura: todos los campos {len(body) / args.rows:.0f}, "
+          f"fields=timestamp,co2 {len(trimmed) / args.rows:.0f}")
+    print("✅ La página por partes es JSON válido y el cursor apunta a la última lectura")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# benchmarks/bench_readings_storage.py
+"""
+Compara la latencia de las consultas de historial y rankings sobre `sensor_readings`
+en tres modos de almacenamiento:
+
+  - baseline:   colección estándar sin índices (estado anterior)
+  - indexed:    colección estándar con el índice (session_id, timestamp)
+  - timeseries: colección de series de tiempo con el mismo índice
+
+Necesita un mongod local. Cada modo usa su propia base de datos temporal.
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_readings_storage --uri mongodb://localhost:27017 --readings 10000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+
+from app.services.history import build_history_pipeline  # noqa: E402
+
+# Pipeline original de /api/reports/class-rankings (agrega todas las lecturas en cada llamada)
+RANKINGS_PIPELINE = [
+    {"$match": {"session_id": {"$regex": "^[a-f0-9]{24}$"}}},
+    {"$group": {"_id": "$session_id", "avgCo2": {"$avg": "$co2"}}},
+    {"$addFields": {"class_id": {"$toObjectId": "$_id"}}},
+    {"$lookup": {"from": "classes", "localField": "class_id", "foreignField": "_id", "as": "classDetails"}},
+    {"$unwind": "$classDetails"},
+    {"$sort": {"avgCo2": -1}},
+    {"$project": {"id": "$_id", "name": "$classDetails.name", "avgCo2": "$avgCo2", "_id": 0}}
+]
+
+MODES = ("baseline", "indexed", "timeseries")
+INDEX = IndexModel([("session_id", ASCENDING), ("timestamp", DESCENDING)], name="session_id_timestamp")
+
+
+async def seed(db, mode: str, class_ids: list[str], total: int, batch_size: int):
+    if mode == "timeseries":
+        await db.create_collection(
+            "sensor_readings",
+            timeseries={"timeField": "timestamp", "metaField": "session_id", "granularity": "seconds"},
+        )
+    readings = db["sensor_readings"]
+    await db["classes"].insert_many(
+        [{"_id": ObjectId(cid), "name": f"Clase {i}"} for i, cid in enumerate(class_ids)]
+    )
+
+    sessions = class_ids + ["baseline_main"]
+    start = datetime(2025, 1, 1)
+    rng = random.Random(683)
+    per_session = total // len(sessions)
+    semaphore = asyncio.Semaphore(8)
+
+    async def write(session_id: str, offset: int):
+        # Los documentos se generan dentro del semáforo para no tener 10M en memoria
+        async with semaphore:
+            docs = [
+                {
+                    "session_id": session_id,
+                    "co2": rng.uniform(400, 2000),
+                    "temperature": rng.uniform(18, 28),
+                    "humidity": rng.uniform(30, 70),
+                    "timestamp": start + timedelta(seconds=5 * (offset + i)),
+                }
+                for i in range(min(batch_size, per_session - offset))
+            ]
+            await readings.insert_many(docs, ordered=False)
+
+    tasks = [
+        write(session_id, offset)
+        for session_id in sessions
+        for offset in range(0, per_session, batch_size)
+    ]
+    await asyncio.gather(*tasks)
+
+    if mode != "baseline":
+        await readings.create_indexes([INDEX])
+    return start, per_session
+
+
+async def timed(coro_factory, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "max_ms": round(samples[-1], 2),
+    }
+
+
+async def run_mode(client, mode: str, args) -> dict:
+    db = client[f"carbono_bench_{mode}"]
+    await client.drop_database(db.name)
+    class_ids = [str(ObjectId()) for _ in range(args.classes)]
+
+    print(f"⏳ [{mode}] Insertando {args.readings} lecturas...")
+    seeded = time.perf_counter()
+    start, per_session = await seed(db, mode, class_ids, args.readings, args.batch_size)
+    print(f"   listo en {time.perf_counter() - seeded:.1f} s")
+
+    readings = db["sensor_readings"]
+    target = class_ids[0]
+    one_day = {"session_id": target, "timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}}
+    full_range = {"session_id": target}
+
+    async def history_day():
+        await readings.aggregate(build_history_pipeline(one_day)).to_list(None)
+
+    async def history_all():
+        await readings.aggregate(build_history_pipeline(full_range)).to_list(None)
+
+    async def rankings():
+        await readings.aggregate(RANKINGS_PIPELINE).to_list(None)
+
+    async def latest_baseline():
+        await readings.find({"session_id": "baseline_main"}).sort("timestamp", -1).limit(1).to_list(1)
+
+    result = {
+        "history_1_day": await timed(history_day, args.repeat),
+        "history_full": await timed(history_all, args.repeat),
+        "class_rankings": await timed(rankings, args.repeat),
+        "latest_baseline": await timed(latest_baseline, args.repeat),
+    }
+    if not args.keep:
+        await client.drop_database(db.name)
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--readings", type=int, default=10_000_000)
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--keep", action="store_true", help="No borrar las bases de datos al terminar.")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.uri)
+    results = {mode: await run_mode(client, mode, args) for mode in args.modes}
+
+    queries = list(next(iter(results.values())).keys())
+    print(f"\n{'consulta':<18}" + "".join(f"{mode:>22}" for mode in results))
+    for query in queries:
+        cells = "".join(
+            f"{results[mode][query]['p50_ms']:>12.1f} ms p50".rjust(22) for mode in results
+        )
+        print(f"{query:<18}{cells}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
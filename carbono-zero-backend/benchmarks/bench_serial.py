@@ -0,0 +1,145 @@
+# benchmarks/bench_serial.py
+"""
+Benchmark del lector serial asíncrono (hardware/sensors/api_client/serial_reader.py)
+con pseudo-terminales en lugar de Arduinos (solo Linux/macOS).
+
+Cada puerto recibe líneas del sketch al ritmo de 9600 baudios, en trozos de tamaño
+al azar, mezcladas con líneas de estado, JSON cortado y una línea de basura
+demasiado larga. Mide:
+  - lecturas entregadas por puerto frente a las enviadas (no se debe perder ninguna)
+  - errores de parseo contados frente a los inyectados
+  - la latencia desde el último byte de la línea hasta la entrega de la lectura
+  - cuánto se retrasa el event loop mientras se leen todos los puertos
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_serial --ports 4 --lines 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hardware", "sensors", "api_client"))
+
+from serial_reader import SerialPortReader  # noqa: E402
+
+BAUD_RATE = 9600
+BYTE_SECONDS = 10 / BAUD_RATE
+GARBAGE = [
+    (b'\xe2\x9c\x85 Sensor SCD30 inicializado y configurado correctamente.\r\n', 0),  # Estado: no es error
+    (b'{"co2_ppm": 512.0, "temperatura_c": 22\r\n', 1),  # JSON cortado
+    (b'x' * 2000 + b'\r\n', 1),  # Baudios equivocados: basura sin saltos de línea
+]
+
+
+def write_port(master: int, lines: int, seed: int, sent_at: dict[float, float]):
+    """Escribe `lines` lecturas (co2 = 1000 + número de línea) al ritmo del cable."""
+    rng = random.Random(seed)
+    for n in range(lines):
+        if n % 20 == 10:
+            for raw, _ in GARBAGE:
+                os.write(master, raw)
+                time.sleep(len(raw) * BYTE_SECONDS)
+        line = json.dumps({"co2_ppm": 1000.0 + n, "temperatura_c": 22.5, "humedad_pct": 45.0}).encode() + b"\r\n"
+        position = 0
+        while position < len(line):
+            size = rng.randint(1, 24)
+            os.write(master, line[position:position + size])
+            position += size
+            if position >= len(line):
+                sent_at[1000.0 + n] = time.time()
+            time.sleep(size * BYTE_SECONDS)
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(time.perf_counter() - started - 0.005)
+
+
+async def run(ports: int, lines: int) -> bool:
+    import pty
+    import tty
+
+    ptys, readers, sent, received = [], [], [], []
+    for i in range(ports):
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        ptys.append((master, slave))
+        readers.append(SerialPortReader(f"sensor-{i + 1}", os.ttyname(slave), BAUD_RATE))
+        sent.append({})
+        received.append({})
+
+    def on_reading(sensor_id, ts, payload):
+        index = int(sensor_id.rsplit("-", 1)[1]) - 1
+        received[index][payload["co2"]] = time.time()
+
+    tasks = [asyncio.create_task(reader.run(on_reading)) for reader in readers]
+    stop, lags = asyncio.Event(), []
+    lag_task = asyncio.create_task(measure_loop_lag(stop, lags))
+    await asyncio.sleep(0.5)  # Que los puertos estén abiertos antes de escribir
+
+    started = time.perf_counter()
+    writers = [
+        threading.Thread(target=write_port, args=(master, lines, i, sent[i]), daemon=True)
+        for i, (master, _) in enumerate(ptys)
+    ]
+    for writer in writers:
+        writer.start()
+    while any(writer.is_alive() for writer in writers):
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await lag_task
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for master, slave in ptys:
+        os.close(master)
+        os.close(slave)
+
+    ok = True
+    latencies = []
+    expected_errors = (lines // 20 + (lines % 20 > 10)) * sum(errors for _, errors in GARBAGE)
+    total = sum(len(r) for r in received)
+    print(f"📡 {ports} puertos a {BAUD_RATE} baudios: {total} lecturas en {elapsed:.1f} s "
+          f"({total / elapsed:.1f} lecturas/s en total)")
+    for reader, sent_at, received_at in zip(readers, sent, received):
+        stats = reader.stats_dict()
+        latencies += [received_at[key] - sent_at[key] for key in sent_at if key in received_at]
+        print(f"   {stats['sensor_id']}: {stats['readings']}/{lines} lecturas, "
+              f"{stats['parse_errors']} errores de parseo (inyectados {expected_errors}), {stats['bytes']} bytes")
+        if stats["readings"] != lines or stats["parse_errors"] != expected_errors:
+            ok = False
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"   Latencia último byte → lectura: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p99 {p99 * 1000:.2f} ms")
+    print(f"   Retraso del event loop: máximo {max(lags) * 1000:.2f} ms")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del lector serial con pseudo-terminales.")
+    parser.add_argument("--ports", type=int, default=4)
+    parser.add_argument("--lines", type=int, default=60, help="Lecturas por puerto.")
+    args = parser.parse_args()
+    if os.name != "posix":
+        raise SystemExit("❌ Este benchmark usa pseudo-terminales (pty) y solo corre en Linux/macOS")
+
+    if not asyncio.run(run(args.ports, args.lines)):
+        raise SystemExit("❌ Se perdieron lecturas o no cuadran los errores de parseo")
+    print("✅ Sin lecturas perdidas y con todos los errores de parseo contados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# benchmarks/bench_startup.py
+"""
+Benchmark del arranque en frío de la API (cada medición en un proceso nuevo).
+
+Mide:
+  - lo que tarda `import app.main` (mediana de varias corridas) y qué paquetes
+    pesan más (python -X importtime)
+  - desde que se lanza uvicorn hasta que responde /health/live y /health/ready,
+    con los pasos del arranque que informa /health/ready, con y sin planificador
+Y comprueba que importar la app no cargue el planificador ni las emisiones (NumPy),
+que la importación quede dentro de un presupuesto (--budget-ms) y que con
+RUN_SCHEDULER=false no se cree el planificador.
+
+La base de datos es un mongod (--mongo-uri) o, sin --mongo-uri, mongomock-motor en
+memoria (pip install mongomock-motor), que no mide la conexión ni los índices.
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --mongo-uri mongodb://localhost:27017 --budget-ms 3000
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# Lo que debe quedar fuera de la importación de app.main (se carga al usarse)
+LAZY_MODULES = ("numpy", "app.core.scheduler", "app.services.emissions")
+
+IMPORT_CODE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def child_env(**extra) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_bench")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["PYTHONWARNINGS"] = "ignore"
+    env.update(extra)
+    return env
+
+
+def measure_import(repeat: int) -> tuple[list[float], list[str]]:
+    times, loaded = [], set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_CODE], cwd=BACKEND_DIR, env=child_env(),
+            capture_output=True, text=True, check=True,
+        )
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(data["ms"])
+        loaded.update(data["loaded"])
+    return times, sorted(loaded)
+
+
+def import_breakdown(top: int) -> list[tuple[str, float]]:
+    """Módulos que importa app.main directamente, por tiempo acumulado (ms)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR, env=child_env(),
+        capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Un nivel por debajo de app.main: el nombre va con 3 espacios
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            entries.append((name.strip(), int(cumulative) / 1000))
+    return sorted(entries, key=lambda entry: entry[1], reverse=True)[:top]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url: str) -> tuple[int, dict] | None:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None
+
+
+def measure_serve(args, run_scheduler: bool) -> dict:
+    """Lanza el servidor y mide hasta /health/live y /health/ready desde el lanzamiento."""
+    port = free_port()
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "serve", "--port", str(port)]
+    if args.mongo_uri:
+        command += ["--mongo-uri", args.mongo_uri]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=child_env(RUN_SCHEDULER=str(run_scheduler).lower()))
+    live_ms = ready_ms = None
+    ready_body = {}
+    try:
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline and ready_ms is None:
+            if process.poll() is not None:
+                raise SystemExit("❌ El servidor terminó antes de quedar listo")
+            if live_ms is None:
+                if get(f"http://127.0.0.1:{port}/health/live") is not None:
+                    live_ms = (time.perf_counter() - started) * 1000
+                    answer = get(f"http://127.0.0.1:{port}/health/ready")
+                    if answer is not None and answer[0] == 200:
+                        ready_ms, ready_body = live_ms, answer[1]
+            else:
+                answer = get(f"http://127.0.0.1:{port}/health/ready")
+                if answer is not None and answer[0] == 200:
+                    ready_ms = (time.perf_counter() - started) * 1000
+                    ready_body = answer[1]
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    if ready_ms is None:
+        raise SystemExit(f"❌ La API no quedó lista en {args.timeout:.0f} s")
+    return {"live_ms": live_ms, "ready_ms": ready_ms, **ready_body}
+
+
+def serve(args):
+    """Proceso hijo: la API real con uvicorn, con mongod o con mongomock."""
+    if args.mongo_uri:
+        os.environ["DATABASE_URL"] = f"{args.mongo_uri.rstrip('/')}/carbono_bench_startup"
+    import uvicorn
+
+    from app import main as app_main
+
+    if not args.mongo_uri:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("❌ Sin --mongo-uri hace falta mongomock-motor (pip install mongomock-motor)")
+
+        class MockClient(AsyncMongoMockClient):
+            # mongomock devuelve su base síncrona en get_default_database; Beanie necesita la asíncrona
+            def get_default_database(self, *args, **kwargs):
+                return self.get_database("carbono_bench_startup")
+
+        app_main.AsyncIOMotorClient = MockClient
+    uvicorn.run(app_main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque en frío de la API.")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "serve"])
+    parser.add_argument("--repeat", type=int, default=5, help="Procesos nuevos para medir la importación.")
+    parser.add_argument("--top", type=int, default=8, help="Módulos más pesados que se muestran.")
+    parser.add_argument("--mongo-uri", default=None, help="mongod a usar; sin esto, mongomock-motor.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Segundos máximos hasta /health/ready.")
+    parser.add_argument("--budget-ms", type=float, default=3000.0,
+                        help="Máximo para la mediana de `import app.main` (pensado para la Raspberry Pi 5).")
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+        return
+
+    times, loaded = measure_import(args.repeat)
+    median = statistics.median(times)
+    print(f"📦 import app.main ({args.repeat} procesos nuevos): mediana {median:.0f} ms, "
+          f"mín {min(times):.0f} ms, máx {max(times):.0f} ms")
+    for name, ms in import_breakdown(args.top):
+        print(f"   {name}: {ms:.0f} ms")
+    if loaded:
+        raise SystemExit(f"❌ Importar la app cargó módulos que deberían cargarse al usarse: {', '.join(loaded)}")
+
+    database = "mongod" if args.mongo_uri else "mongomock"
+    for run_scheduler in (True, False):
+        result = measure_serve(args, run_scheduler)
+        steps = ", ".join(f"{step} {seconds * 1000:.0f} ms" for step, seconds in result["steps"].items())
+        print(f"🚀 uvicorn con RUN_SCHEDULER={str(run_scheduler).lower()} ({database}): "
+              f"/health/live a los {result['live_ms']:.0f} ms, /health/ready a los {result['ready_ms']:.0f} ms")
+        print(f"   Arranque en segundo plano: {result['seconds'] * 1000:.0f} ms ({steps}); "
+              f"subsistemas creados: {', '.join(result['subsystems'])}")
+        if ("scheduler" in result["subsystems"]) != run_scheduler:
+            raise SystemExit("❌ El planificador no respeta RUN_SCHEDULER")
+
+    if median > args.budget_ms:
+        raise SystemExit(f"❌ La importación ({median:.0f} ms) supera el presupuesto de {args.budget_ms:.0f} ms")
+    print(f"✅ Importación dentro del presupuesto ({args.budget_ms:.0f} ms), sin cargar planificador ni emisiones, "
+          f"y el planificador solo corre con RUN_SCHEDULER=true")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# benchmarks/loadtest.py
+"""
+Prueba de carga de punta a punta: levanta la API real (uvicorn en este proceso),
+simula una flota de sensores que hacen POST a un ritmo fijo y dashboards conectados
+por WebSocket, y mide:
+  - throughput de ingesta (lecturas aceptadas por segundo) y errores
+  - latencia de los POST (p50/p90/p99/máx)
+  - retraso de punta a punta hasta el dashboard (hora de la lectura → mensaje recibido)
+  - el estado del buffer de ingesta y del envío al terminar
+
+La base de datos es un mongod local (--mongo-uri, usa una base temporal que se borra
+al final) o, sin --mongo-uri, mongomock-motor en memoria (pip install mongomock-motor),
+que sirve para comparar cambios en el código de la API pero no mide MongoDB (y no
+actualiza rollups ni rankings).
+
+Cada corrida se guarda como JSON para compararla con otra y detectar regresiones.
+
+Uso (desde carbono-zero-backend/):
+    python -m benchmarks.loadtest run --sensors 20 --rate 5 --dashboards 40 --duration 30
+    python -m benchmarks.loadtest compare benchmarks/results/antes.json benchmarks/results/despues.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Métricas que se comparan: True si más alto es mejor
+COMPARED = {
+    "ingest.readings_per_second": True,
+    "ingest.errors": False,
+    "post_latency_ms.p50": False,
+    "post_latency_ms.p99": False,
+    "broadcast_delay_ms.p50": False,
+    "broadcast_delay_ms.p99": False,
+    "server.avg_flush_ms": False,
+}
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def pick(pct: float) -> float:
+        return round(values[min(len(values) - 1, int(len(values) * pct / 100))], 3)
+
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 3),
+        "p50": pick(50),
+        "p90": pick(90),
+        "p99": pick(99),
+        "max": round(values[-1], 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(args) -> str:
+    """Variables de entorno de la app; deben fijarse antes de importarla."""
+    database = f"carbono_loadtest_{int(time.time())}"
+    uri = (args.mongo_uri or "mongodb://localhost:27017").rstrip("/")
+    os.environ["DATABASE_URL"] = f"{uri}/{database}"
+    os.environ.setdefault("PUBSUB_BACKEND", "memory")
+    os.environ.setdefault("SESSION_STATE_BACKEND", "memory")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Sin barridos de retención durante la prueba
+    os.environ.setdefault("BASELINE_RETENTION_DAYS", "0")
+    return database
+
+
+async def start_server(app):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # Propaga el error de arranque (ej. no hay MongoDB)
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"127.0.0.1:{port}"
+
+
+async def sensor(client, sensor_no: int, session_id: str, args, deadline: float, latencies: list, counters: dict):
+    """Un sensor que envía lecturas a `rate` por segundo (en lotes de `batch`) hasta el final."""
+    interval = args.batch / args.rate
+    next_at = time.perf_counter() + interval * (sensor_no / max(1, args.sensors))  # Escalonados
+    seq = 0
+    while next_at < deadline:
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        next_at += interval
+        items = []
+        for _ in range(args.batch):
+            seq += 1
+            items.append({
+                "co2": 600.0 + (seq % 400), "temperature": 22.5, "humidity": 48.0,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "sensor_id": f"loadtest-{sensor_no}", "seq": seq,
+            })
+        started = time.perf_counter()
+        try:
+            if args.batch == 1:
+                response = await client.post("/api/readings/", json=items[0], params={"session_id": session_id})
+            else:
+                for item in items:
+                    item["session_id"] = session_id
+                response = await client.post("/api/readings/batch", json=items)
+            ok = response.status_code == 202
+        except Exception:
+            ok = False
+        latencies.append((time.perf_counter() - started) * 1000)
+        if ok:
+            counters["accepted"] += len(items)
+        else:
+            counters["errors"] += 1
+
+
+async def dashboard(host: str, session_id: str, delays: list, ready: asyncio.Event, stop: asyncio.Event):
+    """Un dashboard suscrito a la sesión; mide el retraso desde la hora de cada lectura."""
+    import websockets
+
+    async with websockets.connect(f"ws://{host}/api/readings/ws/{session_id}") as ws:
+        ready.set()
+        while not stop.is_set():
+            try:
+                text = await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            received = datetime.now(timezone.utc)
+            message = json.loads(text)
+            if "co2" in message and "timestamp" in message:
+                delays.append((received - datetime.fromisoformat(message["timestamp"])).total_seconds() * 1000)
+
+
+async def run(args) -> dict:
+    database = configure_environment(args)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import httpx
+
+    from app import main as app_main
+
+    if not args.mongo_uri:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("❌ Sin --mongo-uri hace falta mongomock-motor (pip install mongomock-motor)")
+
+        class MockClient(AsyncMongoMockClient):
+            # mongomock devuelve su base síncrona en get_default_database; Beanie necesita la asíncrona
+            def get_default_database(self, *args, **kwargs):
+                return self.get_database(database)
+
+        app_main.AsyncIOMotorClient = MockClient
+        # mongomock no acepta el `sort` que pymongo 4.x pasa en los UpdateOne de bulk_write, así que
+        # los listeners de rollups y rankings fallan en cada lote; se silencian para no ensuciar la salida
+        logging.getLogger("app.services.ingest_buffer").setLevel(logging.CRITICAL)
+
+    server, server_task, host = await start_server(app_main.app)
+    print(f"🚀 API en http://{host} ({'mongod' if args.mongo_uri else 'mongomock'})")
+    try:
+        async with httpx.AsyncClient(
+                base_url=f"http://{host}", timeout=30.0,
+                limits=httpx.Limits(max_connections=args.connections),
+        ) as client:
+            session_ids = []
+            for i in range(args.sensors):
+                response = await client.post("/api/classes/", json={
+                    "name": f"Carga {i}", "schedule_day": 0, "schedule_start": "08:00", "schedule_end": "10:00",
+                    "capacity": 30, "volume": 150.0, "area": 50.0, "ventilation": "natural",
+                })
+                response.raise_for_status()
+                session_ids.append(response.json()["id"])
+
+            delays: list[float] = []
+            stop = asyncio.Event()
+            dashboards = []
+            for i in range(args.dashboards):
+                ready = asyncio.Event()
+                dashboards.append(asyncio.create_task(
+                    dashboard(host, session_ids[i % len(session_ids)], delays, ready, stop)
+                ))
+                await ready.wait()
+
+            latencies: list[float] = []
+            counters = {"accepted": 0, "errors": 0}
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(
+                sensor(client, i, session_ids[i], args, deadline, latencies, counters) for i in range(args.sensors)
+            ))
+            elapsed = time.perf_counter() - started
+
+            # Margen para que el buffer escriba y los dashboards reciban lo último
+            await asyncio.sleep(1.0 + float(os.environ.get("INGEST_BUFFER_FLUSH_SECONDS", 1.0)))
+            stop.set()
+            await asyncio.gather(*dashboards, return_exceptions=True)
+
+            ingest_stats = (await client.get("/api/readings/ingest-stats")).json()
+            broadcast_stats = (await client.get("/api/readings/broadcast-stats")).json()
+    finally:
+        server.should_exit = True
+        await server_task
+        if args.mongo_uri:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            await AsyncIOMotorClient(args.mongo_uri).drop_database(database)
+
+    expected = args.sensors * args.rate * args.duration
+    return {
+        "meta": {
+            "label": args.label,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "backend": "mongod" if args.mongo_uri else "mongomock",
+            "params": {
+                "sensors": args.sensors, "rate": args.rate, "batch": args.batch,
+                "dashboards": args.dashboards, "duration": args.duration,
+            },
+        },
+        "ingest": {
+            "readings_per_second": round(counters["accepted"] / elapsed, 1),
+            "accepted": counters["accepted"],
+            "expected": round(expected),
+            "errors": counters["errors"],
+        },
+        "post_latency_ms": percentiles(latencies),
+        "broadcast_delay_ms": percentiles(delays),
+        "server": {
+            "flushed": ingest_stats["total_flushed"],
+            "failed": ingest_stats["total_failed"],
+            "avg_flush_ms": ingest_stats["avg_flush_ms"],
+            "max_flush_ms": ingest_stats["max_flush_ms"],
+            "broadcast_dropped": broadcast_stats["total_dropped"],
+        },
+    }
+
+
+def lookup(result: dict, path: str):
+    value = result
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Imprime la diferencia por métrica; devuelve False si alguna empeoró más que `threshold` %."""
+    ok = True
+    print(f"{'métrica':<28} {'antes':>12} {'después':>12} {'cambio':>9}")
+    for path, higher_is_better in COMPARED.items():
+        before, after = lookup(baseline, path), lookup(current, path)
+        if before is None or after is None:
+            continue
+        if before:
+            change = (after - before) / abs(before) * 100
+        else:
+            change = 0.0 if after == before else float("inf")
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            flag, ok = "  ❌", False
+        print(f"{path:<28} {before:>12} {after:>12} {change:>+8.1f}%{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con sensores y dashboards simulados.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Ejecuta una prueba y guarda el resultado en JSON.")
+    run_parser.add_argument("--sensors", type=int, default=20)
+    run_parser.add_argument("--rate", type=float, default=5.0, help="Lecturas por segundo de cada sensor.")
+    run_parser.add_argument("--batch", type=int, default=1, help="Lecturas por POST (>1 usa /batch).")
+    run_parser.add_argument("--dashboards", type=int, default=40, help="Suscriptores WebSocket (repartidos por sesión).")
+    run_parser.add_argument("--duration", type=float, default=30.0, help="Segundos de carga.")
+    run_parser.add_argument("--connections", type=int, default=100, help="Conexiones HTTP simultáneas.")
+    run_parser.add_argument("--mongo-uri", help="mongod local (ej. mongodb://localhost:27017); sin él, mongomock.")
+    run_parser.add_argument("--label", default="", help="Nombre de la corrida (ej. la rama).")
+    run_parser.add_argument("--output", type=Path, help="Archivo JSON (por defecto en benchmarks/results/).")
+    run_parser.add_argument("--compare", type=Path, help="JSON de una corrida anterior para comparar.")
+    run_parser.add_argument("--threshold", type=float, default=10.0, help="%% de empeoramiento tolerado.")
+
+    compare_parser = commands.add_parser("compare", help="Compara dos resultados guardados.")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=10.0)
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        baseline, current = (json.loads(path.read_text()) for path in (args.baseline, args.current))
+        sys.exit(0 if compare(baseline, current, args.threshold) else 1)
+
+    result = asyncio.run(run(args))
+    output = args.output or RESULTS_DIR / f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+
+    ingest, post, delay = result["ingest"], result["post_latency_ms"], result["broadcast_delay_ms"]
+    print(f"📊 Ingesta: {ingest['readings_per_second']} lecturas/s ({ingest['accepted']}/{ingest['expected']}, "
+          f"{ingest['errors']} errores)")
+    print(f"   POST:      p50 {post.get('p50')} ms, p99 {post.get('p99')} ms, máx {post.get('max')} ms")
+    print(f"   Dashboard: p50 {delay.get('p50')} ms, p99 {delay.get('p99')} ms ({delay['count']} mensajes)")
+    print(f"   Servidor:  {result['server']}")
+    print(f"✅ Resultado guardado en {output}")
+
+    if args.compare:
+        if not compare(json.loads(args.compare.read_text()), result, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
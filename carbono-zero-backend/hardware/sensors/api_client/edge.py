@@ -0,0 +1,167 @@
+# edge.py
+"""
+Procesamiento en el Pi antes de enviar las lecturas al backend:
+
+  - EdgeAggregator: promedio opcional por ventana (conservando el pico de CO2) y
+    banda muerta, para no enviar lecturas que no cambiaron.
+  - encode_compact / dumps: lotes con las diferencias entre lecturas vecinas, en
+    JSON o msgpack. El backend los decodifica en app/services/edge_codec.py
+    (POST /api/readings/compact); el formato está descrito allí.
+"""
+import json
+from datetime import datetime, timezone
+
+try:
+    import msgpack
+except ImportError:  # Opcional: sin msgpack se usa el mismo formato en JSON
+    msgpack = None
+
+METRICS = ("co2", "temperature", "humidity")
+# Deben coincidir con SCALES de app/services/edge_codec.py
+SCALES = {"co2": 10, "temperature": 100, "humidity": 100}
+FORMAT_VERSION = 1
+
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+class EdgeAggregator:
+    """
+    Reduce las muestras del SCD30 antes de guardarlas en la cola de envío.
+
+    1. Con `window_seconds` > 0 se envía el promedio de cada ventana. Si el pico de
+       CO2 de la ventana supera el promedio en más que la banda muerta, el pico
+       también se envía con su propia hora, para no aplanar los máximos.
+    2. Banda muerta: se descarta la lectura si ninguna métrica cambió más que
+       `deadband[métrica]` respecto de la última enviada, pero siempre sale una cada
+       `heartbeat_seconds` (el backend corta la integración de emisiones si hay huecos).
+       Cuando por fin hay un cambio tras una meseta (dos o más descartadas), también
+       se envía la última lectura descartada, que marca dónde empezó.
+
+    Un cambio de sesión cierra la ventana y reinicia la banda muerta.
+    """
+
+    def __init__(self, window_seconds: float = 0.0, deadband: dict | None = None, heartbeat_seconds: float = 60.0):
+        self.window_seconds = window_seconds
+        self.deadband = deadband or {}
+        self.heartbeat_seconds = heartbeat_seconds
+        self._window: list[tuple[float, dict]] = []
+        self._last: tuple[float, dict] | None = None
+        self._held: tuple[float, dict] | None = None
+        self._suppressed = 0
+        self.received = 0
+        self.emitted = 0
+
+    def add(self, ts: float, reading: dict) -> list[dict]:
+        """Recibe una muestra (epoch s, {co2, temperature, humidity, session_id}); devuelve lo que hay que enviar."""
+        if any(reading.get(metric) is None for metric in METRICS):
+            return []
+        self.received += 1
+        out = []
+        if self._window and self._window[0][1].get("session_id") != reading.get("session_id"):
+            out += self._close_window()
+        if self._last is not None and self._last[1].get("session_id") != reading.get("session_id"):
+            out += self._release_held()
+            self._last = None
+
+        if self.window_seconds <= 0:
+            return out + self._filter(ts, reading)
+        self._window.append((ts, reading))
+        if ts - self._window[0][0] >= self.window_seconds:
+            out += self._close_window()
+        return out
+
+    def flush(self) -> list[dict]:
+        """Lo pendiente al apagar: la ventana abierta y la última lectura descartada."""
+        return self._close_window() + self._release_held()
+
+    def _emit(self, ts: float, reading: dict) -> dict:
+        self.emitted += 1
+        return {**reading, "timestamp": iso(ts)}
+
+    def _release_held(self) -> list[dict]:
+        held, self._held = self._held, None
+        self._suppressed = 0
+        return [self._emit(*held)] if held else []
+
+    def _filter(self, ts: float, reading: dict, force: bool = False) -> list[dict]:
+        last = self._last
+        changed = last is None or any(
+            abs(reading[metric] - last[1][metric]) > self.deadband.get(metric, 0.0) for metric in METRICS
+        )
+        if not (force or changed or ts - last[0] >= self.heartbeat_seconds):
+            self._held = (ts, reading)
+            self._suppressed += 1
+            return []
+        out = self._release_held() if changed and self._suppressed > 1 else []
+        self._held = None
+        self._suppressed = 0
+        self._last = (ts, reading)
+        return out + [self._emit(ts, reading)]
+
+    def _close_window(self) -> list[dict]:
+        window, self._window = self._window, []
+        if not window:
+            return []
+        mid_ts = (window[0][0] + window[-1][0]) / 2
+        mean = {**window[-1][1], **{
+            metric: round(sum(r[metric] for _, r in window) / len(window), 2) for metric in METRICS
+        }}
+        peak_ts, peak = max(window, key=lambda item: item[1]["co2"])
+        if peak["co2"] - mean["co2"] <= self.deadband.get("co2", 0.0):
+            return self._filter(mid_ts, mean)
+        if abs(peak_ts - mid_ts) < 0.001:
+            return self._filter(peak_ts, peak, force=True)
+        # En orden cronológico, para que las diferencias de tiempo del lote sean positivas
+        if peak_ts < mid_ts:
+            return self._filter(peak_ts, peak, force=True) + self._filter(mid_ts, mean)
+        return self._filter(mid_ts, mean) + self._filter(peak_ts, peak, force=True)
+
+
+def encode_compact(readings: list[dict], sensor_id: str | None) -> dict:
+    """Arma el lote v1: tabla de sesiones, horas y valores como diferencias enteras."""
+    sessions: list[str] = []
+    runs: list[list[int]] = []
+    dt, columns = [], {metric: [] for metric in METRICS}
+    previous_ms, previous = None, {metric: 0 for metric in METRICS}
+    t0 = None
+    for reading in readings:
+        session = reading["session_id"]
+        if session not in sessions:
+            sessions.append(session)
+        index = sessions.index(session)
+        if runs and runs[-1][0] == index:
+            runs[-1][1] += 1
+        else:
+            runs.append([index, 1])
+
+        ms = round(datetime.fromisoformat(reading["timestamp"]).timestamp() * 1000)
+        if t0 is None:
+            t0 = previous_ms = ms
+        dt.append(ms - previous_ms)
+        previous_ms = ms
+        for metric, scale in SCALES.items():
+            value = round(reading[metric] * scale)
+            columns[metric].append(value - previous[metric])
+            previous[metric] = value
+
+    batch = {"v": FORMAT_VERSION, "sensor_id": sensor_id, "sessions": sessions, "sid": runs, "t0": t0, "dt": dt}
+    seqs = [reading.get("seq") for reading in readings]
+    if readings and all(seq is not None for seq in seqs):
+        batch["seq0"] = seqs[0]
+        batch["dseq"] = [0] + [b - a for a, b in zip(seqs, seqs[1:])]
+        # Todas las lecturas de un envío salen de la misma cola
+        if readings[0].get("spool_id") is not None:
+            batch["spool_id"] = readings[0]["spool_id"]
+    batch.update(columns)
+    return batch
+
+
+def dumps(batch: dict, codec: str) -> tuple[bytes, str]:
+    """Serializa el lote en msgpack ("msgpack") o JSON compacto ("delta"). Devuelve (cuerpo, content-type)."""
+    if codec == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("El códec msgpack requiere `pip install msgpack`.")
+        return msgpack.packb(batch), "application/x-msgpack"
+    return json.dumps(batch, separators=(",", ":")).encode("utf-8"), "application/json"
@@ -1,117 +1,262 @@
 # read_and_push_sensors.py
-import serial
+import argparse
 import json
-import requests
-from time import sleep
 import asyncio
+import functools
+import httpx
 import websockets
-import threading
+
+from edge import EdgeAggregator, dumps, encode_compact
+from spool import ReadingSpool
+from serial_reader import SerialPortReader, parse_sensors, report_stats
+from serial_sim import SimulatedSerial
 
 # --- CONFIGURACIÓN ---
 SERIAL_PORT = 'COM5'
 BAUD_RATE = 9600
-BACKEND_URL_POST = 'http://localhost:8000/api/readings/'
+BACKEND_URL = 'http://localhost:8000'
+BATCH_ENDPOINT = '/api/readings/batch'
+COMPACT_ENDPOINT = '/api/readings/compact'
 WS_CONTROL_URL = 'ws://localhost:8000/ws/sensor-control/ws'
+SENSOR_ID = "default"  # Identificador de este sensor/aula en el backend (con varios: --sensor ID=PUERTO)
 DEFAULT_SESSION_ID = "baseline_main"
+SPOOL_FILE = 'uplink_spool.db'  # Lecturas pendientes de envío (sobrevive a reinicios)
+BATCH_SIZE = 50            # Máximo de lecturas por POST
+BATCH_MAX_WAIT = 10.0      # Segundos máximos que una lectura espera para salir en un lote
+RETRY_MAX_SECONDS = 60.0   # Espera máxima entre reintentos cuando el backend no responde
+STATS_INTERVAL = 300.0     # Cada cuántos segundos se muestran las estadísticas de cada puerto
+# --- AGREGACIÓN EN EL PI (ver edge.py) ---
+WINDOW_SECONDS = 0.0       # Promedio por ventana; 0 = sin promediar
+DEADBAND = {"co2": 25.0, "temperature": 0.5, "humidity": 2.0}  # Cambios menores no se envían (del orden de la precisión del SCD30)
+HEARTBEAT_SECONDS = 60.0   # Se envía al menos una lectura por minuto (menor que EMISSIONS_MAX_GAP del backend)
+CODEC = 'delta'            # plain: JSON a /batch | delta: lote compacto JSON | msgpack: lote compacto msgpack
+# Respuestas que dicen que el lote es inválido: reintentarlo no sirve. Cualquier otro error
+# (404/405 de un backend sin actualizar, 401/403 de un proxy, 429, 5xx) se reintenta sin borrar nada
+REJECTED_STATUSES = {400, 413, 422}
 
 
-# Usamos un objeto de bloqueo para manejar la variable de forma segura entre hilos
+# Todo corre en el mismo event loop, así que no hace falta un lock
 class SessionState:
     def __init__(self):
         self.active_session_id = DEFAULT_SESSION_ID
-        self._lock = threading.Lock()
 
     def set_id(self, new_id):
-        with self._lock:
-            self.active_session_id = new_id
+        self.active_session_id = new_id
 
     def get_id(self):
-        with self._lock:
-            return self.active_session_id
+        return self.active_session_id
 
 
-# Creamos una instancia global del estado
-session_state = SessionState()
+# Estado de cada sensor por sensor_id: el backend asigna cada aula a su propia clase
+session_states: dict[str, SessionState] = {}
 
 
-async def listen_for_commands():
-    """Se conecta al WebSocket de control y escucha órdenes del backend."""
+async def listen_for_commands(sensor_id: str):
+    """Se conecta al WebSocket de control como `sensor_id` y escucha órdenes del backend."""
+    session_state = session_states[sensor_id]
     while True:
         try:
             # El 'ping_interval' y 'ping_timeout' ayudan a mantener la conexión viva
-            async with websockets.connect(WS_CONTROL_URL, ping_interval=20, ping_timeout=20) as websocket:
-                print("✅ Conectado al servidor de control del backend.")
+            async with websockets.connect(f"{WS_CONTROL_URL}?sensor_id={sensor_id}", ping_interval=20, ping_timeout=20) as websocket:
+                print(f"✅ Conectado al servidor de control del backend como '{sensor_id}'.")
                 while True:
                     message = await websocket.recv()
                     command = json.loads(message)
-                    print(f"▶️  Orden recibida: {command}")
+                    # Heartbeat del backend: respondemos con el mismo ts para que mida la latencia
+                    if command.get("command") == "ping":
+                        await websocket.send(json.dumps({"type": "pong", "ts": command.get("ts")}))
+                        continue
+                    print(f"▶️  Orden recibida para '{sensor_id}': {command}")
+                    # Confirmamos la orden para que el backend no la reenvíe al reconectar
+                    if command.get("command_id"):
+                        await websocket.send(json.dumps({"type": "ack", "command_id": command["command_id"]}))
                     if command.get("command") == "start_session":
                         new_id = command.get("session_id", DEFAULT_SESSION_ID)
                         session_state.set_id(new_id)
-                        print(f"🚀 Iniciando sesión de monitoreo para: {new_id}")
+                        print(f"🚀 Iniciando sesión de monitoreo de '{sensor_id}' para: {new_id}")
                     elif command.get("command") == "stop_session":
                         session_state.set_id(DEFAULT_SESSION_ID)
-                        print(f"🛑 Sesión detenida. Volviendo a modo baseline.")
+                        print(f"🛑 Sesión de '{sensor_id}' detenida. Volviendo a modo baseline.")
         except Exception as e:
             # Si hay cualquier error (conexión cerrada, rechazada, etc.), esperamos y reintentamos.
-            print(f"⚠️ Conexión de control perdida ({type(e).__name__}). Reintentando en 5 segundos...")
+            print(f"⚠️ Conexión de control de '{sensor_id}' perdida ({type(e).__name__}). Reintentando en 5 segundos...")
             await asyncio.sleep(5)
 
 
-def read_and_push_serial_data():
-    """Lee del puerto serial y envía los datos vía HTTP POST."""
-    print(f"📡 Intentando conectar al puerto {SERIAL_PORT}...")
-    try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        print("✅ Conexión serial exitosa.")
-        sleep(2)
-    except serial.SerialException as e:
-        print(f"❌ Error al conectar al puerto serial: {e}")
+async def store_reading(spool: ReadingSpool, new_data: asyncio.Event, aggregators: dict[str, EdgeAggregator],
+                        sensor_id: str, ts: float, payload: dict):
+    """
+    Recibe cada lectura de SerialPortReader y la pasa, con la sesión activa de su
+    sensor en ese momento, por el agregador de ese sensor. Lo que este deja pasar se
+    guarda en la cola en disco; el envío lo hace `push_readings`.
+    """
+    payload["session_id"] = session_states[sensor_id].get_id()
+    payload["sensor_id"] = sensor_id
+    readings = aggregators[sensor_id].add(ts, payload)
+    if readings:
+        await asyncio.to_thread(spool.append, readings)
+        new_data.set()
+
+
+async def post_batch(client: httpx.AsyncClient, readings: list[dict], codec: str):
+    """
+    Envía el lote como lista JSON (plain) o como lotes compactos con diferencias
+    (delta/msgpack), uno por sensor. Lanza httpx.HTTPStatusError si el backend lo rechaza.
+    """
+    if codec == 'plain':
+        response = await client.post(BATCH_ENDPOINT, json=readings)
+        response.raise_for_status()
         return
+    by_sensor: dict[str, list[dict]] = {}
+    for reading in readings:
+        by_sensor.setdefault(reading["sensor_id"], []).append(reading)
+    # Si falla a mitad, el lote entero se reenvía y el backend descarta los repetidos por (spool_id, seq)
+    for sensor_id, group in by_sensor.items():
+        body, content_type = dumps(encode_compact(group, sensor_id), codec)
+        response = await client.post(COMPACT_ENDPOINT, content=body, headers={"Content-Type": content_type})
+        response.raise_for_status()
+
 
+async def send_batch(client: httpx.AsyncClient, readings: list[dict], codec: str) -> list[dict]:
+    """
+    Envía el lote; si el backend lo rechaza por inválido (REJECTED_STATUSES), lo parte
+    en mitades para que una lectura mala no se lleve a las demás. Devuelve las lecturas
+    rechazadas una por una. Los demás errores se lanzan y el lote queda en la cola.
+    """
     try:
+        await post_batch(client, readings, codec)
+        return []
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code not in REJECTED_STATUSES:
+            raise
+        if len(readings) == 1:
+            return readings
+    middle = len(readings) // 2
+    return await send_batch(client, readings[:middle], codec) + await send_batch(client, readings[middle:], codec)
+
+
+async def push_readings(spool: ReadingSpool, new_data: asyncio.Event, codec: str):
+    """
+    Envía la cola en lotes con una única sesión HTTP (conexiones reutilizadas).
+    Si el backend no responde, las lecturas quedan en disco y se reenvían con su
+    hora original cuando vuelve, con espera exponencial entre reintentos.
+    """
+    loop = asyncio.get_running_loop()
+    retry_delay = 1.0
+    async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=10.0) as client:
         while True:
-            if ser.in_waiting > 0:
-                line = ser.readline().decode('utf-8').strip()
-                if line.startswith('{') and line.endswith('}'):
-                    try:
-                        data = json.loads(line)
-                        payload = {
-                            "co2": data.get("co2_ppm"),
-                            "temperature": data.get("temperatura_c"),
-                            "humidity": data.get("humedad_pct")
-                        }
-
-                        current_session_id = session_state.get_id()
-                        response = requests.post(f"{BACKEND_URL_POST}?session_id={current_session_id}", json=payload)
-
-                        if response.status_code == 202:
-                            print(
-                                f"🛰️  Datos enviados para '{current_session_id}': CO2: {payload['co2']:.0f} ppm | Temp: {payload['temperature']}°C | Hum: {payload['humidity']:.0f}%")
-                        else:
-                            print(f"❌ Error al enviar datos: {response.status_code}")
-                    except (json.JSONDecodeError, requests.exceptions.RequestException) as e:
-                        print(f"Error procesando/enviando: {e}")
-            sleep(5)
-    except KeyboardInterrupt:
-        print("\n🛑 Programa detenido.")
-    finally:
-        if 'ser' in locals() and ser.is_open:
-            ser.close()
-            print(" Puerto serial cerrado.")
+            if len(spool) == 0:
+                new_data.clear()
+                await new_data.wait()
 
+            # Esperamos a tener un lote completo o a que pase BATCH_MAX_WAIT
+            deadline = loop.time() + BATCH_MAX_WAIT
+            while len(spool) < BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                new_data.clear()
+                try:
+                    await asyncio.wait_for(new_data.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
 
-async def main():
-    # Creamos un hilo separado para la lectura serial, que es bloqueante
-    serial_thread = threading.Thread(target=read_and_push_serial_data, daemon=True)
-    serial_thread.start()
+            batch = await asyncio.to_thread(spool.peek, BATCH_SIZE)
+            if not batch:
+                continue
+            ids = [row_id for row_id, _ in batch]
+            # El id de la cola es creciente y nunca se reutiliza: sirve como número de secuencia
+            # para que el backend descarte los duplicados si un lote se reenvía. spool_id distingue
+            # esta cola de la de otro Pi con el mismo SENSOR_ID, cuyos números se repiten
+            # Las lecturas encoladas por versiones anteriores no traen sensor_id
+            readings = [{"sensor_id": SENSOR_ID, **reading, "spool_id": spool.spool_id, "seq": row_id}
+                        for row_id, reading in batch]
+            try:
+                rejected = await send_batch(client, readings, codec)
+            except httpx.HTTPStatusError as e:
+                # Cualquier otro error HTTP: el lote sigue en la cola. Con Retry-After
+                # (503 del buffer lleno, 429) se espera lo que pide el backend
+                wait = max(retry_delay, float(e.response.headers.get("Retry-After", 0) or 0))
+                print(f"❌ Error del backend ({e.response.status_code}). Reintentando en {wait:.0f} s...")
+                await asyncio.sleep(wait)
+                retry_delay = min(retry_delay * 2, RETRY_MAX_SECONDS)
+                continue
+            except httpx.RequestError as e:
+                print(f"⚠️ Backend no disponible ({type(e).__name__}); {len(spool)} lecturas en espera. "
+                      f"Reintentando en {retry_delay:.0f} s...")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, RETRY_MAX_SECONDS)
+                continue
 
-    # Ejecutamos el listener de comandos de WebSocket en el hilo principal
-    await listen_for_commands()
+            # Las lecturas inválidas se descartan para no bloquear la cola
+            if rejected:
+                print(f"❌ El backend rechazó {len(rejected)} lecturas inválidas; se descartan: {rejected[:3]}")
+            await asyncio.to_thread(spool.ack, ids)
+            retry_delay = 1.0
+            last = readings[-1]
+            print(f"🛰️  {len(readings) - len(rejected)} lecturas enviadas (última de '{last['sensor_id']}' en '{last['session_id']}': CO2: {last['co2']:.0f} ppm | "
+                  f"Temp: {last['temperature']}°C | Hum: {last['humidity']:.0f}%)")
+
+
+async def main(args):
+    try:
+        sensors = parse_sensors(args.sensor, SENSOR_ID) if args.sensor else {SENSOR_ID: args.port}
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if args.simulate:
+        print("🧪 Usando el simulador del puerto serial.")
+    readers = []
+    for sensor_id, port in sensors.items():
+        opener = (lambda: SimulatedSerial(port="SIM", baudrate=BAUD_RATE, timeout=1)) if args.simulate else None
+        readers.append(SerialPortReader(sensor_id, "SIM" if args.simulate else port, BAUD_RATE, opener))
+        session_states[sensor_id] = SessionState()
+        print(f"📡 Sensor '{sensor_id}' en el puerto {readers[-1].port}.")
+
+    spool = ReadingSpool(args.spool)
+    pending = len(spool)
+    if pending:
+        print(f"📦 {pending} lecturas pendientes de una ejecución anterior; se enviarán primero.")
+
+    deadband = {metric: value * args.deadband for metric, value in DEADBAND.items()}
+    aggregators = {sensor_id: EdgeAggregator(args.window, deadband, HEARTBEAT_SECONDS) for sensor_id in sensors}
+    new_data = asyncio.Event()
+    new_data.set()
+    on_reading = functools.partial(store_reading, spool, new_data, aggregators)
+    try:
+        await asyncio.gather(
+            *(reader.run(on_reading) for reader in readers),
+            push_readings(spool, new_data, args.codec),
+            *(listen_for_commands(sensor_id) for sensor_id in sensors),
+            report_stats(readers, STATS_INTERVAL),
+        )
+    finally:
+        print(" Puertos seriales cerrados.")
+        for reader in readers:
+            s = reader.stats_dict()
+            print(f"📊 {s['port']} ({s['sensor_id']}): {s['readings']} lecturas, {s['parse_errors']} errores de parseo.")
+        # Lo que quedó en la ventana o retenido por la banda muerta sale en la próxima ejecución
+        for sensor_id, aggregator in aggregators.items():
+            spool.append(aggregator.flush())
+            if aggregator.received:
+                print(f"📉 Agregación de '{sensor_id}': {aggregator.emitted} de {aggregator.received} lecturas encoladas para envío.")
+        spool.close()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lee los SCD30 por serial y envía las lecturas al backend.")
+    parser.add_argument("--port", default=SERIAL_PORT, help=f"Puerto del sensor '{SENSOR_ID}' si no se usa --sensor.")
+    parser.add_argument("--sensor", action="append", default=[], metavar="ID=PUERTO",
+                        help="Un sensor por Arduino; se puede repetir (p. ej. --sensor aula-1=/dev/ttyACM0).")
+    parser.add_argument("--spool", default=SPOOL_FILE)
+    parser.add_argument("--simulate", action="store_true", help="Usa el simulador en lugar del Arduino.")
+    parser.add_argument("--codec", choices=("plain", "delta", "msgpack"), default=CODEC,
+                        help="Formato del envío (msgpack requiere `pip install msgpack` en el Pi y el backend).")
+    parser.add_argument("--window", type=float, default=WINDOW_SECONDS,
+                        help="Segundos de cada ventana de promedio (0 = sin promediar).")
+    parser.add_argument("--deadband", type=float, default=1.0,
+                        help="Multiplicador de la banda muerta (0 = enviar toda lectura que cambie).")
     try:
-        asyncio.run(main())
+        asyncio.run(main(parser.parse_args()))
     except KeyboardInterrupt:
         print("Programa finalizado.")
@@ -0,0 +1,237 @@
+# serial_reader.py
+"""
+Lectura asíncrona de uno o varios puertos seriales (un Arduino con su SCD30 por puerto).
+
+Cada puerto corre en su propia tarea. Los bytes se leen apenas llegan, sin esperas
+fijas, y LineParser los corta en líneas aunque lleguen en trozos. Cada lectura se
+entrega con su hora de llegada y el sensor_id del puerto. Si un puerto se
+desconecta, se vuelve a abrir con espera exponencial sin frenar a los demás.
+
+En Linux/macOS se usa el descriptor del puerto con el event loop (add_reader), sin
+hilos. En Windows y con el simulador se lee en un hilo, que se libera en cuanto
+llega el primer byte.
+"""
+import asyncio
+import json
+import math
+import time
+from typing import Awaitable, Callable
+
+import serial
+
+MAX_LINE_BYTES = 512        # Una línea del sketch ocupa ~70 bytes; más largo es basura (baudios equivocados)
+READ_TIMEOUT = 1.0          # Timeout de lectura del puerto en el modo con hilo
+RECONNECT_MAX_SECONDS = 30.0
+# Campos del JSON del sketch y su nombre en el backend; el backend exige los tres
+FIELDS = {"co2_ppm": "co2", "temperatura_c": "temperature", "humedad_pct": "humidity"}
+
+
+def _is_number(value) -> bool:
+    # bool es subclase de int, pero true/false no son una medición
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def parse_line(line: str) -> tuple[dict | None, bool]:
+    """
+    Convierte una línea JSON del Arduino en el payload que espera el backend.
+    Devuelve (payload, es_error): las líneas de estado del sketch ("✅ Sensor ...")
+    no son errores; una línea con forma de JSON que no se puede leer, o a la que le
+    falta alguna medición o no es un número, sí (el backend rechazaría el lote entero).
+    """
+    if not (line.startswith('{') and line.endswith('}')):
+        return None, line.startswith('{') or line.endswith('}')
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError:
+        return None, True
+    if not isinstance(data, dict) or not all(_is_number(data.get(name)) for name in FIELDS):
+        return None, True
+    return {field: data[name] for name, field in FIELDS.items()}, False
+
+
+class LineParser:
+    """Corta en líneas los bytes que llegan en trozos de cualquier tamaño."""
+
+    def __init__(self, max_line: int = MAX_LINE_BYTES):
+        self.max_line = max_line
+        self.overflows = 0
+        self._buffer = bytearray()
+        self._discarding = False  # Se pasó de max_line: se descarta hasta el próximo salto
+
+    def feed(self, data: bytes) -> list[str]:
+        self._buffer += data
+        lines = []
+        while True:
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                break
+            raw = bytes(self._buffer[:end])
+            del self._buffer[:end + 1]
+            if self._discarding:
+                self._discarding = False
+                continue
+            if len(raw) > self.max_line:
+                self.overflows += 1
+                continue
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line:
+                lines.append(line)
+        if len(self._buffer) > self.max_line:
+            self._buffer.clear()
+            self._discarding = True
+            self.overflows += 1
+        return lines
+
+    def reset(self):
+        """Al reconectar, lo que quedó a medias es de la conexión anterior."""
+        self._buffer.clear()
+        self._discarding = False
+
+
+class PortStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.bytes = 0
+        self.lines = 0
+        self.readings = 0
+        self.parse_errors = 0
+        self.reconnects = 0
+        self.last_reading_at: float | None = None
+        self.connected = False
+
+    def as_dict(self, overflows: int = 0) -> dict:
+        minutes = max(time.monotonic() - self.started, 1e-9) / 60
+        return {
+            "connected": self.connected,
+            "bytes": self.bytes,
+            "lines": self.lines,
+            "readings": self.readings,
+            "parse_errors": self.parse_errors + overflows,
+            "reconnects": self.reconnects,
+            "readings_per_minute": round(self.readings / minutes, 2),
+            "seconds_since_reading": (
+                round(time.monotonic() - self.last_reading_at, 1) if self.last_reading_at is not None else None
+            ),
+        }
+
+
+# Recibe (sensor_id, hora de llegada en epoch s, payload); puede ser una corrutina
+ReadingCallback = Callable[[str, float, dict], Awaitable[None] | None]
+
+
+class SerialPortReader:
+    def __init__(self, sensor_id: str, port: str, baudrate: int = 9600, opener: Callable | None = None):
+        self.sensor_id = sensor_id
+        self.port = port
+        self.baudrate = baudrate
+        # `opener` permite usar el simulador u otro objeto con la interfaz de serial.Serial
+        self.opener = opener or (lambda: serial.Serial(port, baudrate, timeout=READ_TIMEOUT))
+        self.parser = LineParser()
+        self.stats = PortStats()
+
+    def stats_dict(self) -> dict:
+        return {"sensor_id": self.sensor_id, "port": self.port, **self.stats.as_dict(self.parser.overflows)}
+
+    async def run(self, on_reading: ReadingCallback):
+        """Lee el puerto para siempre; reconecta si se cae."""
+        delay = 1.0
+        while True:
+            try:
+                ser = await asyncio.to_thread(self.opener)
+            except (serial.SerialException, OSError) as e:
+                print(f"⚠️ No se pudo abrir {self.port} ({self.sensor_id}): {e}. Reintentando en {delay:.0f} s...")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+                continue
+            print(f"✅ {self.port} conectado como '{self.sensor_id}'.")
+            self.stats.connected = True
+            self.parser.reset()
+            try:
+                await self._read_loop(ser, on_reading)
+                return  # Se cerró el puerto a propósito
+            except (serial.SerialException, OSError) as e:
+                print(f"⚠️ Se perdió {self.port} ({self.sensor_id}): {e}. Reconectando...")
+                self.stats.reconnects += 1
+                delay = 1.0
+            finally:
+                self.stats.connected = False
+                if ser.is_open:
+                    ser.close()
+
+    async def _read_loop(self, ser, on_reading: ReadingCallback):
+        fileno = getattr(ser, "fileno", None)
+        if fileno is not None and hasattr(asyncio.get_running_loop(), "add_reader"):
+            try:
+                fd = fileno()
+            except Exception:
+                fd = None
+            if fd is not None:
+                await self._read_with_fd(ser, fd, on_reading)
+                return
+        while ser.is_open:
+            data = await asyncio.to_thread(self._blocking_read, ser)
+            await self._handle(data, on_reading)
+
+    @staticmethod
+    def _blocking_read(ser) -> bytes:
+        # Espera el primer byte (o el timeout) y luego toma todo lo que ya llegó
+        data = ser.read(1)
+        if data and ser.in_waiting:
+            data += ser.read(ser.in_waiting)
+        return data
+
+    async def _read_with_fd(self, ser, fd: int, on_reading: ReadingCallback):
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        # Sin timeout, read devuelve solo lo que ya llegó y nunca bloquea el event loop
+        ser.timeout = 0
+        loop.add_reader(fd, ready.set)
+        try:
+            while ser.is_open:
+                await ready.wait()
+                ready.clear()
+                # Si el dispositivo desaparece, pyserial lanza SerialException
+                await self._handle(ser.read(max(1, ser.in_waiting)), on_reading)
+        finally:
+            loop.remove_reader(fd)
+
+    async def _handle(self, data: bytes, on_reading: ReadingCallback):
+        if not data:
+            return
+        arrived = time.time()
+        self.stats.bytes += len(data)
+        for line in self.parser.feed(data):
+            self.stats.lines += 1
+            payload, error = parse_line(line)
+            if payload is None:
+                self.stats.parse_errors += error
+                continue
+            self.stats.readings += 1
+            self.stats.last_reading_at = time.monotonic()
+            result = on_reading(self.sensor_id, arrived, payload)
+            if asyncio.iscoroutine(result):
+                await result
+
+
+async def report_stats(readers: list[SerialPortReader], interval: float):
+    """Muestra cada `interval` segundos las lecturas y errores de cada puerto."""
+    while True:
+        await asyncio.sleep(interval)
+        for reader in readers:
+            s = reader.stats_dict()
+            state = "conectado" if s["connected"] else "desconectado"
+            print(f"📊 {s['port']} ({s['sensor_id']}, {state}): {s['readings_per_minute']} lecturas/min | "
+                  f"{s['readings']} lecturas, {s['parse_errors']} errores de parseo, {s['reconnects']} reconexiones")
+
+
+def parse_sensors(values: list[str], default_id: str) -> dict[str, str]:
+    """Convierte argumentos `ID=PUERTO` (o solo `PUERTO`) en {sensor_id: puerto}."""
+    sensors = {}
+    for value in values:
+        sensor_id, sep, port = value.partition("=")
+        if not sep:
+            sensor_id, port = (default_id if not sensors else f"{default_id}-{len(sensors) + 1}"), value
+        if sensor_id in sensors:
+            raise ValueError(f"sensor_id repetido: {sensor_id}")
+        sensors[sensor_id] = port
+    return sensors
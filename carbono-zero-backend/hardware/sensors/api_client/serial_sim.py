@@ -0,0 +1,110 @@
+# serial_sim.py
+"""
+Simulador del puerto serial del Arduino (scd30x2.ino) para pruebas sin hardware.
+Expone la misma interfaz que usamos de `serial.Serial` y emite una línea JSON
+con el formato del sketch cada `interval` segundos.
+
+En Linux/macOS también puede servir las líneas por pseudo-terminales, que el lector
+abre como si fueran Arduinos reales (los bytes salen al ritmo de 9600 baudios):
+
+    python serial_sim.py --pty 2
+    python read_and_push_sensors.py --sensor aula-1=/dev/pts/5 --sensor aula-2=/dev/pts/6
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+
+
+class SimulatedSerial:
+    def __init__(self, port: str = "SIM", baudrate: int = 9600, timeout: float = 1.0,
+                 interval: float = 5.0, seed: int | None = None, noise_lines: bool = False):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.interval = interval
+        self.noise_lines = noise_lines
+        self.is_open = True
+        self._rng = random.Random(seed)
+        self._next_at = time.monotonic()
+        self._count = 0
+        self._pending = b""
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._pending) or (1 if time.monotonic() >= self._next_at else 0)
+
+    def _sample(self) -> dict:
+        # CO2 que sube y baja como en una clase, con algo de ruido
+        phase = self._count / 120
+        co2 = 650 + 450 * max(0.0, math.sin(phase)) + self._rng.gauss(0, 15)
+        return {
+            "co2_ppm": round(co2, 1),
+            "temperatura_c": round(22 + self._rng.gauss(0, 0.3), 1),
+            "humedad_pct": round(45 + self._rng.gauss(0, 1.0), 1),
+        }
+
+    def readline(self) -> bytes:
+        wait = self._next_at - time.monotonic()
+        if wait > self.timeout:
+            time.sleep(self.timeout)
+            return b""
+        if wait > 0:
+            time.sleep(wait)
+        self._next_at += self.interval
+        self._count += 1
+        # Igual que el sketch real, de vez en cuando sale una línea que no es JSON
+        if self.noise_lines and self._count % 50 == 0:
+            return "⚠️ No se pudo leer el sensor\r\n".encode("utf-8")
+        return (json.dumps(self._sample()) + "\r\n").encode("utf-8")
+
+    def read(self, size: int = 1) -> bytes:
+        """Como serial.Serial.read: espera la próxima línea hasta el timeout y devuelve hasta `size` bytes."""
+        if not self._pending:
+            self._pending = self.readline()
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def close(self):
+        self.is_open = False
+
+
+def serve_pty(count: int, interval: float, baudrate: int = 9600, seed: int | None = None):
+    """Crea `count` pseudo-terminales y escribe en cada una las líneas del simulador."""
+    import pty
+    import tty
+
+    ports = []
+    for i in range(count):
+        master, slave = pty.openpty()
+        tty.setraw(slave)  # Sin eco ni conversión de saltos de línea, como un puerto USB-serial
+        ports.append((master, slave, SimulatedSerial(interval=interval, seed=None if seed is None else seed + i)))
+        print(f"🧪 Sensor simulado {i + 1}: {os.ttyname(slave)}")
+    byte_seconds = 10 / baudrate  # 8 bits de datos + inicio + parada
+    try:
+        while True:
+            master, _, sim = min(ports, key=lambda item: item[2]._next_at)
+            line = sim.readline()
+            if not line:
+                continue
+            # Los bytes salen de a poco, como por el cable: el lector recibe la línea en trozos
+            for start in range(0, len(line), 16):
+                os.write(master, line[start:start + 16])
+                time.sleep(16 * byte_seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for master, slave, _ in ports:
+            os.close(master)
+            os.close(slave)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simula Arduinos con SCD30 en pseudo-terminales.")
+    parser.add_argument("--pty", type=int, default=1, help="Cantidad de sensores simulados.")
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    serve_pty(args.pty, args.interval, seed=args.seed)
@@ -0,0 +1,69 @@
+# spool.py
+"""
+Cola persistente en disco (SQLite) para las lecturas que aún no llegaron al backend.
+Cada lectura se guarda antes de enviarse y se borra solo cuando el backend confirma
+el lote, así que un corte de red o un reinicio del Pi no pierde datos.
+
+El id de cada fila sirve de número de secuencia (`seq`) y nunca se reutiliza dentro
+del archivo. Como dos Pi (o un archivo borrado y vuelto a crear) repiten los mismos
+números, cada cola guarda además un identificador aleatorio propio (`spool_id`) que
+el backend usa junto con `seq` para descartar duplicados.
+"""
+import json
+import secrets
+import sqlite3
+import threading
+
+
+class ReadingSpool:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS readings (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('spool_id', ?)", (secrets.token_hex(8),)
+        )
+        self.spool_id = self._conn.execute("SELECT value FROM meta WHERE key = 'spool_id'").fetchone()[0]
+        # Se lleva la cuenta en memoria para no consultar SQLite en cada vuelta del envío
+        self._count = self._conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+
+    def append(self, readings: list[dict]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO readings (payload) VALUES (?)",
+                [(json.dumps(reading),) for reading in readings],
+            )
+            self._conn.execute("COMMIT")
+            self._count += len(readings)
+
+    def peek(self, limit: int) -> list[tuple[int, dict]]:
+        """Devuelve las lecturas más antiguas sin quitarlas de la cola."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM readings ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def ack(self, ids: list[int]):
+        """Borra las lecturas que el backend ya confirmó."""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM readings WHERE id = ?", [(row_id,) for row_id in ids])
+            self._conn.execute("COMMIT")
+            self._count -= len(ids)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
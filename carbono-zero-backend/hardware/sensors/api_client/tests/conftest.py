@@ -0,0 +1,6 @@
+# tests/conftest.py
+# Los módulos del cliente del Pi se importan por nombre (como en read_and_push_sensors.py)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
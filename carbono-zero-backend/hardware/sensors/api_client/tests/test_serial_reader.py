@@ -0,0 +1,145 @@
+# tests/test_serial_reader.py
+"""
+Pruebas del lector serial, sin Arduino. Desde hardware/sensors/api_client/:
+
+    python -m pytest tests
+"""
+import asyncio
+import json
+import os
+
+import pytest
+import serial
+
+from serial_reader import LineParser, SerialPortReader, parse_line
+
+LINE = '{"co2_ppm": 650.5, "temperatura_c": 22.4, "humedad_pct": 48.1}'
+PAYLOAD = {"co2": 650.5, "temperature": 22.4, "humidity": 48.1}
+
+
+# --- parse_line ---
+
+def test_parse_line_reading():
+    assert parse_line(LINE) == (PAYLOAD, False)
+
+
+def test_parse_line_accepts_integers():
+    payload, error = parse_line('{"co2_ppm": 650, "temperatura_c": 22, "humedad_pct": 48}')
+    assert payload == {"co2": 650, "temperature": 22, "humidity": 48}
+    assert not error
+
+
+def test_parse_line_status_line_is_not_an_error():
+    assert parse_line("✅ Sensor SCD30 detectado") == (None, False)
+
+
+@pytest.mark.parametrize("line", [
+    '{"co2_ppm": 650.5, "temperatura_c": 22.4',  # Cortada a la mitad
+    '"humedad_pct": 48.1}',
+    '{"co2_ppm": 650.5, "temperatura_c": }',  # JSON inválido
+    '{"temperatura_c": 22.4, "humedad_pct": 48.1}',  # Falta el CO2
+    '{"co2_ppm": 650.5, "humedad_pct": 48.1}',  # Falta la temperatura
+    '{"co2_ppm": 650.5, "temperatura_c": 22.4}',  # Falta la humedad
+    '{"co2_ppm": 650.5, "temperatura_c": null, "humedad_pct": 48.1}',
+    '{"co2_ppm": "650", "temperatura_c": 22.4, "humedad_pct": 48.1}',
+    '{"co2_ppm": true, "temperatura_c": 22.4, "humedad_pct": 48.1}',
+    '{"co2_ppm": NaN, "temperatura_c": 22.4, "humedad_pct": 48.1}',
+])
+def test_parse_line_incomplete_readings_are_errors(line):
+    assert parse_line(line) == (None, True)
+
+
+# --- LineParser ---
+
+def test_line_parser_joins_split_chunks():
+    parser = LineParser()
+    data = (LINE + "\n").encode()
+    lines = []
+    for i in range(len(data)):
+        lines += parser.feed(data[i:i + 1])
+    assert lines == [LINE]
+
+
+def test_line_parser_several_lines_in_one_chunk():
+    parser = LineParser()
+    assert parser.feed(f"{LINE}\n{LINE}\n{LINE[:10]}".encode()) == [LINE, LINE]
+    assert parser.feed(f"{LINE[10:]}\n".encode()) == [LINE]
+
+
+def test_line_parser_strips_crlf_and_skips_blank_lines():
+    parser = LineParser()
+    assert parser.feed(f"{LINE}\r\n\r\n{LINE}\r\n".encode()) == [LINE, LINE]
+
+
+def test_line_parser_discards_overflow_until_next_newline():
+    parser = LineParser(max_line=64)
+    # Basura sin saltos de línea (p. ej. baudios equivocados), en varios trozos
+    assert parser.feed(b"x" * 50) == []
+    assert parser.feed(b"x" * 50) == []
+    assert parser.overflows == 1
+    # El resto de la línea larga se descarta; la siguiente línea se lee normal
+    assert parser.feed(b"xxxx\n" + b'{"a": 1}\n') == ['{"a": 1}']
+    assert parser.overflows == 1
+
+
+def test_line_parser_discards_long_complete_line():
+    parser = LineParser(max_line=16)
+    assert parser.feed(b"y" * 20 + b"\nok\n") == ["ok"]
+    assert parser.overflows == 1
+
+
+def test_line_parser_reset_drops_partial_line():
+    parser = LineParser()
+    parser.feed(LINE[:20].encode())
+    parser.reset()
+    assert parser.feed(f"{LINE}\n".encode()) == [LINE]
+
+
+# --- SerialPortReader sobre un pseudo-terminal (loopback) ---
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="requiere pseudo-terminales (Linux/macOS)")
+def test_reader_over_pty():
+    async def scenario():
+        master, slave = os.openpty()
+        port = os.ttyname(slave)
+        reader = SerialPortReader("aula-1", port, opener=lambda: serial.Serial(port, 9600, timeout=1))
+        received = []
+        done = asyncio.Event()
+
+        async def on_reading(sensor_id, ts, payload):
+            received.append((sensor_id, payload))
+            if len(received) == 2:
+                done.set()
+
+        task = asyncio.create_task(reader.run(on_reading))
+        try:
+            # Se escribe cuando el puerto ya está abierto: antes, el pty descartaría los bytes
+            while not reader.stats.connected:
+                await asyncio.sleep(0.01)
+            chunks = [
+                b"\xe2\x9c\x85 Sensor listo\r\n",
+                LINE[:25].encode(),
+                (LINE[25:] + "\r\n").encode(),
+                b'{"co2_ppm": 700.0}\r\n',  # Incompleta: se cuenta como error
+                json.dumps({"co2_ppm": 710.0, "temperatura_c": 23.0, "humedad_pct": 50.0}).encode() + b"\r\n",
+            ]
+            for chunk in chunks:
+                os.write(master, chunk)
+                await asyncio.sleep(0.02)
+            await asyncio.wait_for(done.wait(), timeout=5)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            os.close(master)
+            os.close(slave)
+
+        assert received == [
+            ("aula-1", PAYLOAD),
+            ("aula-1", {"co2": 710.0, "temperature": 23.0, "humidity": 50.0}),
+        ]
+        stats = reader.stats_dict()
+        assert stats["readings"] == 2
+        assert stats["parse_errors"] == 1
+        assert stats["lines"] == 4
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+# tests/test_uplink.py
+"""Envío de lotes al backend (read_and_push_sensors.send_batch) contra un backend falso."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from read_and_push_sensors import BATCH_ENDPOINT, send_batch
+
+
+def make_readings(count: int) -> list[dict]:
+    return [
+        {"sensor_id": "default", "session_id": "baseline_main", "spool_id": "abc", "seq": seq,
+         "co2": 600.0 + seq, "temperature": 22.0, "humidity": 45.0, "timestamp": "2026-10-18T10:00:00+00:00"}
+        for seq in range(1, count + 1)
+    ]
+
+
+def run_send(handler, readings: list[dict]):
+    async def scenario():
+        async with httpx.AsyncClient(base_url="http://backend", transport=httpx.MockTransport(handler)) as client:
+            return await send_batch(client, readings, "plain")
+    return asyncio.run(scenario())
+
+
+def test_invalid_reading_is_isolated():
+    stored = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == BATCH_ENDPOINT
+        batch = json.loads(request.content)
+        if any(reading["seq"] == 5 for reading in batch):
+            return httpx.Response(422, json={"detail": "invalid"})
+        stored.extend(reading["seq"] for reading in batch)
+        return httpx.Response(202)
+
+    rejected = run_send(handler, make_readings(8))
+    assert [reading["seq"] for reading in rejected] == [5]
+    assert sorted(stored) == [1, 2, 3, 4, 6, 7, 8]
+
+
+@pytest.mark.parametrize("status", [401, 403, 404, 405, 408, 429, 500, 503])
+def test_other_errors_keep_the_batch(status):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run_send(handler, make_readings(4))
@@ -1,49 +1,75 @@
-import serial
-import json
+import argparse
+import asyncio
 import csv
-from datetime import datetime
+import os
+import sys
+
+# El lector y el agregador son los mismos que usa el envío al backend (api_client/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_client'))
+from edge import EdgeAggregator  # noqa: E402
+from serial_reader import SerialPortReader, parse_sensors, report_stats  # noqa: E402
 
 # 📍 Configura el puerto serial según tu sistema
 # En Linux: '/dev/ttyACM0' o '/dev/ttyUSB0'
 # En Windows: 'COM5' o similar
+# Con dos SCD30 (un Arduino por sensor): --sensor aula-1=/dev/ttyACM0 --sensor aula-2=/dev/ttyACM1
 SERIAL_PORT = 'COM5'#'/dev/ttyACM0'
+SENSOR_ID = 'scd30'
 BAUD_RATE = 9600
-CSV_FILE = 'datos_scd30.csv'
-
-# 📦 Inicializa conexión serial
-ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=5)
-
-# 🗂️ Crea archivo CSV y escribe encabezado si no existe
-try:
-    with open(CSV_FILE, 'x', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['timestamp', 'co2_ppm', 'temperatura_c', 'humedad_pct'])
-except FileExistsError:
-    pass  # ya existe
-
-print("📡 Escuchando datos del Arduino... (Ctrl+C para detener)")
-
-try:
-    while True:
-        line = ser.readline().decode('utf-8').strip()
-        if line.startswith('{') and line.endswith('}'):
-            try:
-                data = json.loads(line)
-                timestamp = datetime.now().isoformat()
-                co2 = data.get("co2_ppm")
-                temp = data.get("temperatura_c")
-                hum = data.get("humedad_pct")
-
-                print(f"{timestamp} → CO₂: {co2} ppm | Temp: {temp} °C | Hum: {hum} %")
-
-                # 💾 Guardar en CSV
-                with open(CSV_FILE, 'a', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([timestamp, co2, temp, hum])
-
-            except json.JSONDecodeError:
-                print("⚠️ Error al decodificar JSON:", line)
-except KeyboardInterrupt:
-    print("\n🛑 Lectura detenida por el usuario.")
-finally:
-    ser.close()
+CSV_FILE = 'datos_{sensor_id}.csv'  # Un archivo por sensor
+STATS_INTERVAL = 300.0
+# 📉 Solo se guardan filas cuando algo cambia más que la banda muerta (o cada HEARTBEAT_SECONDS)
+WINDOW_SECONDS = 0.0  # Promedio por ventana; 0 = sin promediar
+DEADBAND = {"co2": 25.0, "temperature": 0.5, "humidity": 2.0}
+HEARTBEAT_SECONDS = 60.0
+
+
+class CsvLog:
+    """Archivo CSV de un sensor, con su agregador."""
+
+    def __init__(self, sensor_id: str):
+        # 🗂️ Abre el archivo CSV una sola vez (modo append) y escribe el encabezado si está vacío
+        self.file = open(CSV_FILE.format(sensor_id=sensor_id), 'a', newline='')
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(['timestamp', 'co2_ppm', 'temperatura_c', 'humedad_pct'])
+            self.file.flush()
+        self.aggregator = EdgeAggregator(WINDOW_SECONDS, DEADBAND, HEARTBEAT_SECONDS)
+
+    def write_rows(self, readings):
+        for reading in readings:
+            self.writer.writerow([reading["timestamp"], reading["co2"], reading["temperature"], reading["humidity"]])
+        # flush para no perder filas si se corta la energía
+        self.file.flush()
+
+    def close(self):
+        self.write_rows(self.aggregator.flush())
+        self.file.close()
+
+
+async def main(sensors: dict[str, str]):
+    logs = {sensor_id: CsvLog(sensor_id) for sensor_id in sensors}
+
+    def on_reading(sensor_id, ts, payload):
+        print(f"[{sensor_id}] → CO₂: {payload['co2']} ppm | Temp: {payload['temperature']} °C | Hum: {payload['humidity']} %")
+        # 💾 Guardar en CSV lo que deja pasar el agregador
+        log = logs[sensor_id]
+        log.write_rows(log.aggregator.add(ts, payload))
+
+    readers = [SerialPortReader(sensor_id, port, BAUD_RATE) for sensor_id, port in sensors.items()]
+    print("📡 Escuchando datos del Arduino... (Ctrl+C para detener)")
+    try:
+        await asyncio.gather(*(reader.run(on_reading) for reader in readers), report_stats(readers, STATS_INTERVAL))
+    finally:
+        for log in logs.values():
+            log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guarda en CSV las lecturas de uno o varios SCD30.")
+    parser.add_argument("--sensor", action="append", default=[], metavar="ID=PUERTO")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(parse_sensors(args.sensor, SENSOR_ID) if args.sensor else {SENSOR_ID: SERIAL_PORT}))
+    except KeyboardInterrupt:
+        print("\n🛑 Lectura detenida por el usuario.")
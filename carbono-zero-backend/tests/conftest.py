@@ -0,0 +1,10 @@
+# tests/conftest.py
+"""
+Pruebas del backend sin MongoDB. Desde carbono-zero-backend/:
+
+    python -m pytest tests
+"""
+import os
+
+# La configuración exige DATABASE_URL al importar la app; las pruebas no se conectan
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017/carbono_test")
@@ -0,0 +1,61 @@
+# tests/test_bulk_import.py
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.models.models import SensorReading
+from app.scripts import bulk_import
+from app.scripts.bulk_import import ImportStats, import_readings
+
+WHEN = datetime(2025, 6, 15, 10, 0)
+
+
+class SlowCollection:
+    """insert_many que tarda, para que los lotes se solapen como con MongoDB."""
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(0.01)
+        self.docs.extend(docs)
+
+        class Result:
+            inserted_ids = [None] * len(docs)
+
+        return Result()
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = SlowCollection()
+    monkeypatch.setattr(SensorReading, "get_motor_collection", staticmethod(lambda: collection))
+
+    async def existing_keys(readings):
+        # Lo ya escrito, como lo vería la consulta real
+        return {(doc["session_id"], doc["sensor_id"], doc["timestamp"]) for doc in collection.docs}
+
+    monkeypatch.setattr(bulk_import, "existing_keys", existing_keys)
+    return collection
+
+
+def make_reading(sensor_id: str) -> SensorReading:
+    return SensorReading(session_id="s1", sensor_id=sensor_id, co2=400, temperature=20, humidity=50, timestamp=WHEN)
+
+
+def test_sensors_at_the_same_millisecond_are_not_duplicates(collection):
+    stats = ImportStats()
+    asyncio.run(import_readings([make_reading("pi-1"), make_reading("pi-2")], stats, batch_size=10, workers=2))
+    assert sorted(doc["sensor_id"] for doc in collection.docs) == ["pi-1", "pi-2"]
+    assert stats.duplicates == 0
+
+
+def test_duplicates_in_concurrent_batches_are_inserted_once(collection):
+    stats = ImportStats()
+    # Cada lote lleva la misma lectura y todos están en vuelo a la vez
+    readings = [make_reading("pi-1") for _ in range(4)]
+    asyncio.run(import_readings(readings, stats, batch_size=1, workers=4))
+    assert len(collection.docs) == 1
+    assert stats.inserted == 1
+    assert stats.duplicates == 3
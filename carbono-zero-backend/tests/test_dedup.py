@@ -0,0 +1,71 @@
+# tests/test_dedup.py
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.models.models import ReadingReceipt, SensorReading
+from app.services.dedup import DUPLICATE_KEY_ERROR, ReadingDeduplicator
+
+
+class FakeCollection:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_many(self, query):
+        self.deleted.append(query)
+
+
+@pytest.fixture(autouse=True)
+def receipts(monkeypatch):
+    # Los documentos de Beanie piden su colección al crearse; no hace falta MongoDB
+    collection = FakeCollection()
+    monkeypatch.setattr(SensorReading, "get_motor_collection", staticmethod(lambda: collection))
+    monkeypatch.setattr(ReadingReceipt, "get_motor_collection", staticmethod(lambda: collection))
+    return collection
+
+
+def make_reading(seq, spool_id="spool-a"):
+    return SensorReading(session_id="s1", co2=400, temperature=20, humidity=50,
+                         sensor_id="pi-1" if seq is not None else None, seq=seq, spool_id=spool_id)
+
+
+def test_filter_new_drops_repeated_and_stored_readings(monkeypatch):
+    inserted = []
+
+    async def insert_many(receipts, ordered=True):
+        inserted.append([receipt.seq for receipt in receipts])
+        # El recibo de seq=2 ya estaba en MongoDB (otro worker o un reenvío anterior)
+        raise BulkWriteError({"writeErrors": [{"index": 1, "code": DUPLICATE_KEY_ERROR}]})
+
+    monkeypatch.setattr(ReadingReceipt, "insert_many", insert_many)
+
+    async def scenario():
+        deduplicator = ReadingDeduplicator()
+        batch = [make_reading(1), make_reading(2), make_reading(1), make_reading(None), make_reading(1, "spool-b")]
+        fresh = await deduplicator.filter_new(batch)
+        assert [(r.seq, r.spool_id) for r in fresh] == [(None, "spool-a"), (1, "spool-a"), (1, "spool-b")]
+        assert inserted == [[1, 2, 1]]
+        assert deduplicator.total_duplicates == 2
+        # La caché en memoria responde sin ir a MongoDB
+        assert await deduplicator.filter_new([make_reading(1)]) == []
+        assert len(inserted) == 1
+
+    asyncio.run(scenario())
+
+
+def test_forget_accepts_the_retry(monkeypatch, receipts):
+    async def insert_many(receipts, ordered=True):
+        pass
+
+    monkeypatch.setattr(ReadingReceipt, "insert_many", insert_many)
+
+    async def scenario():
+        deduplicator = ReadingDeduplicator()
+        reading = make_reading(7)
+        assert await deduplicator.filter_new([reading]) == [reading]
+        await deduplicator.forget([reading])
+        assert receipts.deleted == [{"$or": [{"sensor_id": "pi-1", "spool_id": "spool-a", "seq": 7}]}]
+        assert await deduplicator.filter_new([reading]) == [reading]
+
+    asyncio.run(scenario())
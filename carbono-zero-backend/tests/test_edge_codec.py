@@ -0,0 +1,73 @@
+# tests/test_edge_codec.py
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.routers import readings
+from app.services import edge_codec
+
+
+def make_batch(**changes) -> dict:
+    batch = {
+        "v": 1,
+        "sensor_id": "default",
+        "sessions": ["baseline_main", "clase"],
+        "sid": [[0, 1], [1, 2]],
+        "t0": 1_750_000_000_000,
+        "dt": [0, 5000, 5000],
+        "seq0": 10, "dseq": [0, 1, 1],
+        "co2": [4000, 10, -5],
+        "temperature": [2200, 0, 1],
+        "humidity": [5000, -10, 0],
+    }
+    batch.update(changes)
+    return batch
+
+
+def test_decode_rebuilds_readings():
+    items = edge_codec.decode(make_batch())
+    assert [item["session_id"] for item in items] == ["baseline_main", "clase", "clase"]
+    assert [item["seq"] for item in items] == [10, 11, 12]
+    assert [item["co2"] for item in items] == [400.0, 401.0, 400.5]
+    assert items[2]["timestamp"] == datetime(2025, 6, 15, 15, 6, 50, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("changes", [
+    {"seq0": "10"},
+    {"seq0": [10]},
+    {"t0": 10 ** 20},
+    {"dt": [0, 10 ** 20, 0]},
+    {"t0": "ayer"},
+    {"sid": [[0, 10 ** 12]]},
+    {"sid": [[0, 5], [1, -2]]},
+    {"sid": [[0, 1], [5, 2]]},
+    {"dseq": [0, 1]},
+    {"co2": [1, "x", 2]},
+])
+def test_decode_rejects_malformed_batches(changes):
+    with pytest.raises(ValueError):
+        edge_codec.decode(make_batch(**changes))
+
+
+def post_compact(batch: dict) -> httpx.Response:
+    app = FastAPI()
+    app.include_router(readings.router, prefix="/api/readings")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/readings/compact", content=json.dumps(batch),
+                                     headers={"content-type": "application/json"})
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("changes", [{"seq0": "10"}, {"t0": 10 ** 20}, {"sid": [[0, 10 ** 12]]}])
+def test_compact_endpoint_answers_400_to_malformed_batches(changes):
+    response = post_compact(make_batch(**changes))
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid compact payload")
@@ -0,0 +1,152 @@
+# tests/test_ingest_buffer.py
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.models.models import ReadingReceipt, SensorReading
+from app.services import dedup as dedup_module
+from app.services import ingest_buffer as ingest_module
+from app.services.dedup import DUPLICATE_KEY_ERROR, ReadingDeduplicator
+from app.services.ingest_buffer import IngestBuffer
+
+
+def make_readings(count: int, seq: bool = False) -> list[SensorReading]:
+    return [
+        SensorReading(session_id="s1", co2=400 + i, temperature=20.0, humidity=50.0,
+                      sensor_id="pi-1" if seq else None, seq=i if seq else None)
+        for i in range(count)
+    ]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_many(self, query):
+        self.deleted.append(query)
+
+
+@pytest.fixture(autouse=True)
+def collections(monkeypatch):
+    # Los documentos de Beanie piden su colección al crearse; no hace falta MongoDB
+    fakes = {SensorReading: FakeCollection(), ReadingReceipt: FakeCollection()}
+    for model, collection in fakes.items():
+        monkeypatch.setattr(model, "get_motor_collection", staticmethod(lambda c=collection: c))
+    return fakes
+
+
+def test_flush_writes_in_max_size_chunks(monkeypatch):
+    sizes = []
+
+    async def insert_many(documents, ordered=True):
+        sizes.append(len(documents))
+
+    monkeypatch.setattr(SensorReading, "insert_many", insert_many)
+
+    async def scenario():
+        buffer = IngestBuffer(max_size=3, flush_interval=60)
+        buffer._pending = make_readings(7)
+        assert await buffer.flush() is True
+        assert sizes == [3, 3, 1]
+        assert buffer._pending == []
+        assert buffer.total_flushed == 7
+
+    asyncio.run(scenario())
+
+
+def test_failed_insert_only_forgets_receipts_created_by_the_flush(monkeypatch):
+    readings = make_readings(4, seq=True)
+    # Las dos primeras ya se habían guardado antes: son duplicados reales
+    fresh = readings[2:]
+    forgotten = []
+
+    async def filter_new(batch):
+        return [reading for reading in batch if reading in fresh]
+
+    async def forget(batch):
+        forgotten.extend(batch)
+
+    async def insert_many(documents, ordered=True):
+        raise TimeoutError("MongoDB no respondió")
+
+    monkeypatch.setattr(ingest_module.deduplicator, "filter_new", filter_new)
+    monkeypatch.setattr(ingest_module.deduplicator, "forget", forget)
+    monkeypatch.setattr(SensorReading, "insert_many", insert_many)
+
+    async def scenario():
+        buffer = IngestBuffer(max_size=10, flush_interval=1)
+        buffer._pending = list(readings)
+        assert await buffer.flush() is False
+        assert forgotten == fresh
+        # El lote completo vuelve a la cola para el reintento
+        assert buffer._pending == readings
+        assert buffer.total_requeued == 4
+
+    asyncio.run(scenario())
+
+
+def test_failed_chunk_stops_the_flush_and_keeps_order(monkeypatch):
+    calls = []
+
+    async def insert_many(documents, ordered=True):
+        calls.append(len(documents))
+        if len(calls) == 2:
+            raise TimeoutError("MongoDB no respondió")
+
+    monkeypatch.setattr(SensorReading, "insert_many", insert_many)
+
+    async def scenario():
+        buffer = IngestBuffer(max_size=2, flush_interval=1)
+        readings = make_readings(5)
+        buffer._pending = list(readings)
+        assert await buffer.flush() is False
+        assert calls == [2, 2]
+        assert buffer._pending == readings[2:]
+
+    asyncio.run(scenario())
+
+
+def test_filter_new_failure_only_undoes_its_own_receipts(monkeypatch, collections):
+    collection = collections[ReadingReceipt]
+
+    async def insert_many(documents, ordered=True):
+        raise BulkWriteError({"writeErrors": [
+            {"index": 0, "code": DUPLICATE_KEY_ERROR, "errmsg": "duplicate key"},
+            {"index": 1, "code": 91, "errmsg": "shutdown in progress"},
+        ]})
+
+    monkeypatch.setattr(ReadingReceipt, "insert_many", insert_many)
+
+    async def scenario():
+        deduplicator = ReadingDeduplicator()
+        with pytest.raises(BulkWriteError):
+            await deduplicator.filter_new(make_readings(3, seq=True))
+        # Se borra por lote, nunca por clave: el recibo duplicado previo no se toca
+        assert len(collection.deleted) == 1
+        assert list(collection.deleted[0]) == ["batch_id"]
+
+    asyncio.run(scenario())
+
+
+def test_filter_new_failure_requeues_without_forgetting(monkeypatch):
+    forgotten = []
+
+    async def filter_new(batch):
+        raise TimeoutError("MongoDB no respondió")
+
+    async def forget(batch):
+        forgotten.extend(batch)
+
+    monkeypatch.setattr(dedup_module.deduplicator, "filter_new", filter_new)
+    monkeypatch.setattr(dedup_module.deduplicator, "forget", forget)
+
+    async def scenario():
+        buffer = IngestBuffer(max_size=10, flush_interval=1)
+        readings = make_readings(3, seq=True)
+        buffer._pending = list(readings)
+        assert await buffer.flush() is False
+        assert forgotten == []
+        assert buffer._pending == readings
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+# tests/test_pagination.py
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services import pagination
+from app.services.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter, stream_page
+
+SORT = [("timestamp", 1), ("_id", 1)]
+
+
+async def as_cursor(docs):
+    for doc in docs:
+        yield doc
+
+
+def read_page(docs, limit):
+    async def scenario():
+        return b"".join([part async for part in stream_page(as_cursor(docs), limit, SORT, lambda d: {"co2": d["co2"]})])
+
+    return json.loads(asyncio.run(scenario()))
+
+
+def make_docs(count):
+    return [{"_id": ObjectId(), "timestamp": datetime(2025, 6, 15, 10, i), "co2": 400 + i} for i in range(count)]
+
+
+def test_cursor_round_trip():
+    values = [datetime(2025, 6, 15, 10, 0, 0, 123000), ObjectId()]
+    assert decode_cursor(encode_cursor(values), 2) == values
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", encode_cursor([1]), encode_cursor([{"o": "x"}, 1])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 2)
+
+
+def test_keyset_filter_breaks_ties_on_id():
+    t, oid = datetime(2025, 6, 15), ObjectId()
+    assert keyset_filter(SORT, [t, oid]) == {"$or": [
+        {"timestamp": {"$gt": t}},
+        {"timestamp": t, "_id": {"$gt": oid}},
+    ]}
+    assert keyset_filter([("_id", -1)], [oid]) == {"_id": {"$lt": oid}}
+
+
+def test_page_with_more_documents_returns_cursor_of_last_sent():
+    docs = make_docs(3)
+    # El cursor pide limit + 1 documentos
+    page = read_page(docs, limit=2)
+    assert page["items"] == [{"co2": 400}, {"co2": 401}]
+    assert decode_cursor(page["next_cursor"], 2) == [docs[1]["timestamp"], docs[1]["_id"]]
+
+
+def test_last_page_has_no_cursor():
+    page = read_page(make_docs(2), limit=2)
+    assert len(page["items"]) == 2
+    assert page["next_cursor"] is None
+
+
+def test_page_split_in_chunks_is_valid_json(monkeypatch):
+    monkeypatch.setattr(pagination, "STREAM_CHUNK_ITEMS", 2)
+    page = read_page(make_docs(6), limit=5)
+    assert [item["co2"] for item in page["items"]] == [400, 401, 402, 403, 404]
+    assert page["next_cursor"] is not None
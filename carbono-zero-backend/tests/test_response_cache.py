@@ -0,0 +1,76 @@
+# tests/test_response_cache.py
+import asyncio
+from datetime import datetime
+
+import pytest
+from starlette.requests import Request
+
+from app.services.response_cache import ResponseCache, cached_response, etag_matches
+
+SESSION = "6855aaaaaaaaaaaaaaaaaaaa"
+
+
+def test_invalidation_during_compute_is_not_cached():
+    cache = ResponseCache(max_entries=10, ttl_seconds=300)
+
+    async def scenario():
+        computing = asyncio.Event()
+        written = asyncio.Event()
+
+        async def compute():
+            computing.set()
+            await written.wait()  # La consulta a MongoDB tarda; mientras, se escribe un lote
+            return [{"co2": 600}]
+
+        async def handler():
+            assert cache.get("key") is None
+            generation = cache.generation
+            return cache.set("key", await compute(), session_id=SESSION, generation=generation)
+
+        async def ingest():
+            await computing.wait()
+            cache.invalidate_ranges({SESSION: (datetime(2026, 10, 18, 10), datetime(2026, 10, 18, 10))})
+            written.set()
+
+        entry, _ = await asyncio.gather(handler(), ingest())
+        return entry
+
+    entry = asyncio.run(scenario())
+    assert entry.body  # La respuesta se envía igual
+    assert cache.get("key") is None
+
+
+def test_set_without_invalidation_is_cached():
+    cache = ResponseCache(max_entries=10, ttl_seconds=300)
+    generation = cache.generation
+    cache.set("key", [1], generation=generation)
+    assert cache.get("key") is not None
+
+
+ETAG = '"abc123"'
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc123"', True),
+    ('"other", "abc123"', True),
+    ('W/"abc123"', True),
+    ("*", True),
+    ('"abc1234"', False),
+    ('"xabc123"', False),
+    ('"abc12"', False),
+    ("", False),
+])
+def test_etag_matches_whole_tokens(header, expected):
+    assert etag_matches(header, ETAG) is expected
+
+
+def make_request(if_none_match: str | None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_cached_response_304_only_on_match():
+    entry = ResponseCache(max_entries=10, ttl_seconds=300).set("key", [1])
+    assert cached_response(make_request(entry.etag), entry).status_code == 304
+    assert cached_response(make_request(entry.etag[:-2] + '"'), entry).status_code == 200
+    assert cached_response(make_request(None), entry).status_code == 200
@@ -0,0 +1,100 @@
+# tests/test_scheduler.py
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.core import scheduler as scheduler_module
+from app.core.scheduler import ClassScheduler, ScheduleEvent
+from app.core.timeutils import LOCAL_TZ
+
+CLASS_ID = str(PydanticObjectId())
+
+
+def make_event(kind: str, when: datetime) -> ScheduleEvent:
+    return ScheduleEvent(
+        when=when, priority=1 if kind == "start" else 0, kind=kind, class_id=CLASS_ID,
+        class_name="Física", sensor_id="default", ends_at=when + timedelta(hours=1),
+    )
+
+
+def test_failed_start_is_retried_and_fires_once(monkeypatch):
+    calls = []
+
+    async def flaky_start(class_id, sensor_id):
+        calls.append(class_id)
+        if len(calls) == 1:
+            raise TimeoutError("MongoDB no respondió")
+
+    monkeypatch.setattr(scheduler_module, "start_class_session", flaky_start)
+
+    async def scenario():
+        scheduler = ClassScheduler(catchup=timedelta(minutes=5))
+        now = datetime.now(LOCAL_TZ)
+        scheduler._timeline = [make_event("start", now - timedelta(seconds=1))]
+        with pytest.raises(TimeoutError):
+            await scheduler._process_due(now)
+        # El evento sigue pendiente y el siguiente intento lo procesa
+        assert len(scheduler._timeline) == 1
+        await scheduler._process_due(now + timedelta(seconds=1))
+        assert scheduler._timeline == []
+        await scheduler._process_due(now + timedelta(seconds=2))
+
+    asyncio.run(scenario())
+    assert calls == [PydanticObjectId(CLASS_ID)] * 2
+
+
+def test_failed_stop_is_retried(monkeypatch):
+    calls = []
+
+    async def flaky_stop(sensor_id):
+        calls.append(sensor_id)
+        if len(calls) == 1:
+            raise TimeoutError("MongoDB no respondió")
+
+    monkeypatch.setattr(scheduler_module, "stop_sessions", flaky_stop)
+    monkeypatch.setattr(scheduler_module.session_state, "get_active", lambda sensor_id: CLASS_ID)
+
+    async def scenario():
+        scheduler = ClassScheduler(catchup=timedelta(minutes=5))
+        now = datetime.now(LOCAL_TZ)
+        scheduler._timeline = [make_event("stop", now - timedelta(seconds=1))]
+        with pytest.raises(TimeoutError):
+            await scheduler._process_due(now)
+        await scheduler._process_due(now + timedelta(seconds=1))
+        assert scheduler._timeline == []
+
+    asyncio.run(scenario())
+    assert calls == ["default", "default"]
+
+
+def test_run_retries_after_error(monkeypatch):
+    """El ciclo de fondo reintenta el evento fallido tras una espera corta, sin dormir una hora."""
+    calls = []
+
+    async def scenario():
+        fired = asyncio.Event()
+
+        async def flaky_start(class_id, sensor_id):
+            calls.append(class_id)
+            if len(calls) == 1:
+                raise TimeoutError("MongoDB no respondió")
+            fired.set()
+
+        async def keep_timeline(now):
+            scheduler._needs_rebuild = False
+            scheduler._built_until = now + timedelta(days=8)
+
+        monkeypatch.setattr(scheduler_module, "start_class_session", flaky_start)
+        scheduler = ClassScheduler(catchup=timedelta(minutes=5))
+        monkeypatch.setattr(scheduler, "_rebuild", keep_timeline)
+        scheduler._timeline = [make_event("start", datetime.now(LOCAL_TZ) - timedelta(seconds=1))]
+        scheduler.start()
+        try:
+            await asyncio.wait_for(fired.wait(), timeout=5)
+        finally:
+            scheduler.shutdown()
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
@@ -0,0 +1,34 @@
+# tests/test_session_state.py
+import asyncio
+
+import pytest
+
+from app.services.pubsub import InMemoryPubSub
+from app.services.session_state import DEFAULT_SESSION_ID, InMemorySessionStateStore, SessionStateStore
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(NotImplementedError):
+        asyncio.run(SessionStateStore().set_active("pi-1", "clase"))
+
+
+def test_in_memory_store_propagates_through_pubsub():
+    async def scenario():
+        pubsub = InMemoryPubSub()
+        # Dos workers que comparten el canal de estado
+        first, second = InMemorySessionStateStore(), InMemorySessionStateStore()
+        first.attach_pubsub(pubsub)
+        second.attach_pubsub(pubsub)
+        await first.load()
+
+        await first.set_active("pi-1", "clase")
+        await first.set_active("pi-2", "taller")
+        assert second.get_active("pi-1") == "clase"
+
+        await second.clear("pi-1")
+        assert first.get_active("pi-1") == DEFAULT_SESSION_ID
+
+        await first.clear_all()
+        assert second.all_active() == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,28 @@
+# tests/test_startup.py
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CODE = """
+import json, logging, sys
+import app.main
+from app.services import saved_emissions
+print(json.dumps({
+    "loaded": [m for m in ("numpy", "app.services.emissions", "app.core.scheduler") if m in sys.modules],
+    "handlers": len(logging.getLogger().handlers),
+}))
+"""
+
+
+def test_import_is_lazy():
+    """Importar la app (y la invalidación de emisiones de la ingesta) no carga NumPy ni configura el logging."""
+    result = subprocess.run(
+        [sys.executable, "-c", CODE], cwd=BACKEND_DIR, env=dict(os.environ),
+        capture_output=True, text=True, check=True,
+    )
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    assert data == {"loaded": [], "handlers": 0}
@@ -11,6 +11,8 @@ import { AuthContext } from './AuthContext';
 ChartJS.register(CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend, TimeScale, Filler);
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+// Máximo de puntos por gráfico: el backend ajusta el intervalo según el rango pedido
+const HISTORY_MAX_POINTS = 500;
 
 const chartOptions = {
     maintainAspectRatio: false,
@@ -19,11 +21,10 @@ const chartOptions = {
         x: {
             type: 'time',
             time: {
-                unit: 'minute',
                 tooltipFormat: 'HH:mm - dd/MM/yy',
-                displayFormats: { minute: 'HH:mm' }
+                displayFormats: { minute: 'HH:mm', hour: 'HH:mm', day: 'dd/MM', week: 'dd/MM', month: 'MM/yy' }
             },
-            title: { display: true, text: 'Hora de la Lectura (Intervalos de 15 min)' }
+            title: { display: true, text: 'Hora de la Lectura' }
         },
         y: {
             title: { display: true, text: 'CO₂ Promedio (ppm)' },
@@ -87,7 +88,9 @@ function AnalyticsView({ allClasses }) {
         }
 
         try {
-            const response = await axios.get(`${API_URL}/api/readings/history/${finalClassId}`, { params });
+            const response = await axios.get(`${API_URL}/api/readings/history/${finalClassId}`, {
+                params: { ...params, max_points: HISTORY_MAX_POINTS, downsample: 'lttb' },
+            });
             const className = allClasses.find(c => c.id === finalClassId)?.name || 'Clase';
             setChartTitle(`Evolución de CO₂ para: ${className}`);
 
@@ -9,6 +9,8 @@ import 'chartjs-adapter-date-fns';
 ChartJS.register(CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend, TimeScale, Filler);
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+// Máximo de puntos por gráfico: el backend ajusta el intervalo según el rango pedido
+const HISTORY_MAX_POINTS = 500;
 
 const chartOptions = {
     maintainAspectRatio: false,
@@ -17,11 +19,10 @@ const chartOptions = {
         x: {
             type: 'time',
             time: {
-                unit: 'minute',
                 tooltipFormat: 'HH:mm - dd/MM/yy',
-                displayFormats: { minute: 'HH:mm' }
+                displayFormats: { minute: 'HH:mm', hour: 'HH:mm', day: 'dd/MM', week: 'dd/MM', month: 'MM/yy' }
             },
-            title: { display: true, text: 'Hora de la Lectura (Intervalos de 15 min)' }
+            title: { display: true, text: 'Hora de la Lectura' }
         },
         y_co2: {
             type: 'linear',
@@ -88,7 +89,9 @@ function ClassHistoryView({ classData, onReturn }) {
         // Si el modo es 'none', no se envían parámetros de fecha, y el backend devolverá todo.
 
         try {
-            const response = await axios.get(`${API_URL}/api/readings/history/${classData.id}`, { params });
+            const response = await axios.get(`${API_URL}/api/readings/history/${classData.id}`, {
+                params: { ...params, max_points: HISTORY_MAX_POINTS, downsample: 'lttb' },
+            });
 
             if (response.data.length === 0) {
                 setError('No se encontraron datos para los filtros seleccionados.');
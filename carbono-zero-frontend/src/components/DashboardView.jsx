@@ -15,6 +15,8 @@ const LiveMetric = ({ value, label, unit, statusClass = '' }) => (
     </div>
 );
 
+const ALERT_UNITS = { co2: 'ppm', temperature: '°C', humidity: '%HR' };
+
 const liveChartOptions = {
     maintainAspectRatio: false,
     responsive: true,
@@ -31,6 +33,8 @@ function DashboardView({ classData, onReturn }) {
     const [temp, setTemp] = useState(20);
     const [humidity, setHumidity] = useState(50);
     const [tax, setTax] = useState(0.00);
+    // Alertas activas por regla: resolver una no debe ocultar las demás
+    const [alerts, setAlerts] = useState({});
     const [chartData, setChartData] = useState({
         labels: Array(30).fill(""),
         datasets: [{
@@ -50,6 +54,14 @@ function DashboardView({ classData, onReturn }) {
 
         ws.onmessage = (event) => {
             const data = JSON.parse(event.data);
+            // Las alertas llegan por el mismo WebSocket que las lecturas
+            if (data.type === 'alert') {
+                setAlerts(prevAlerts => {
+                    const { [data.rule_id]: _resolved, ...others } = prevAlerts;
+                    return data.state === 'active' ? { ...others, [data.rule_id]: data } : others;
+                });
+                return;
+            }
             setCo2(data.co2);
             setTemp(data.temperature);
             setHumidity(data.humidity);
@@ -110,6 +122,12 @@ function DashboardView({ classData, onReturn }) {
             </div>
             <hr />
 
+            {Object.values(alerts).map(alert => (
+                <p key={alert.rule_id} className="error-message" style={{ fontWeight: 'bold' }}>
+                    ⚠️ {alert.rule}: {alert.value} {ALERT_UNITS[alert.metric]}{alert.kind === 'rate_of_rise' ? '/min' : ''} (límite {alert.threshold})
+                </p>
+            ))}
+
             <div className="dashboard-grid">
                 <LiveMetric value={co2.toFixed(0)} label="CO₂" unit="ppm" statusClass={getCO2Status()} />
                 <LiveMetric value={temp.toFixed(1)} label="Temperatura" unit="°C" />